@@ -1,6 +1,21 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Iterator, Sequence, Tuple
+
+import openai
 from langchain_openai import ChatOpenAI
 from models.cv_model import AnalisisCV
 from prompts.cv_prompts import crear_sistema_prompts
+from services.pdf_processor import extraer_texto_pdf
+
+# Evaluaciones simultáneas en el modo por lotes (limitado por los RPM/TPM de la cuenta)
+MAX_CONCURRENCIA = 8
+# PDFs que se extraen a la vez mientras se evalúan los ya extraídos
+MAX_EXTRACCIONES = 4
+
+# Errores transitorios de la API que merece la pena reintentar con espera exponencial
+ERRORES_REINTENTABLES = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                         openai.InternalServerError)
 
 def crear_evaluador_cv():
     modelo_base = ChatOpenAI(
@@ -10,10 +25,26 @@ def crear_evaluador_cv():
 
     modelo_estructurado = modelo_base.with_structured_output(AnalisisCV)
     chat_prompt = crear_sistema_prompts()
-    cadena_evaluacion = chat_prompt | modelo_estructurado
+    cadena_evaluacion = (chat_prompt | modelo_estructurado).with_retry(
+        retry_if_exception_type=ERRORES_REINTENTABLES,
+        wait_exponential_jitter=True,
+        stop_after_attempt=5
+    )
 
     return cadena_evaluacion
 
+def analisis_con_error(motivo: str = "Error durante el análisis.") -> AnalisisCV:
+    return AnalisisCV(
+        nombre_candidato="Error en procesamiento.",
+        experiencia_años=0,
+        habilidades_clave=["Error al procesar CV"],
+        education="No se puede determinar.",
+        experiencia_relevante=motivo,
+        fortalezas=["Requiere revisión manual del CV"],
+        areas_mejora=["Verificar formato y legibilidad del PDF"],
+        porcentaje_ajuste=0
+    )
+
 def evaluar_candidato(texto_cv: str, descripcion_puesto: str) -> AnalisisCV:
     try:
         cadena_evaluacion = crear_evaluador_cv()
@@ -24,15 +55,95 @@ def evaluar_candidato(texto_cv: str, descripcion_puesto: str) -> AnalisisCV:
         })
 
         return resultado
-    
+
     except Exception as e:
-        return AnalisisCV(
-            nombre_candidato="Error en procesamiento.",
-            experiencia_años=0,
-            habilidades_clave=["Error al procesar CV"],
-            education="No se puede determinar.",
-            experiencia_relevante="Error durante el análisis.",
-            fotalezas=["Requiere revisión manual del CV"],
-            areas_mejora=["Verificar formato y legibilidad del PDF"],
-            porcetaje_ajuste=0
-        )
+        return analisis_con_error()
+
+def evaluar_archivos_lote(archivos_cv, descripcion_puesto: str, max_concurrencia: int = MAX_CONCURRENCIA,
+                          max_extracciones: int = MAX_EXTRACCIONES) -> Iterator[Tuple[str, AnalisisCV]]:
+    """Extrae y evalúa los PDFs subidos en paralelo y devuelve (nombre, análisis) según terminan.
+
+    La extracción y la evaluación van encadenadas: cada CV se envía al LLM en
+    cuanto se ha extraído su texto, sin esperar al resto de PDFs, con como
+    mucho `max_concurrencia` evaluaciones a la vez. Al cerrar el generador se
+    cancela lo que aún no ha empezado.
+    """
+    cadena_evaluacion = crear_evaluador_cv()
+    extractores = ThreadPoolExecutor(max_workers=max_extracciones)
+    evaluadores = ThreadPoolExecutor(max_workers=max_concurrencia)
+    try:
+        extracciones = {extractores.submit(extraer_texto_pdf, archivo): archivo.name for archivo in archivos_cv}
+        evaluaciones = {}
+        # Textos extraídos que esperan hueco: no se encolan en el pool más de 2×max_concurrencia
+        listos = deque()
+        while extracciones or evaluaciones or listos:
+            while listos and len(evaluaciones) < 2 * max_concurrencia:
+                nombre, texto_cv = listos.popleft()
+                evaluaciones[evaluadores.submit(cadena_evaluacion.invoke, {
+                    "texto_cv": texto_cv,
+                    "descripcion_puesto": descripcion_puesto
+                })] = nombre
+            terminados, _ = wait([*extracciones, *evaluaciones], return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                if futuro in extracciones:
+                    nombre = extracciones.pop(futuro)
+                    texto_cv = futuro.result()
+                    if texto_cv.startswith("Error"):
+                        yield nombre, analisis_con_error(texto_cv)
+                    else:
+                        listos.append((nombre, texto_cv))
+                else:
+                    nombre = evaluaciones.pop(futuro)
+                    try:
+                        resultado = futuro.result()
+                    except Exception as e:
+                        resultado = analisis_con_error(f"Error durante el análisis: {e}")
+                    yield nombre, resultado
+    finally:
+        # Si el consumidor deja de leer (p. ej. un rerun de Streamlit) no se espera
+        # a las evaluaciones encoladas: se cancelan y solo terminan las que están en curso
+        extractores.shutdown(wait=False, cancel_futures=True)
+        evaluadores.shutdown(wait=False, cancel_futures=True)
+
+def evaluar_candidatos_lote(cvs: Sequence[Tuple[str, str]], descripcion_puesto: str,
+                            max_concurrencia: int = MAX_CONCURRENCIA) -> Iterator[Tuple[str, AnalisisCV]]:
+    """Evalúa muchos CVs contra el mismo puesto y devuelve (nombre, análisis) según terminan.
+
+    Las llamadas al LLM van en paralelo con como mucho `max_concurrencia` a
+    la vez; los límites de tasa y los errores transitorios se reintentan con
+    espera exponencial y un CV que sigue fallando no detiene al resto.
+    """
+    validos = [(nombre, texto) for nombre, texto in cvs if not texto.startswith("Error")]
+    for nombre, texto in cvs:
+        if texto.startswith("Error"):
+            yield nombre, analisis_con_error(texto)
+    if not validos:
+        return
+
+    cadena_evaluacion = crear_evaluador_cv()
+    entradas = [{"texto_cv": texto, "descripcion_puesto": descripcion_puesto} for _, texto in validos]
+    for indice, resultado in cadena_evaluacion.batch_as_completed(
+        entradas, config={"max_concurrency": max_concurrencia}, return_exceptions=True
+    ):
+        if isinstance(resultado, Exception):
+            resultado = analisis_con_error(f"Error durante el análisis: {resultado}")
+        yield validos[indice][0], resultado
+
+async def aevaluar_candidatos_lote(cvs: Sequence[Tuple[str, str]], descripcion_puesto: str,
+                                   max_concurrencia: int = MAX_CONCURRENCIA) -> AsyncIterator[Tuple[str, AnalisisCV]]:
+    """Versión asíncrona de evaluar_candidatos_lote (abatch_as_completed)."""
+    validos = [(nombre, texto) for nombre, texto in cvs if not texto.startswith("Error")]
+    for nombre, texto in cvs:
+        if texto.startswith("Error"):
+            yield nombre, analisis_con_error(texto)
+    if not validos:
+        return
+
+    cadena_evaluacion = crear_evaluador_cv()
+    entradas = [{"texto_cv": texto, "descripcion_puesto": descripcion_puesto} for _, texto in validos]
+    async for indice, resultado in cadena_evaluacion.abatch_as_completed(
+        entradas, config={"max_concurrency": max_concurrencia}, return_exceptions=True
+    ):
+        if isinstance(resultado, Exception):
+            resultado = analisis_con_error(f"Error durante el análisis: {resultado}")
+        yield validos[indice][0], resultado
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+try:
+    import msgpack
+except ImportError:  # msgpack es opcional: sin él las entradas se guardan en JSON
+    msgpack = None
+
+# Cambiar este número invalida todas las entradas guardadas con el formato anterior
+CACHE_FORMAT = 1
+
+
+def bytes_hash(data: bytes) -> str:
+    return hashlib.md5(data).hexdigest()
+
+
+def pdf_loader_version() -> str:
+    """Versión del extractor de texto de PyPDFLoader; un pypdf nuevo puede extraer otro texto."""
+    import pypdf
+    return f"PyPDFLoader/pypdf-{pypdf.__version__}"
+
+
+def _encoding_name(value) -> Optional[str]:
+    """Nombre de la codificación de un tokenizador (p. ej. el `name` de tiktoken.Encoding)."""
+    name = getattr(value, "name", None)
+    return name if isinstance(name, str) else None
+
+
+def _describe(value):
+    """Valor serializable que identifica un atributo del splitter, o None si no se sabe describir.
+
+    Para las funciones (como `_length_function`) se usa su nombre cualificado y
+    la codificación que capturen en su cierre: `len` y un contador de tokens
+    de tiktoken dan chunks distintos con el mismo chunk_size.
+    """
+    if isinstance(value, (str, int, float, bool, type(None))):
+        return value
+    if isinstance(value, (list, tuple)) and all(isinstance(v, (str, int, float)) for v in value):
+        return list(value)
+    if callable(value):
+        name = getattr(value, "__qualname__", None) or repr(value)
+        encodings = [_encoding_name(cell.cell_contents) for cell in getattr(value, "__closure__", None) or ()
+                     if _encoding_name(cell.cell_contents)]
+        return [name, *encodings] if encodings else name
+    return _encoding_name(value)
+
+
+def splitter_config(text_splitter) -> Dict[str, object]:
+    """Parámetros de un splitter que determinan sus chunks: clase, atributos, función de longitud y codificación."""
+    cls = type(text_splitter)
+    config = {"class": f"{cls.__module__}.{cls.__qualname__}"}
+    for name, value in sorted(vars(text_splitter).items()):
+        described = _describe(value)
+        if described is not None:
+            config[name] = described
+    if hasattr(text_splitter, "config"):
+        config.update({k: v for k, v in text_splitter.config().items() if k != "class"})
+    return config
+
+
+class DocumentCache:
+    """Caché en disco de páginas extraídas y de chunks, direccionada por contenido.
+
+    Cada entrada se identifica por el hash del fichero, la versión del
+    extractor y, para los chunks, la configuración del splitter. Se guarda en
+    columnas (textos y metadatos) con msgpack si está instalado o en JSON si
+    no. Un PDF sin cambios no se vuelve a leer ni a dividir: solo se calcula
+    su hash y se lee una entrada.
+
+    Con `max_age` (segundos) las entradas caducan, y con `max_entries` se
+    borran las menos usadas (por mtime, que se actualiza en cada acierto)
+    cada vez que se escribe una nueva.
+
+        cache = DocumentCache("document_cache")
+        pages = cache.load_pdf(path)
+        chunks = cache.load_and_split(path, text_splitter)
+    """
+
+    def __init__(self, cache_dir: str = "document_cache", max_entries: Optional[int] = None,
+                 max_age: Optional[float] = None):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.suffix = ".msgpack" if msgpack else ".json"
+        self.hits = 0
+        self.misses = 0
+        self.parse_seconds = 0.0
+        self.load_seconds = 0.0
+        self._hashes: Dict[Tuple[str, int, float], str] = {}
+        self._lock = threading.Lock()
+
+    def file_hash(self, path: str) -> str:
+        """md5 del fichero, memorizado por ruta, tamaño y mtime."""
+        stat = os.stat(path)
+        key = (str(path), stat.st_size, stat.st_mtime)
+        if key not in self._hashes:
+            md5 = hashlib.md5()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    md5.update(block)
+            self._hashes[key] = md5.hexdigest()
+        return self._hashes[key]
+
+    @staticmethod
+    def entry_key(*parts) -> str:
+        return hashlib.md5(json.dumps([CACHE_FORMAT, *parts], sort_keys=True).encode()).hexdigest()
+
+    def _read(self, key: str) -> Optional[List[Document]]:
+        path = self.cache_dir / f"{key}{self.suffix}"
+        try:
+            if self.max_age is not None and time.time() - path.stat().st_mtime > self.max_age:
+                path.unlink()
+                return None
+            data = path.read_bytes()
+            if self.max_entries is not None:
+                os.utime(path)
+        except FileNotFoundError:
+            return None
+        columns = msgpack.unpackb(data) if msgpack else json.loads(data)
+        return [Document(page_content=text, metadata=metadata)
+                for text, metadata in zip(columns["texts"], columns["metadatas"])]
+
+    def _write(self, key: str, documents: List[Document]):
+        columns = {"texts": [d.page_content for d in documents], "metadatas": [d.metadata for d in documents]}
+        data = msgpack.packb(columns) if msgpack else json.dumps(columns, ensure_ascii=False).encode()
+        # Escritura atómica: otro proceso puede estar leyendo la misma entrada
+        tmp = self.cache_dir / f"{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp.write_bytes(data)
+        os.replace(tmp, self.cache_dir / f"{key}{self.suffix}")
+        if self.max_entries is not None or self.max_age is not None:
+            self.prune()
+
+    def prune(self) -> int:
+        """Borra las entradas caducadas y las menos usadas por encima de `max_entries`."""
+        entries = []
+        for path in self.cache_dir.glob(f"*{self.suffix}"):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        entries.sort(reverse=True)
+        now = time.time()
+        removed = 0
+        for position, (mtime, path) in enumerate(entries):
+            expired = self.max_age is not None and now - mtime > self.max_age
+            if expired or (self.max_entries is not None and position >= self.max_entries):
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    def get_or_create(self, key: str, create: Callable[[], List[Document]],
+                      source: Optional[str] = None) -> List[Document]:
+        """Entrada `key` de la caché, o el resultado de `create()`, que se guarda.
+
+        Si se pasa `source`, se pone en los metadatos: el mismo contenido puede
+        estar en otra ruta que la del fichero con el que se guardó.
+        """
+        start = time.perf_counter()
+        documents = self._read(key)
+        if documents is None:
+            documents = create()
+            self._write(key, documents)
+            with self._lock:
+                self.misses += 1
+                self.parse_seconds += time.perf_counter() - start
+        else:
+            with self._lock:
+                self.hits += 1
+                self.load_seconds += time.perf_counter() - start
+        if source is not None:
+            for doc in documents:
+                if "source" in doc.metadata:
+                    doc.metadata["source"] = source
+        return documents
+
+    def load_pdf(self, path: str) -> List[Document]:
+        """Páginas del PDF como las devuelve PyPDFLoader, sin leerlo si ya está en caché."""
+        from langchain_community.document_loaders import PyPDFLoader
+
+        version = pdf_loader_version()
+        key = self.entry_key("pages", self.file_hash(path), version)
+        return self.get_or_create(key, lambda: PyPDFLoader(str(path)).load(), source=str(path))
+
+    def split(self, path: str, pages: List[Document], text_splitter,
+              loader_version: Optional[str] = None) -> List[Document]:
+        """Chunks de las páginas de `path`, reutilizados mientras no cambien fichero, extractor ni splitter."""
+        key = self.entry_key("chunks", self.file_hash(path), loader_version or pdf_loader_version(),
+                             splitter_config(text_splitter))
+        return self.get_or_create(key, lambda: text_splitter.split_documents(pages), source=str(path))
+
+    def load_and_split(self, path: str, text_splitter) -> List[Document]:
+        """Chunks del PDF; si están en caché no se extraen las páginas."""
+        key = self.entry_key("chunks", self.file_hash(path), pdf_loader_version(),
+                             splitter_config(text_splitter))
+        return self.get_or_create(key, lambda: text_splitter.split_documents(self.load_pdf(path)),
+                                  source=str(path))
+
+    def stats(self) -> dict:
+        return {
+            "entries": sum(1 for _ in self.cache_dir.glob(f"*{self.suffix}")),
+            "hits": self.hits,
+            "misses": self.misses,
+            "parse_seconds": round(self.parse_seconds, 3),
+            "load_seconds": round(self.load_seconds, 3)
+        }
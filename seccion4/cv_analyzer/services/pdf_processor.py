@@ -1,20 +1,165 @@
 # pip2 install pyPDF2
 # hay paquetes que ya leen el pdf y me devuelve el texto de dentro
-import PyPDF2
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
+from typing import Iterator, List, Optional, Tuple
+
+import PyPDF2
+from langchain_core.documents import Document
+
+from services.document_cache import DocumentCache, bytes_hash
+
+# Presupuesto por CV: lo que pase de aquí no se envía al LLM (portfolios de 40 páginas)
+MAX_PAGINAS = 10
+MAX_CARACTERES = 40_000
+
+# Por debajo de este número de páginas no compensa repartir la extracción entre procesos
+# (cada proceso vuelve a abrir el PDF y resolver su árbol de páginas)
+MIN_PAGINAS_PARALELO = 6
+MAX_PROCESOS = min(4, os.cpu_count() or 1)
+PAGINAS_POR_TAREA = 4
+
+# Las páginas extraídas se guardan por hash del PDF: volver a subir el mismo CV no lo vuelve a leer.
+# Son datos personales: la caché caduca, está acotada y su carpeta se puede cambiar con CV_CACHE_DIR
+CACHE_DIR = os.environ.get("CV_CACHE_DIR",
+                           os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "document_cache"))
+CACHE_HORAS = 24
+CACHE_MAX_ENTRADAS = 200
+_cache = DocumentCache(CACHE_DIR, max_entries=CACHE_MAX_ENTRADAS, max_age=CACHE_HORAS * 3600)
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _obtener_pool() -> ProcessPoolExecutor:
+    """Pool de procesos compartido (crearlo en cada CV cuesta más que extraer un CV corto)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_PROCESOS)
+    return _pool
+
+def _extraer_rango(datos_pdf: bytes, inicio: int, fin: int) -> List[Tuple[int, str, float]]:
+    """Texto de las páginas [inicio, fin) con lo que tardó cada una. Se ejecuta en otro proceso."""
+    pdf_reader = PyPDF2.PdfReader(BytesIO(datos_pdf))
+    paginas = []
+    for indice in range(inicio, fin):
+        comienzo = time.perf_counter()
+        texto = pdf_reader.pages[indice].extract_text() or ""
+        paginas.append((indice + 1, texto, time.perf_counter() - comienzo))
+    return paginas
+
+def _paginas_en_serie(pdf_reader, paginas: int) -> Iterator[Tuple[int, str, float]]:
+    for indice in range(paginas):
+        comienzo = time.perf_counter()
+        texto = pdf_reader.pages[indice].extract_text() or ""
+        yield indice + 1, texto, time.perf_counter() - comienzo
+
+def _paginas_en_paralelo(datos_pdf: bytes, paginas: int) -> Iterator[Tuple[int, str, float]]:
+    """Tramos de PAGINAS_POR_TAREA páginas en el pool, enviados a medida que se consumen.
+
+    Solo hay MAX_PROCESOS tramos en vuelo: cuando el consumidor deja de pedir
+    páginas no se envían más y los que aún no han empezado se cancelan.
+    """
+    inicios = iter(range(0, paginas, PAGINAS_POR_TAREA))
+    en_vuelo = deque()
+
+    def enviar():
+        inicio = next(inicios, None)
+        if inicio is not None:
+            en_vuelo.append(_obtener_pool().submit(_extraer_rango, datos_pdf, inicio,
+                                                   min(inicio + PAGINAS_POR_TAREA, paginas)))
+
+    try:
+        for _ in range(MAX_PROCESOS):
+            enviar()
+        while en_vuelo:
+            tramo = en_vuelo.popleft().result()
+            enviar()
+            yield from tramo
+    finally:
+        for futuro in en_vuelo:
+            futuro.cancel()
+
+def iterar_paginas(datos_pdf: bytes, max_paginas: Optional[int] = MAX_PAGINAS,
+                   max_caracteres: Optional[int] = MAX_CARACTERES,
+                   pdf_reader=None) -> Iterator[Tuple[int, str, float]]:
+    """Genera (número de página, texto, segundos) en orden, respetando el presupuesto.
+
+    Las páginas se extraen a medida que se piden: al agotar el presupuesto de
+    caracteres la última página se recorta y no se extrae ninguna más. Con
+    muchas páginas se extraen por tramos en un pool de procesos. Se puede
+    pasar el PdfReader ya abierto para no volver a analizar el PDF.
+    """
+    pdf_reader = pdf_reader or PyPDF2.PdfReader(BytesIO(datos_pdf))
+    total = len(pdf_reader.pages)
+    paginas = min(total, max_paginas) if max_paginas else total
+
+    if paginas < MIN_PAGINAS_PARALELO or MAX_PROCESOS == 1:
+        fuente = _paginas_en_serie(pdf_reader, paginas)
+    else:
+        fuente = _paginas_en_paralelo(datos_pdf, paginas)
+
+    caracteres = 0
+    try:
+        for numero, texto, segundos in fuente:
+            if max_caracteres and caracteres + len(texto) >= max_caracteres:
+                yield numero, texto[:max_caracteres - caracteres], segundos
+                return
+            caracteres += len(texto)
+            yield numero, texto, segundos
+    finally:
+        fuente.close()
+
+def _paginas_con_presupuesto(datos_pdf: bytes, max_paginas: Optional[int],
+                             max_caracteres: Optional[int]) -> List[Document]:
+    pdf_reader = PyPDF2.PdfReader(BytesIO(datos_pdf))
+    total = len(pdf_reader.pages)
+    return [Document(page_content=texto,
+                     metadata={"page": numero, "segundos": round(segundos, 4), "paginas_totales": total})
+            for numero, texto, segundos in iterar_paginas(datos_pdf, max_paginas, max_caracteres, pdf_reader)]
+
+def extraer_texto_pdf_con_tiempos(archivo_pdf, max_paginas: Optional[int] = MAX_PAGINAS,
+                                  max_caracteres: Optional[int] = MAX_CARACTERES) -> Tuple[str, dict]:
+    """Texto del CV y un informe con las páginas leídas, si se recortó y lo que tardó cada página."""
+    comienzo = time.perf_counter()
+    datos_pdf = archivo_pdf.getvalue() if hasattr(archivo_pdf, "getvalue") else archivo_pdf.read()
+    clave = _cache.entry_key("pages", bytes_hash(datos_pdf), f"PyPDF2-{PyPDF2.__version__}",
+                             max_paginas, max_caracteres)
+    extraido = []
+
+    def extraer():
+        extraido.append(True)
+        return _paginas_con_presupuesto(datos_pdf, max_paginas, max_caracteres)
+
+    paginas = _cache.get_or_create(clave, extraer)
+    total = paginas[0].metadata["paginas_totales"] if paginas else 0
+
+    # Una sola concatenación al final en lugar de ir sumando cadenas página a página
+    texto_completo = "\n\n".join(
+        f"--- PÁGINA {pagina.metadata['page']} ---\n{pagina.page_content}"
+        for pagina in paginas if pagina.page_content.strip()
+    ).strip()
+
+    leidos = sum(len(pagina.page_content) for pagina in paginas)
+    informe = {
+        "paginas_totales": total,
+        "paginas_leidas": len(paginas),
+        "caracteres": leidos,
+        "recortado": len(paginas) < total or bool(max_caracteres and leidos >= max_caracteres),
+        "segundos_por_pagina": {pagina.metadata["page"]: pagina.metadata["segundos"] for pagina in paginas},
+        "segundos": round(time.perf_counter() - comienzo, 4),
+        "desde_cache": not extraido
+    }
+    return texto_completo, informe
 
 def extraer_texto_pdf(archivo_pdf):
     try:
-        pdf_reader = PyPDF2.PdfReader(BytesIO(archivo_pdf.read()))
-        texto_completo = ""
-        for numero_pagina, pagina in enumerate(pdf_reader.pages, 1):
-            texto_pagina = pagina.extract_text()
-            if texto_pagina.strip():
-                texto_completo += f"\n--- PÁGINA {numero_pagina} ---\n"
-                texto_completo += texto_pagina + "\n"
-        texto_completo = texto_completo.strip()
+        texto_completo, _ = extraer_texto_pdf_con_tiempos(archivo_pdf)
         if not texto_completo:
             return "Error: El PDF parece estar vacío o contener solo imágenes."
         return texto_completo
     except Exception as e:
-        return f"Error al procesar el archivo PDF: {str(e)}"
\ No newline at end of file
+        return f"Error al procesar el archivo PDF: {str(e)}"
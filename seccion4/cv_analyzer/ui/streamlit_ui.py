@@ -1,7 +1,7 @@
 import streamlit as st
 from models.cv_model import AnalisisCV
 from services.pdf_processor import extraer_texto_pdf
-from services.cv_evaluator import evaluar_candidato
+from services.cv_evaluator import evaluar_archivos_lote, evaluar_candidato
 
 def main():
     """Función principal que define la interfaz de usuario de Streamlit"""
@@ -39,15 +39,29 @@ def procesar_entrada():
     
     st.header("📋 Datos de Entrada")
     
-    archivo_cv = st.file_uploader(
-        "**1. Sube el CV del candidato (PDF)**",
-        type=['pdf'],
-        help="Selecciona un archivo PDF que contenga el currículum a evaluar. Asegúrate de que el texto sea legible y no esté en formato de imagen."
-    )
+    modo_lote = st.toggle("Evaluar varios CVs a la vez (modo lote)")
     
-    if archivo_cv is not None:
-        st.success(f"✅ Archivo cargado: {archivo_cv.name}")
-        st.info(f"📊 Tamaño: {archivo_cv.size:,} bytes")
+    if modo_lote:
+        archivo_cv = st.file_uploader(
+            "**1. Sube los CVs de los candidatos (PDF)**",
+            type=['pdf'],
+            accept_multiple_files=True,
+            help="Selecciona todos los currículums a evaluar para el mismo puesto."
+        )
+        
+        if archivo_cv:
+            st.success(f"✅ Archivos cargados: {len(archivo_cv)}")
+            st.info(f"📊 Tamaño total: {sum(a.size for a in archivo_cv):,} bytes")
+    else:
+        archivo_cv = st.file_uploader(
+            "**1. Sube el CV del candidato (PDF)**",
+            type=['pdf'],
+            help="Selecciona un archivo PDF que contenga el currículum a evaluar. Asegúrate de que el texto sea legible y no esté en formato de imagen."
+        )
+        
+        if archivo_cv is not None:
+            st.success(f"✅ Archivo cargado: {archivo_cv.name}")
+            st.info(f"📊 Tamaño: {archivo_cv.size:,} bytes")
     
     st.markdown("---")
     
@@ -85,15 +99,17 @@ def procesar_entrada():
     
     with col_btn1:
         analizar = st.button(
-            "🔍 Analizar Candidato", 
+            "🔍 Analizar Candidatos" if modo_lote else "🔍 Analizar Candidato", 
             type="primary",
             use_container_width=True
         )
     
     with col_btn2:
         if st.button("🗑️ Limpiar", use_container_width=True):
+            st.session_state.pop('resultados_lote', None)
             st.rerun()
     
+    st.session_state['modo_lote'] = modo_lote
     st.session_state['archivo_cv'] = archivo_cv
     st.session_state['descripcion_puesto'] = descripcion_puesto
     st.session_state['analizar'] = analizar
@@ -107,7 +123,7 @@ def mostrar_area_resultados():
         archivo_cv = st.session_state.get('archivo_cv')
         descripcion_puesto = st.session_state.get('descripcion_puesto', '').strip()
         
-        if archivo_cv is None:
+        if not archivo_cv:
             st.error("⚠️ Por favor sube un archivo PDF con el currículum")
             return
             
@@ -115,7 +131,12 @@ def mostrar_area_resultados():
             st.error("⚠️ Por favor proporciona una descripción detallada del puesto")
             return
         
-        procesar_analisis(archivo_cv, descripcion_puesto)
+        if st.session_state.get('modo_lote', False):
+            procesar_lote(archivo_cv, descripcion_puesto)
+        else:
+            procesar_analisis(archivo_cv, descripcion_puesto)
+    elif st.session_state.get('modo_lote', False) and st.session_state.get('resultados_lote'):
+        mostrar_ranking_lote(st.session_state['resultados_lote'])
     else:
         st.info("""
         👆 **Instrucciones:**
@@ -163,6 +184,59 @@ def procesar_analisis(archivo_cv, descripcion_puesto):
         
         mostrar_resultados(resultado)
 
+def tabla_ranking(resultados):
+    """Filas del ranking ordenadas por porcentaje de ajuste (la tabla se puede reordenar por columna)."""
+    filas = [
+        {
+            "Archivo": nombre,
+            "Candidato": resultado.nombre_candidato,
+            "Ajuste (%)": resultado.porcentaje_ajuste,
+            "Experiencia (años)": resultado.experiencia_años,
+            "Habilidades clave": ", ".join(resultado.habilidades_clave)
+        }
+        for nombre, resultado in resultados
+    ]
+    return sorted(filas, key=lambda fila: fila["Ajuste (%)"], reverse=True)
+
+def procesar_lote(archivos_cv, descripcion_puesto):
+    """Evalúa todos los CVs en paralelo y va actualizando el ranking según llegan los resultados"""
+    
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    tabla = st.empty()
+    
+    status_text.text(f"📄 Extrayendo y evaluando {len(archivos_cv)} CVs...")
+    
+    resultados = []
+    for nombre, resultado in evaluar_archivos_lote(archivos_cv, descripcion_puesto):
+        resultados.append((nombre, resultado))
+        progress_bar.progress(len(resultados) / len(archivos_cv))
+        status_text.text(f"📊 Evaluados {len(resultados)} de {len(archivos_cv)} candidatos...")
+        tabla.dataframe(tabla_ranking(resultados), use_container_width=True, hide_index=True)
+    
+    progress_bar.empty()
+    status_text.empty()
+    tabla.empty()
+    
+    st.session_state['resultados_lote'] = resultados
+    mostrar_ranking_lote(resultados)
+
+def mostrar_ranking_lote(resultados):
+    """Ranking de candidatos del lote y detalle del candidato seleccionado"""
+    
+    st.subheader("🏆 Ranking de Candidatos")
+    st.dataframe(tabla_ranking(resultados), use_container_width=True, hide_index=True)
+    
+    ordenados = sorted(resultados, key=lambda r: r[1].porcentaje_ajuste, reverse=True)
+    seleccion = st.selectbox(
+        "Ver el análisis completo de:",
+        range(len(ordenados)),
+        format_func=lambda i: f"{ordenados[i][1].nombre_candidato} ({ordenados[i][0]}) - {ordenados[i][1].porcentaje_ajuste}%"
+    )
+    
+    st.divider()
+    mostrar_resultados(ordenados[seleccion][1])
+
 def mostrar_resultados(resultado: AnalisisCV):
     """Muestra los resultados del análisis de manera estructurada y profesional"""
     
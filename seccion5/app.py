@@ -29,6 +29,30 @@ with st.sidebar:
     st.markdown("**🤖 Modelos:**")
     st.info("Consultas: GPT-4o-mini\nRespuestas: GPT-4o")
     
+    cache_stats = retriever_info["cache_expansiones"]
+    st.markdown("**⚡ Caché de expansiones:**")
+    st.info(f"Aciertos: {cache_stats['hits']} | Fallos: {cache_stats['misses']}\n"
+            f"Latencia ahorrada: {cache_stats['saved_seconds']} s")
+    
+    embeddings_stats = retriever_info["cache_embeddings"]
+    st.markdown("**🧮 Caché de embeddings:**")
+    st.info(f"Vectores: {embeddings_stats['vectors']} | Tasa de aciertos: {embeddings_stats['hit_rate']:.0%}")
+    
+    semantic_stats = retriever_info["cache_semantica"]
+    st.markdown("**🧠 Caché semántica de respuestas:**")
+    st.info(f"Entradas: {semantic_stats['entries']} | Aciertos: {semantic_stats['hits']} | "
+            f"Fallos: {semantic_stats['misses']}\n"
+            f"Latencia ahorrada: {semantic_stats['saved_seconds']} s")
+    
+    relevance_stats = retriever_info["filtro_relevancia"]
+    if relevance_stats:
+        st.markdown("**🎯 Filtro de relevancia:**")
+        st.info(f"Aceptados: {relevance_stats['auto_accepted']} | Descartados: {relevance_stats['auto_rejected']} | "
+                f"Juzgados por el LLM: {relevance_stats['llm_graded']}\n"
+                f"Llamadas al LLM evitadas: {relevance_stats['llm_calls_avoided']}")
+
+    use_semantic_cache = st.checkbox("Reutilizar respuestas de preguntas equivalentes", value=True)
+    
     st.divider()
     
     if st.button("🗑️ Limpiar Chat", type="secondary", use_container_width=True):
@@ -70,7 +94,7 @@ if prompt := st.chat_input("Escribe tu consulta sobre contratos de arrendamiento
     
     # Generar respuesta
     with st.spinner("🔍 Analizando..."):
-        response, docs = query_rag(prompt)
+        response, docs = query_rag(prompt, use_cache=use_semantic_cache)
         st.session_state.messages.append({"role": "assistant", "content": response, "docs": docs})
     
     # Recargar para mostrar los nuevos mensajes
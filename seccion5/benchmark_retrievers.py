@@ -0,0 +1,390 @@
+"""Benchmark offline de las configuraciones de recuperación del curso.
+
+Compara similarity, MMR, MultiQuery, el ensemble del asistente legal y la
+búsqueda del helpdesk (MultiQuery con RRF e híbrida con BM25) sobre los
+contratos de `contratos/` y la documentación de `../seccion6/docs`, con un
+conjunto de preguntas etiquetadas (`benchmark_preguntas.json`).
+
+Por defecto no hace ninguna llamada de red: los embeddings son un hashing
+local determinista y las variantes del MultiQuery las genera un LLM de
+reglas. Con --openai se usan los modelos reales de config.py.
+
+    python benchmark_retrievers.py
+    python benchmark_retrievers.py --corpus helpdesk --k 4 --json resultados.json
+"""
+import argparse
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
+from langchain_community.vectorstores import Chroma
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import SimpleChatModel
+from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
+from langchain.retrievers import EnsembleRetriever
+from langchain.retrievers.multi_query import MultiQueryRetriever
+
+from config import *
+from prompts import MULTI_QUERY_PROMPT
+from expansion_cache import ExpansionCache
+from retrieval import FusedMultiQueryRetriever, UnionMMRMultiQueryRetriever
+from token_splitter import TokenBudgetSplitter
+
+BASE_PATH = Path(__file__).resolve().parent
+CONTRATOS_PATH = BASE_PATH / "contratos"
+HELPDESK_PATH = BASE_PATH.parent / "seccion6"
+QUESTIONS_PATH = BASE_PATH / "benchmark_preguntas.json"
+
+# Los módulos del helpdesk se añaden al final del path para que los de esta
+# sección (config, embeddings_cache...) tengan prioridad
+sys.path.append(str(HELPDESK_PATH))
+from cache_rag import CacheExpansiones  # noqa: E402
+from indice_lexico import IndiceBM25, tokenizar  # noqa: E402
+from recuperacion import MultiQueryRetrieverRRF, PROMPT_MULTI_CONSULTA, RetrieverHibrido  # noqa: E402
+
+
+class HashingEmbeddings(Embeddings):
+    """Embeddings locales y deterministas para medir sin llamadas a la API.
+
+    Cada texto se representa con feature hashing de sus palabras (sin tildes
+    ni palabras vacías), de sus raíces de 5 letras y de sus bigramas, con
+    frecuencia sublineal y normalizado a norma 1. No es semántico, pero
+    reproduce el comportamiento léxico de un modelo real y siempre da los
+    mismos resultados.
+    """
+
+    def __init__(self, dimensions: int = 1024):
+        self.dimensions = dimensions
+        self.model = f"hashing-{dimensions}"
+
+    def _features(self, text: str) -> List[str]:
+        words = tokenizar(text)
+        return words + [w[:5] + "~" for w in words if len(w) > 5] + \
+            [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in self._features(text):
+            h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+            vector[h % self.dimensions] += 1.0 if h >> 63 else -1.0
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class TimedEmbeddings(Embeddings):
+    """Envuelve unos embeddings y acumula llamadas y segundos (seguro entre hilos)."""
+
+    def __init__(self, underlying: Embeddings):
+        self.underlying = underlying
+        self.calls = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _timed(self, fn: Callable, arg):
+        start = time.perf_counter()
+        result = fn(arg)
+        with self._lock:
+            self.calls += 1
+            self.seconds += time.perf_counter() - start
+        return result
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._timed(self.underlying.embed_documents, texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._timed(self.underlying.embed_query, text)
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.seconds = 0.0
+
+
+class VariantsChatModel(SimpleChatModel):
+    """LLM de reglas que devuelve 3 variantes deterministas de la consulta.
+
+    Sirve para los prompts de MultiQuery del curso (que terminan en
+    "Consulta original: ...") y para el prompt por defecto de LangChain.
+    `latency` simula el tiempo de respuesta de un modelo real.
+    """
+
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "variantes-locales"
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs) -> str:
+        text = messages[-1].content
+        match = re.search(r"(?:Consulta original|Original question):\s*(.+)", text)
+        question = match.group(1).strip() if match else text.strip()
+        keywords = tokenizar(question)
+        if self.latency:
+            time.sleep(self.latency)
+        return "\n".join([
+            " ".join(keywords),
+            "información sobre " + " ".join(keywords),
+            " ".join(reversed(keywords))
+        ])
+
+
+class LLMCallCounter(BaseCallbackHandler):
+    """Cuenta las llamadas al LLM y el tiempo que tardan."""
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self._starts: Dict[Any, float] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id):
+        with self._lock:
+            self.calls += 1
+            self._starts[run_id] = time.perf_counter()
+
+    def _end(self, run_id):
+        with self._lock:
+            start = self._starts.pop(run_id, None)
+            if start is not None:
+                self.seconds += time.perf_counter() - start
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+
+def load_contratos() -> List[Document]:
+    """Contratos en PDF divididos como en vector_stores.py."""
+    pages = []
+    for path in sorted(CONTRATOS_PATH.glob("*.pdf")):
+        pages.extend(PyPDFLoader(str(path)).load())
+    return TokenBudgetSplitter(chunk_tokens=1200, overlap_tokens=120).split_documents(pages)
+
+
+def load_helpdesk() -> List[Document]:
+    """Documentación del helpdesk dividida como en seccion6 (CHUNK_TOKENS=256, CHUNK_OVERLAP_TOKENS=32)."""
+    docs = []
+    for path in sorted((HELPDESK_PATH / "docs").glob("*.md")):
+        docs.extend(TextLoader(str(path), encoding="utf-8").load())
+    return TokenBudgetSplitter(chunk_tokens=256, overlap_tokens=32).split_documents(docs)
+
+
+CORPORA = {"contratos": load_contratos, "helpdesk": load_helpdesk}
+
+
+def build_vectorstore(corpus: str, chunks: List[Document], embeddings: Embeddings) -> Chroma:
+    """Colección de Chroma en memoria con IDs deterministas."""
+    ids = [hashlib.md5(f"{c.metadata['source']}\n{c.page_content}".encode()).hexdigest() for c in chunks]
+    return Chroma.from_documents(chunks, embeddings, ids=ids, collection_name=f"benchmark_{corpus}")
+
+
+def build_retrievers(vectorstore: Chroma, llm) -> Dict[str, Any]:
+    """Las configuraciones del curso, montadas igual que en sus scripts."""
+    # retrievers_langchain.py
+    similarity = vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": 2})
+
+    # multi_query_retriever.py
+    multi_query = MultiQueryRetriever.from_llm(retriever=similarity, llm=llm)
+
+    # rag_system.py (asistente legal): MMR + MultiQuery fusionado + EnsembleRetriever.
+    # Caché de expansiones vacía en memoria para medir las llamadas al LLM
+    mmr = vectorstore.as_retriever(
+        search_type=SEARCH_TYPE,
+        search_kwargs={"k": SEARCH_K, "lambda_mult": MMR_DIVERSITY_LAMBDA, "fetch_k": MMR_FETCH_K}
+    )
+    mmr_multi = FusedMultiQueryRetriever.from_llm_with_cache(
+        retriever=mmr,
+        llm=llm,
+        prompt=PromptTemplate.from_template(MULTI_QUERY_PROMPT),
+        cache=ExpansionCache(":memory:"),
+        vectorstore=vectorstore,
+        search_type=SEARCH_TYPE,
+        search_kwargs=mmr.search_kwargs,
+        max_concurrency=MAX_SEARCH_CONCURRENCY
+    )
+    union_mmr = UnionMMRMultiQueryRetriever.from_llm_with_cache(
+        retriever=mmr,
+        llm=llm,
+        prompt=PromptTemplate.from_template(MULTI_QUERY_PROMPT),
+        cache=ExpansionCache(":memory:"),
+        vectorstore=vectorstore,
+        k=MMR_UNION_K,
+        fetch_k=MMR_FETCH_K,
+        lambda_mult=MMR_DIVERSITY_LAMBDA
+    )
+    ensemble = EnsembleRetriever(
+        retrievers=[mmr_multi, vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": SEARCH_K})],
+        weights=[0.7, 0.3],
+        similarity_threshold=SIMILARITY_THRESHOLD
+    )
+
+    # seccion6/rag_system.py (helpdesk): MultiQuery con RRF y, encima, BM25
+    helpdesk_multi = MultiQueryRetrieverRRF.desde_llm(
+        retriever=vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": 4}),
+        llm=llm,
+        prompt=ChatPromptTemplate.from_template(PROMPT_MULTI_CONSULTA),
+        cache=CacheExpansiones(":memory:"),
+        vectorstore=vectorstore,
+        k=4
+    )
+    data = vectorstore.get(include=["documents", "metadatas"])
+    hybrid = RetrieverHibrido(
+        retriever_vectorial=helpdesk_multi,
+        indice=IndiceBM25.construir(data["ids"], data["documents"], data["metadatas"]),
+        k=4
+    )
+
+    return {
+        "similarity k=2": similarity,
+        "mmr λ=0.7 fetch_k=20": mmr,
+        "multi_query": multi_query,
+        "legal ensemble": ensemble,
+        "mmr unión multi_query": union_mmr,
+        "helpdesk multi_query rrf": helpdesk_multi,
+        "helpdesk híbrido bm25": hybrid
+    }
+
+
+def normalize(text: str) -> str:
+    """Misma forma Unicode (pypdf puede devolver las tildes descompuestas), espacios y minúsculas."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip().lower()
+
+
+def is_relevant(doc: Document, question: Dict[str, str]) -> bool:
+    """El chunk es de la fuente esperada y contiene el fragmento que responde la pregunta."""
+    if Path(doc.metadata.get("source", "")).name != question["fuente"]:
+        return False
+    return normalize(question["fragmento"]) in normalize(doc.page_content)
+
+
+def first_relevant_rank(docs: List[Document], question: Dict[str, str]) -> Optional[int]:
+    for rank, doc in enumerate(docs, 1):
+        if is_relevant(doc, question):
+            return rank
+    return None
+
+
+def run_configuration(retriever, questions: List[Dict[str, str]], embeddings: TimedEmbeddings,
+                      k: int) -> Dict[str, Any]:
+    """Ejecuta las preguntas una a una y agrega las métricas de la configuración."""
+    ranks, totals, embed_seconds, llm_seconds, llm_calls, embed_calls, returned = [], [], [], [], [], [], []
+
+    for question in questions:
+        counter = LLMCallCounter()
+        embeddings.reset()
+        start = time.perf_counter()
+        docs = retriever.invoke(question["pregunta"], config={"callbacks": [counter]})
+        totals.append(time.perf_counter() - start)
+        embed_seconds.append(embeddings.seconds)
+        embed_calls.append(embeddings.calls)
+        llm_seconds.append(counter.seconds)
+        llm_calls.append(counter.calls)
+        returned.append(len(docs))
+        ranks.append(first_relevant_rank(docs, question))
+
+    totals = np.array(totals)
+    embed_seconds = np.array(embed_seconds)
+    llm_seconds = np.array(llm_seconds)
+    # Lo que no es embeddings ni LLM: búsqueda en el índice, MMR, BM25 y fusión
+    search_seconds = np.maximum(totals - embed_seconds - llm_seconds, 0.0)
+    found = [r for r in ranks if r is not None]
+
+    return {
+        "preguntas": len(questions),
+        "recall@1": round(sum(r == 1 for r in found) / len(questions), 3),
+        f"recall@{k}": round(sum(r <= k for r in found) / len(questions), 3),
+        "recall": round(len(found) / len(questions), 3),
+        "mrr": round(sum(1.0 / r for r in found) / len(questions), 3),
+        "docs_devueltos": round(float(np.mean(returned)), 1),
+        "ms_total_p50": round(float(np.percentile(totals, 50)) * 1000, 1),
+        "ms_total_p95": round(float(np.percentile(totals, 95)) * 1000, 1),
+        "ms_embeddings": round(float(embed_seconds.mean()) * 1000, 1),
+        "ms_llm": round(float(llm_seconds.mean()) * 1000, 1),
+        "ms_busqueda": round(float(search_seconds.mean()) * 1000, 1),
+        "llamadas_embeddings": round(float(np.mean(embed_calls)), 2),
+        "llamadas_llm": round(float(np.mean(llm_calls)), 2),
+        "fallos": [q["pregunta"] for q, r in zip(questions, ranks) if r is None]
+    }
+
+
+def print_table(corpus: str, results: Dict[str, Dict[str, Any]], k: int):
+    columns = ["recall@1", f"recall@{k}", "mrr", "docs_devueltos", "ms_total_p50", "ms_embeddings",
+               "ms_llm", "ms_busqueda", "llamadas_llm"]
+    width = max(len(name) for name in results) + 2
+    print(f"\n=== {corpus} ({next(iter(results.values()))['preguntas']} preguntas) ===")
+    print("configuración".ljust(width) + "".join(c.rjust(15) for c in columns))
+    for name, metrics in results.items():
+        print(name.ljust(width) + "".join(str(metrics[c]).rjust(15) for c in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline de retrievers")
+    parser.add_argument("--corpus", choices=list(CORPORA), nargs="*", default=list(CORPORA))
+    parser.add_argument("--k", type=int, default=4, help="corte para recall@k")
+    parser.add_argument("--latencia-llm", type=float, default=0.0,
+                        help="segundos simulados por llamada del LLM local")
+    parser.add_argument("--openai", action="store_true",
+                        help="usar los modelos de OpenAI de config.py en lugar de los locales")
+    parser.add_argument("--json", help="guarda los resultados completos en este fichero")
+    args = parser.parse_args()
+
+    if args.openai:
+        from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+        from embeddings_cache import CachedEmbeddings
+        embeddings = TimedEmbeddings(CachedEmbeddings(OpenAIEmbeddings(model=EMBEDDING_MODEL), EMBEDDINGS_CACHE_PATH))
+        llm = ChatOpenAI(model=QUERY_MODEL, temperature=0)
+    else:
+        embeddings = TimedEmbeddings(HashingEmbeddings())
+        llm = VariantsChatModel(latency=args.latencia_llm)
+
+    questions = json.loads(QUESTIONS_PATH.read_text(encoding="utf-8"))
+    report = {}
+
+    for corpus in args.corpus:
+        chunks = CORPORA[corpus]()
+        vectorstore = build_vectorstore(corpus, chunks, embeddings)
+        corpus_questions = [q for q in questions if q["corpus"] == corpus]
+        print(f"\n{corpus}: {len(chunks)} chunks, {len(corpus_questions)} preguntas")
+
+        results = {}
+        for name, retriever in build_retrievers(vectorstore, llm).items():
+            results[name] = run_configuration(retriever, corpus_questions, embeddings, args.k)
+        report[corpus] = results
+        print_table(corpus, results, args.k)
+
+        for name, metrics in results.items():
+            for question in metrics["fallos"]:
+                print(f"  ✗ [{name}] {question}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nResultados guardados en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# Configuración de modelos
+EMBEDDING_MODEL = "text-embedding-3-large"
+QUERY_MODEL = "gpt-4o-mini"
+GENERATION_MODEL = "gpt-4o"
+
+# Configuración del vector store
+CHROMA_DB_PATH = "C:\\Users\\santiago\\curso_langchain\\Tema 3\\chroma_db"
+VECTOR_STORE_BACKEND = "chroma"  # "chroma" o "numpy" (matriz en memoria mapeada, búsqueda exacta)
+NUMPY_STORE_PATH = "C:\\Users\\santiago\\curso_langchain\\Tema 3\\numpy_store"
+
+# Configuración del retriever
+SEARCH_TYPE = "mmr"
+MMR_DIVERSITY_LAMBDA = 0.7
+MMR_FETCH_K = 20
+SEARCH_K = 2
+
+# Una sola MMR sobre la unión de candidatos de todas las variantes del MultiQuery
+# (en lugar de una MMR por variante fusionadas con RRF)
+MMR_UNION = True
+MMR_UNION_K = 4  # documentos que devuelve la MMR sobre la unión
+
+# Configuracion alternativa para retriever hibrido
+ENABLE_HYBRID_SEARCH = True
+SIMILARITY_THRESHOLD = 0.70
+
+# Índice de entidades (personas y direcciones) construido en la ingesta
+ENABLE_ENTITY_ROUTING = True
+ENTITY_INDEX_FILE = "entity_index.json"  # junto al vector store
+ENTITY_ROUTER_K = 4  # chunks devueltos para una consulta que nombra una entidad
+
+# Filtro de relevancia: señales vectorizadas y una sola llamada al LLM para los fragmentos dudosos
+ENABLE_RELEVANCE_FILTER = True
+RELEVANCE_ACCEPT_THRESHOLD = 0.55  # se acepta sin LLM por encima de esta puntuación
+RELEVANCE_REJECT_THRESHOLD = 0.30  # se descarta sin LLM por debajo de esta puntuación
+RELEVANCE_LEXICAL_WEIGHT = 0.3  # peso del solapamiento léxico frente a la similitud coseno
+
+# Caché de expansiones del MultiQueryRetriever
+EXPANSION_CACHE_PATH = "expansion_cache.db"
+
+# Caché de embeddings en disco (direccionada por contenido)
+EMBEDDINGS_CACHE_PATH = "embeddings_cache"
+
+# Caché semántica de respuestas: preguntas parafraseadas reutilizan la respuesta ya generada
+SEMANTIC_CACHE_ENABLED = True
+SEMANTIC_CACHE_THRESHOLD = 0.92  # similitud coseno mínima entre preguntas
+SEMANTIC_CACHE_MAX_ENTRIES = 1000
+
+# Búsquedas concurrentes de las variantes del MultiQueryRetriever
+MAX_SEARCH_CONCURRENCY = 4
@@ -0,0 +1,298 @@
+import hashlib
+import io
+import json
+import mimetypes
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from langchain_core.documents import Document
+
+from incremental_index import chunk_id
+
+FOLDER_MIME = "application/vnd.google-apps.folder"
+GOOGLE_DOC_MIME = "application/vnd.google-apps.document"
+GOOGLE_SHEET_MIME = "application/vnd.google-apps.spreadsheet"
+PDF_MIME = "application/pdf"
+
+# Formatos que se indexan (los mismos que cargaba GoogleDriveLoader: documentos, hojas y PDFs,
+# más texto plano). Imágenes, zips, presentaciones, etc. se ignoran.
+EXPORT_MIME_TYPES = {GOOGLE_DOC_MIME: "text/plain", GOOGLE_SHEET_MIME: "text/csv"}
+SUPPORTED_MIME_TYPES = frozenset([*EXPORT_MIME_TYPES, PDF_MIME, "text/plain", "text/markdown", "text/csv"])
+SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
+
+
+class GoogleDriveClient:
+    """Acceso mínimo a la API de Google Drive v3: listar una carpeta y descargar ficheros.
+
+    Usa las mismas credenciales OAuth (credentials.json / token.json) que
+    GoogleDriveLoader. El cliente HTTP de googleapiclient no es seguro entre
+    hilos, así que cada hilo de descarga crea su propio servicio.
+    """
+
+    def __init__(self, credentials_path: str, token_path: str):
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
+        creds = None
+        if Path(token_path).exists():
+            creds = Credentials.from_authorized_user_file(token_path, SCOPES)
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+            else:
+                creds = InstalledAppFlow.from_client_secrets_file(credentials_path, SCOPES).run_local_server(port=0)
+            Path(token_path).write_text(creds.to_json())
+        self.creds = creds
+        self._local = threading.local()
+
+    @property
+    def service(self):
+        if not hasattr(self._local, "service"):
+            from googleapiclient.discovery import build
+            self._local.service = build("drive", "v3", credentials=self.creds, cache_discovery=False)
+        return self._local.service
+
+    def list_files(self, folder_id: str, recursive: bool = True) -> Iterator[dict]:
+        """Metadatos (id, name, mimeType, modifiedTime, md5Checksum) de los ficheros de la carpeta."""
+        folders = [folder_id]
+        while folders:
+            parent = folders.pop()
+            page_token = None
+            while True:
+                response = self.service.files().list(
+                    q=f"'{parent}' in parents and trashed = false",
+                    fields="nextPageToken, files(id, name, mimeType, modifiedTime, md5Checksum)",
+                    pageSize=1000,
+                    pageToken=page_token,
+                    supportsAllDrives=True,
+                    includeItemsFromAllDrives=True
+                ).execute()
+                for file in response.get("files", []):
+                    if file["mimeType"] == FOLDER_MIME:
+                        if recursive:
+                            folders.append(file["id"])
+                    else:
+                        yield file
+                page_token = response.get("nextPageToken")
+                if not page_token:
+                    break
+
+    def download(self, file: dict) -> bytes:
+        """Contenido del fichero; los Google Docs se exportan a texto plano y las hojas a CSV."""
+        from googleapiclient.http import MediaIoBaseDownload
+
+        if file["mimeType"] in EXPORT_MIME_TYPES:
+            request = self.service.files().export_media(fileId=file["id"],
+                                                        mimeType=EXPORT_MIME_TYPES[file["mimeType"]])
+        else:
+            request = self.service.files().get_media(fileId=file["id"], supportsAllDrives=True)
+        buffer = io.BytesIO()
+        downloader = MediaIoBaseDownload(buffer, request)
+        done = False
+        while not done:
+            _, done = downloader.next_chunk()
+        return buffer.getvalue()
+
+
+class LocalFakeDrive:
+    """Carpeta local que se comporta como la API de Drive (para probar la sincronización).
+
+    El ID de cada fichero es su ruta relativa, modifiedTime sale del mtime y
+    md5Checksum del contenido. Cuenta las descargas en `downloads`.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.downloads = 0
+        self._lock = threading.Lock()
+
+    def list_files(self, folder_id: str = "", recursive: bool = True) -> Iterator[dict]:
+        base = self.root / folder_id
+        for path in sorted(base.rglob("*") if recursive else base.glob("*")):
+            if not path.is_file():
+                continue
+            yield {
+                "id": path.relative_to(self.root).as_posix(),
+                "name": path.name,
+                "mimeType": mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+                "modifiedTime": datetime.fromtimestamp(path.stat().st_mtime, timezone.utc).isoformat(),
+                "md5Checksum": hashlib.md5(path.read_bytes()).hexdigest()
+            }
+
+    def download(self, file: dict) -> bytes:
+        with self._lock:
+            self.downloads += 1
+        return (self.root / file["id"]).read_bytes()
+
+
+def parse_drive_file(file: dict, data: bytes) -> List[Document]:
+    """Convierte un fichero descargado en documentos (una página por documento en los PDFs)."""
+    metadata = {
+        "source": f"https://drive.google.com/file/d/{file['id']}/view",
+        "title": file["name"],
+        "file_id": file["id"],
+        "when": file["modifiedTime"]
+    }
+    if file["mimeType"] == PDF_MIME:
+        from pypdf import PdfReader
+        reader = PdfReader(io.BytesIO(data))
+        return [Document(page_content=page.extract_text() or "", metadata={**metadata, "page": i})
+                for i, page in enumerate(reader.pages)]
+    return [Document(page_content=data.decode("utf-8", errors="replace"), metadata=metadata)]
+
+
+class DriveSync:
+    """Sincronización incremental de una carpeta de Google Drive.
+
+    Guarda en un manifiesto local el modifiedTime, el md5 y los IDs de chunk
+    de cada fichero. En cada ejecución solo lista la carpeta, descarga en un
+    pool de hilos los ficheros nuevos o modificados y emite eventos
+    "add" / "update" / "delete" con sus documentos. Un fichero con otro
+    modifiedTime pero el mismo md5 no se descarga y los formatos que no están
+    en SUPPORTED_MIME_TYPES se ignoran. Como mucho hay 2 × max_workers
+    descargas en vuelo, así que la memoria no crece con el tamaño de la
+    carpeta. La entrada del manifiesto de cada fichero solo se actualiza
+    cuando el consumidor ha procesado su evento y el manifiesto se guarda cada
+    `save_every` eventos, así que una sincronización interrumpida se retoma
+    donde quedó.
+
+        sync = DriveSync(GoogleDriveClient(credentials, token), folder_id, "drive_manifest.json")
+        stats = sync.sync_vectorstore(vectorstore, text_splitter)
+    """
+
+    def __init__(self, client, folder_id: str, manifest_path: str, max_workers: int = 8,
+                 recursive: bool = True, save_every: int = 50):
+        self.client = client
+        self.folder_id = folder_id
+        self.manifest_path = Path(manifest_path)
+        self.max_workers = max_workers
+        self.recursive = recursive
+        self.save_every = save_every
+        self._committed = 0
+        self.stats: Dict[str, int] = {}
+        self.manifest: Dict[str, dict] = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, dict]:
+        if self.manifest_path.exists():
+            return json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        return {}
+
+    def _save_manifest(self):
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        self.manifest_path.write_text(json.dumps(self.manifest, indent=2), encoding="utf-8")
+
+    def _changed(self, file: dict) -> bool:
+        entry = self.manifest.get(file["id"])
+        if entry is None:
+            return True
+        if entry["modifiedTime"] == file["modifiedTime"]:
+            return False
+        # Los Google Docs no tienen md5: cualquier cambio de fecha obliga a descargar
+        if file.get("md5Checksum") and entry.get("md5") == file["md5Checksum"]:
+            entry["modifiedTime"] = file["modifiedTime"]
+            return False
+        return True
+
+    def _fetch(self, file: dict) -> List[Document]:
+        return parse_drive_file(file, self.client.download(file))
+
+    def _commit(self, event: dict):
+        self._committed += 1
+        if event["type"] == "delete":
+            self.manifest.pop(event["file_id"], None)
+        else:
+            file = event["file"]
+            self.manifest[file["id"]] = {
+                "name": file["name"],
+                "modifiedTime": file["modifiedTime"],
+                "md5": file.get("md5Checksum"),
+                "chunk_ids": event.get("chunk_ids", [])
+            }
+        if self._committed % self.save_every == 0:
+            self._save_manifest()
+
+    def events(self) -> Iterator[dict]:
+        """Emite primero los borrados y después las altas y cambios según terminan sus descargas."""
+        listed = list(self.client.list_files(self.folder_id, self.recursive))
+        # Los formatos no admitidos cuentan como ausentes: si se indexaron antes, se borran
+        current = {file["id"]: file for file in listed if file["mimeType"] in SUPPORTED_MIME_TYPES}
+        self.stats = {"listed": len(listed), "skipped": len(listed) - len(current), "unchanged": 0,
+                      "added": 0, "updated": 0, "deleted": 0, "errors": 0}
+
+        try:
+            for file_id in [f for f in self.manifest if f not in current]:
+                event = {"type": "delete", "file_id": file_id, "name": self.manifest[file_id]["name"],
+                         "chunk_ids": self.manifest[file_id]["chunk_ids"]}
+                yield event
+                self._commit(event)
+                self.stats["deleted"] += 1
+
+            changed = [file for file in current.values() if self._changed(file)]
+            self.stats["unchanged"] = len(current) - len(changed)
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                pending = {}
+                files = iter(changed)
+                while True:
+                    # Ventana acotada: no se descarga más de lo que el consumidor puede procesar
+                    for file in files:
+                        pending[pool.submit(self._fetch, file)] = file
+                        if len(pending) >= 2 * self.max_workers:
+                            break
+                    if not pending:
+                        break
+
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        file = pending.pop(future)
+                        try:
+                            documents = future.result()
+                        except Exception as e:
+                            # Se reintenta en la próxima sincronización (el manifiesto no cambia)
+                            print(f"Error descargando {file['name']}: {e}")
+                            self.stats["errors"] += 1
+                            continue
+                        kind = "update" if file["id"] in self.manifest else "add"
+                        event = {"type": kind, "file": file, "documents": documents,
+                                 "chunk_ids": self.manifest.get(file["id"], {}).get("chunk_ids", [])}
+                        yield event
+                        self._commit(event)
+                        self.stats["added" if kind == "add" else "updated"] += 1
+        finally:
+            self._save_manifest()
+
+    def sync_vectorstore(self, vectorstore, text_splitter, scheduler=None) -> Dict[str, int]:
+        """Aplica los eventos a un vector store: upsert de los chunks nuevos y borrado de los obsoletos."""
+        added_chunks = deleted_chunks = 0
+        for event in self.events():
+            old_ids = set(event["chunk_ids"])
+            if event["type"] == "delete":
+                if old_ids:
+                    vectorstore.delete(ids=list(old_ids))
+                deleted_chunks += len(old_ids)
+                continue
+
+            chunks = text_splitter.split_documents(event["documents"])
+            ids = []
+            for chunk in chunks:
+                chunk.metadata["chunk_id"] = chunk_id(event["file"]["id"], chunk.page_content)
+                ids.append(chunk.metadata["chunk_id"])
+            new = {i: c for i, c in zip(ids, chunks) if i not in old_ids}
+            stale = list(old_ids - set(ids))
+
+            if stale:
+                vectorstore.delete(ids=stale)
+            if new:
+                if scheduler:
+                    scheduler.ingest(vectorstore, list(new.values()), list(new))
+                else:
+                    vectorstore.add_documents(list(new.values()), ids=list(new))
+            event["chunk_ids"] = list(dict.fromkeys(ids))
+            added_chunks += len(new)
+            deleted_chunks += len(stale)
+
+        return {**self.stats, "added_chunks": added_chunks, "deleted_chunks": deleted_chunks}
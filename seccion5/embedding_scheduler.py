@@ -0,0 +1,173 @@
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+import openai
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+# Errores transitorios de la API que merece la pena reintentar; el resto (clave
+# inválida, petición mal formada, entrada demasiado larga...) falla a la primera
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                    openai.InternalServerError)
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """Tokenizador de los modelos de embeddings de OpenAI, o None si no está disponible."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Número de tokens del texto."""
+    encoding = get_encoding()
+    if encoding is None:
+        # Aproximación habitual cuando tiktoken (o su fichero BPE) no está disponible
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+class TokenBucket:
+    """Cubo de tokens que limita el consumo a `per_minute` unidades por minuto."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float):
+        """Bloquea hasta poder consumir `amount` unidades."""
+        # Una petición mayor que el cubo entero nunca cabría: se limita a su capacidad
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                wait = (amount - self.available) / self.rate
+            time.sleep(wait)
+
+
+class EmbeddingScheduler:
+    """Planificador de embeddings para indexar muchos chunks respetando los límites de la API.
+
+    Agrupa los chunks en lotes por número de tokens (no por número de
+    documentos), lanza hasta `max_concurrency` peticiones a la vez, respeta
+    los presupuestos RPM/TPM con dos cubos de tokens, reintenta con backoff
+    exponencial solo los errores transitorios (`retryable_errors`) y escribe
+    cada lote en el vector store en cuanto termina.
+
+        scheduler = EmbeddingScheduler(OpenAIEmbeddings(model="text-embedding-3-large"))
+        stats = scheduler.ingest(vectorstore, chunks, ids)
+    """
+
+    def __init__(self, embeddings: Embeddings, max_batch_tokens: int = 50_000,
+                 max_batch_size: int = 512, max_concurrency: int = 4,
+                 requests_per_minute: int = 3000, tokens_per_minute: int = 1_000_000,
+                 max_retries: int = 5, backoff_seconds: float = 1.0,
+                 retryable_errors: Tuple[Type[BaseException], ...] = RETRYABLE_ERRORS):
+        self.embeddings = embeddings
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.retryable_errors = retryable_errors
+        self.requests_bucket = TokenBucket(requests_per_minute)
+        self.tokens_bucket = TokenBucket(tokens_per_minute)
+
+    def make_batches(self, documents: List[Document],
+                     ids: List[str]) -> List[Tuple[List[Document], List[str], int]]:
+        """Agrupa los documentos en lotes de como mucho `max_batch_tokens` tokens."""
+        batches = []
+        batch_docs, batch_ids, batch_tokens = [], [], 0
+        for doc, doc_id in zip(documents, ids):
+            tokens = doc.metadata.get("tokens") or count_tokens(doc.page_content)
+            if batch_docs and (batch_tokens + tokens > self.max_batch_tokens
+                               or len(batch_docs) >= self.max_batch_size):
+                batches.append((batch_docs, batch_ids, batch_tokens))
+                batch_docs, batch_ids, batch_tokens = [], [], 0
+            batch_docs.append(doc)
+            batch_ids.append(doc_id)
+            batch_tokens += tokens
+        if batch_docs:
+            batches.append((batch_docs, batch_ids, batch_tokens))
+        return batches
+
+    def embed_batch(self, documents: List[Document], tokens: int) -> Tuple[List[List[float]], int]:
+        """Embebe un lote respetando los límites y reintentando los fallos transitorios."""
+        for attempt in range(self.max_retries + 1):
+            self.requests_bucket.acquire(1)
+            self.tokens_bucket.acquire(tokens)
+            try:
+                return self.embeddings.embed_documents([d.page_content for d in documents]), attempt
+            except self.retryable_errors:
+                if attempt == self.max_retries:
+                    raise
+                # Backoff exponencial con jitter para no reintentar todos a la vez
+                time.sleep(self.backoff_seconds * 2 ** attempt * (1 + random.random()))
+
+    def ingest(self, vectorstore, documents: List[Document], ids: Optional[List[str]] = None,
+               on_batch: Optional[Callable[[Dict[str, float]], None]] = None) -> Dict[str, float]:
+        """Embebe los documentos y los escribe en el vector store lote a lote."""
+        ids = ids or [str(uuid.uuid4()) for _ in documents]
+        batches = self.make_batches(documents, ids)
+        stats = {"chunks": 0, "tokens": 0, "batches": 0, "retries": 0}
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_concurrency)) as pool:
+            futures = {pool.submit(self.embed_batch, docs, tokens): (docs, batch_ids, tokens)
+                       for docs, batch_ids, tokens in batches}
+            for future in as_completed(futures):
+                docs, batch_ids, tokens = futures[future]
+                vectors, retries = future.result()
+
+                # Las escrituras se hacen desde este hilo: el vector store recibe un lote cada vez
+                self.write_batch(vectorstore, docs, batch_ids, vectors)
+
+                stats["chunks"] += len(docs)
+                stats["tokens"] += tokens
+                stats["batches"] += 1
+                stats["retries"] += retries
+                if on_batch:
+                    on_batch(self._throughput(stats, start))
+
+        return self._throughput(stats, start)
+
+    @staticmethod
+    def write_batch(vectorstore, documents: List[Document], ids: List[str], vectors: List[List[float]]):
+        """Guarda un lote ya embebido sin volver a llamar al modelo de embeddings."""
+        texts = [d.page_content for d in documents]
+        if hasattr(vectorstore, "add_embeddings"):
+            vectorstore.add_embeddings(texts, vectors, [d.metadata for d in documents], ids)
+        else:
+            # Chroma
+            vectorstore._collection.upsert(
+                ids=ids,
+                embeddings=vectors,
+                documents=texts,
+                metadatas=[d.metadata or None for d in documents]
+            )
+
+    @staticmethod
+    def _throughput(stats: Dict[str, float], start: float) -> Dict[str, float]:
+        seconds = max(time.perf_counter() - start, 1e-9)
+        return {
+            **stats,
+            "seconds": round(seconds, 2),
+            "chunks_per_second": round(stats["chunks"] / seconds, 1),
+            "tokens_per_second": round(stats["tokens"] / seconds, 1)
+        }
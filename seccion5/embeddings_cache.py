@@ -0,0 +1,213 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+@contextmanager
+def file_lock(path: Path):
+    """Bloqueo exclusivo entre procesos sobre un fichero auxiliar (fcntl en POSIX, msvcrt en Windows)."""
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK se rinde tras 10 s: se vuelve a intentar
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class CachedEmbeddings(Embeddings):
+    """Envoltorio de un modelo de embeddings con caché en disco direccionada por contenido.
+
+    Cada texto se identifica por sha256(texto) dentro de un espacio de nombres
+    (modelo + dimensiones). Los vectores se guardan en un fichero binario de
+    float32 que se lee con memoria mapeada y las claves en un índice de
+    digests de 32 bytes con el mismo orden. Las consultas repetidas se
+    sirven además desde un LRU en memoria. Varios procesos pueden compartir el
+    directorio: las escrituras se serializan con un bloqueo de fichero y la
+    fila de cada vector se calcula a partir del tamaño en disco.
+
+    Se puede usar en cualquier sitio donde hoy se pasa un objeto Embeddings:
+        CachedEmbeddings(OpenAIEmbeddings(model="text-embedding-3-large"))
+    """
+
+    def __init__(self, underlying: Embeddings, cache_dir: str = "embeddings_cache",
+                 lru_size: int = 1024):
+        self.underlying = underlying
+        model = getattr(underlying, "model", type(underlying).__name__)
+        dimensions = getattr(underlying, "dimensions", None)
+        namespace = hashlib.sha256(f"{model}:{dimensions}".encode()).hexdigest()[:16]
+
+        self.path = Path(cache_dir) / namespace
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.path / "vectors.f32"
+        self._keys_path = self.path / "keys.bin"
+        self._meta_path = self.path / "meta.json"
+        self._lock_path = self.path / "lock"
+
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        self._lru_size = lru_size
+        self.hits = 0
+        self.lru_hits = 0
+        self.misses = 0
+
+        self._dim: Optional[int] = None
+        self._index: Dict[bytes, int] = {}
+        self._rows = 0
+        self._vectors: Optional[np.memmap] = None
+        self._load()
+
+    def _load(self):
+        self._sync()
+        self._remap()
+
+    def _disk_rows(self) -> int:
+        """Filas completas en ambos ficheros (una escritura interrumpida puede dejar una a medias)."""
+        if not (self._dim and self._keys_path.exists() and self._vectors_path.exists()):
+            return 0
+        return min(self._keys_path.stat().st_size // 32,
+                   self._vectors_path.stat().st_size // (4 * self._dim))
+
+    def _sync(self):
+        """Incorpora al índice las filas que otros procesos hayan añadido desde la última lectura."""
+        if self._dim is None and self._meta_path.exists():
+            self._dim = json.loads(self._meta_path.read_text())["dim"]
+        known, rows = self._rows, self._disk_rows()
+        if rows > known:
+            with open(self._keys_path, "rb") as f:
+                f.seek(known * 32)
+                keys = f.read((rows - known) * 32)
+            for i in range(rows - known):
+                self._index.setdefault(keys[i * 32:(i + 1) * 32], known + i)
+            self._rows = rows
+
+    def _remap(self):
+        """Vuelve a mapear el fichero de vectores tras añadir filas."""
+        if self._dim and self._rows and self._vectors_path.exists():
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                                      shape=(self._rows, self._dim))
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.sha256(text.encode()).digest()
+
+    def _append(self, keys: List[bytes], vectors: List[List[float]]):
+        """Añade vectores nuevos al final de los ficheros de la caché.
+
+        Con el bloqueo de fichero tomado se leen las filas de otros procesos,
+        se recortan las filas a medias de una escritura interrumpida y la
+        fila de inicio sale del tamaño en disco, no del índice en memoria.
+        """
+        matrix = np.asarray(vectors, dtype=np.float32)
+        with file_lock(self._lock_path):
+            self._sync()
+            if self._dim is None:
+                self._dim = matrix.shape[1]
+                self._meta_path.write_text(json.dumps({"dim": self._dim}))
+
+            # Otro proceso puede haber guardado ya alguno de estos textos
+            new = [(k, row) for k, row in zip(keys, matrix) if k not in self._index]
+            if new:
+                start = self._disk_rows()
+                for path, size in ((self._vectors_path, 4 * self._dim), (self._keys_path, 32)):
+                    # Solo hay que recortar tras una escritura interrumpida; en Windows no se
+                    # puede acortar un fichero con una vista mapeada, así que se suelta la nuestra
+                    if path.exists() and path.stat().st_size > start * size:
+                        self._vectors = None
+                        with open(path, "ab") as f:
+                            f.truncate(start * size)
+                with open(self._vectors_path, "ab") as f:
+                    f.write(np.stack([row for _, row in new]).tobytes())
+                with open(self._keys_path, "ab") as f:
+                    f.write(b"".join(k for k, _ in new))
+                for offset, (key, _) in enumerate(new):
+                    self._index[key] = start + offset
+                self._rows = start + len(new)
+        self._remap()
+
+    def _get(self, key: bytes) -> Optional[List[float]]:
+        row = self._index.get(key)
+        if row is None:
+            return None
+        return self._vectors[row].tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(t) for t in texts]
+        with self._lock:
+            found = {k: self._get(k) for k in dict.fromkeys(keys)}
+
+        # Solo se envían al modelo los textos distintos que no están en caché
+        missing = [k for k, v in found.items() if v is None]
+        self.hits += len(texts) - sum(1 for k in keys if found[k] is None)
+        self.misses += len(missing)
+
+        if missing:
+            missing_texts = {k: t for k, t in zip(keys, texts) if found[k] is None}
+            vectors = self.underlying.embed_documents([missing_texts[k] for k in missing])
+            # Se devuelven en float32, igual que cuando se leen de la caché
+            vectors = np.asarray(vectors, dtype=np.float32).tolist()
+            with self._lock:
+                # Otro hilo puede haber guardado alguno mientras tanto
+                new = [(k, v) for k, v in zip(missing, vectors) if k not in self._index]
+                if new:
+                    self._append([k for k, _ in new], [v for _, v in new])
+            found.update(zip(missing, vectors))
+
+        return [found[k] for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.lru_hits += 1
+                return self._lru[key]
+            vector = self._get(key)
+
+        if vector is None:
+            self.misses += 1
+            vector = np.asarray(self.underlying.embed_query(text), dtype=np.float32).tolist()
+            with self._lock:
+                if key not in self._index:
+                    self._append([key], [vector])
+        else:
+            self.hits += 1
+
+        with self._lock:
+            self._lru[key] = vector
+            if len(self._lru) > self._lru_size:
+                self._lru.popitem(last=False)
+        return vector
+
+    def stats(self) -> dict:
+        """Métricas de aciertos de la caché."""
+        total = self.hits + self.lru_hits + self.misses
+        return {
+            "vectors": len(self._index),
+            "disk_hits": self.hits,
+            "lru_hits": self.lru_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.lru_hits) / total, 3) if total else 0.0
+        }
@@ -1,16 +1,41 @@
 from langchain_openai import OpenAIEmbeddings
-import numpy as np
+
+from similarity import embed_normalized, near_duplicate_clusters, similarity_matrix, top_k_similar
 
 embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
 
 texto1 = "La capital de Francia es París."
 texto2 = "París es un nombre común para mascotas."
 
-vec1 = embeddings.embed_query(texto1)
-vec2 = embeddings.embed_query(texto2)
+# Una sola llamada a la API para todos los textos, ya normalizados
+vec1, vec2 = embed_normalized(embeddings, [texto1, texto2])
 
 print(f"Dimensión de los vectores: {len(vec1)}")
 
-cos_sim = np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
+# Con vectores normalizados la similitud coseno es el producto escalar
+cos_sim = float(vec1 @ vec2)
+
+print(f"Similitud coseno entre vec1 y vec2: {cos_sim:.3f}")
+
+# Deduplicación de preguntas frecuentes: matriz de similitudes, vecinos y casi duplicados
+faqs = [
+    "¿Cómo restablezco mi contraseña?",
+    "He olvidado mi contraseña, ¿cómo la cambio?",
+    "¿Cómo cambio la contraseña de mi cuenta?",
+    "La impresora de la tercera planta no imprime.",
+    "No puedo imprimir en la impresora de la planta 3.",
+    "¿Cuál es el horario de atención del soporte?"
+]
+
+vectores = embed_normalized(embeddings, faqs)
+
+print("\nMatriz de similitudes:")
+print(similarity_matrix(vectores).round(2))
+
+indices, similitudes = top_k_similar(vectores, k=1)
+for faq, i, sim in zip(faqs, indices[:, 0], similitudes[:, 0]):
+    print(f"{faq!r} → {faqs[i]!r} ({sim:.3f})")
 
-print(f"Similitud coseno entre vec1 y vec2: {cos_sim:.3f}")
\ No newline at end of file
+print("\nGrupos de casi duplicados:")
+for grupo in near_duplicate_clusters(vectores, threshold=0.6):
+    print([faqs[i] for i in grupo])
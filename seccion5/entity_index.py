@@ -0,0 +1,254 @@
+import json
+import re
+import unicodedata
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from prompts import ENTITY_EXTRACTION_PROMPT
+
+# Campos de la respuesta de ENTITY_EXTRACTION_PROMPT
+ENTITY_FIELDS = {
+    "PERSONAS": "persons",
+    "DIRECCIONES": "addresses",
+    "IMPORTES": "amounts",
+    "FECHAS": "dates",
+    "DURACION": "duration",
+    "TIPO": "property_type"
+}
+
+# Solo se enrutan las consultas por persona o dirección; el resto queda como ficha del contrato
+INDEXED_FIELDS = ("persons", "addresses")
+
+# Palabras que no identifican a nadie por sí solas (tratamientos, tipos de vía, conectores)
+GENERIC_TOKENS = frozenset("""
+d da don dona sr sra s l sl sa y e de del la las el los en a al n no num numero
+calle c av avda avenida plaza paseo passeig carrer camino ronda via gran planta
+piso puerta bajo baja espana
+""".split())
+
+MAX_KEY_TOKENS = 8
+
+
+def normalize_entity(text: str) -> List[str]:
+    """Tokens en minúsculas y sin tildes ni signos ("Dª. María" → ["da", "maria"])."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r"\w+", text)
+
+
+def parse_entities(response: str) -> Dict[str, List[str]]:
+    """Convierte la respuesta del prompt de extracción en listas por campo.
+
+    Admite "CAMPO: [a; b]", "CAMPO: a, b" y listas con viñetas debajo del campo.
+    """
+    entities: Dict[str, List[str]] = {field: [] for field in ENTITY_FIELDS.values()}
+    field = None
+    for line in response.splitlines():
+        header = re.match(r"^\W*([A-ZÁÉÍÓÚ]+)\W*:\s*(.*)$", line.strip())
+        name = "".join(normalize_entity(header.group(1))).upper() if header else None
+        if name in ENTITY_FIELDS:
+            field = ENTITY_FIELDS[name]
+            value = header.group(2)
+        elif field and re.match(r"^\s*[-*•]", line):
+            value = line.strip().lstrip("-*• ")
+        else:
+            continue
+
+        value = value.strip().strip("*").strip().strip("[]").strip()
+        separator = ";" if ";" in value or field == "addresses" else ","
+        entities[field].extend(
+            item.strip().strip("\"'") for item in value.split(separator) if item.strip().strip("\"'")
+        )
+    return entities
+
+
+def entity_keys(entity: str) -> Set[str]:
+    """Claves de búsqueda de una entidad: sus secuencias de al menos dos palabras.
+
+    Cada tramo entre comas se trata por separado ("Calle Tetuán 15, 41001
+    Sevilla") y cada clave debe contener alguna palabra distintiva, de modo
+    que "María Jiménez" o "Tetuán 15" encuentran la entidad completa pero
+    "calle de la" no encuentra nada.
+    """
+    keys = set()
+    for segment in entity.split(","):
+        tokens = [t for t in normalize_entity(segment) if t not in ("n", "no")]
+        for size in range(2, min(len(tokens), MAX_KEY_TOKENS) + 1):
+            for start in range(len(tokens) - size + 1):
+                gram = tokens[start:start + size]
+                if any(t not in GENERIC_TOKENS and not t.isdigit() and len(t) > 2 for t in gram):
+                    keys.add(" ".join(gram))
+    return keys
+
+
+class EntityExtractor:
+    """Extrae las entidades de cada contrato con ENTITY_EXTRACTION_PROMPT, en paralelo."""
+
+    def __init__(self, llm, prompt: str = ENTITY_EXTRACTION_PROMPT, max_concurrency: int = 4):
+        self.chain = PromptTemplate.from_template(prompt) | llm | StrOutputParser()
+        self.max_concurrency = max_concurrency
+
+    def extract_many(self, texts: Sequence[str]) -> List[Dict[str, List[str]]]:
+        responses = self.chain.batch([{"text": t} for t in texts],
+                                     config={"max_concurrency": self.max_concurrency})
+        return [parse_entities(r) for r in responses]
+
+
+class EntityIndex:
+    """Índice estructurado entidad → contrato, página e IDs de chunk.
+
+    Se construye durante la ingesta con una sola extracción por contrato y se
+    persiste en JSON junto al vector store. En memoria cada clave de búsqueda
+    (secuencias de palabras de nombres y direcciones) apunta a sus entidades,
+    así que comprobar una consulta son unas pocas búsquedas en un dict.
+
+        index = EntityIndex(path, EntityExtractor(llm))
+        index.index_contracts({source: chunks})
+        index.save()
+    """
+
+    def __init__(self, path: str, extractor: Optional[EntityExtractor] = None):
+        self.path = Path(path)
+        self.extractor = extractor
+        self.contracts: Dict[str, dict] = {}
+        self.queries = 0
+        self.routed = 0
+        self._keys: Dict[str, Set[Tuple[str, str, int]]] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pending: Dict[Future, Tuple[str, List[Document]]] = {}
+        if self.path.exists():
+            self.contracts = json.loads(self.path.read_text(encoding="utf-8"))["contracts"]
+            self._rebuild_keys()
+
+    @classmethod
+    def load(cls, path: str) -> Optional["EntityIndex"]:
+        """Carga el índice para consultar; None si todavía no se ha construido."""
+        return cls(path) if Path(path).exists() else None
+
+    def __contains__(self, source: str) -> bool:
+        return source in self.contracts
+
+    def __len__(self) -> int:
+        return len(self.contracts)
+
+    def _rebuild_keys(self):
+        self._keys = {}
+        for source, contract in self.contracts.items():
+            for field in INDEXED_FIELDS:
+                for i, entity in enumerate(contract["entities"][field]):
+                    for key in entity_keys(entity):
+                        self._keys.setdefault(key, set()).add((source, field, i))
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps({"contracts": self.contracts}, indent=2, ensure_ascii=False),
+                             encoding="utf-8")
+
+    def add_contract(self, source: str, entities: Dict[str, List[str]], chunks: List[Document]):
+        """Registra las entidades de un contrato y en qué chunks aparece cada una."""
+        chunk_entries = []
+        for chunk in chunks:
+            text = f" {' '.join(normalize_entity(chunk.page_content))} "
+            mentions = [
+                [field, i] for field in INDEXED_FIELDS
+                for i, entity in enumerate(entities[field])
+                if any(f" {' '.join(normalize_entity(segment))} " in text
+                       for segment in entity.split(",") if len(normalize_entity(segment)) >= 2)
+            ]
+            chunk_entries.append({"id": chunk.metadata["chunk_id"],
+                                  "page": chunk.metadata.get("page"), "mentions": mentions})
+        self.contracts[source] = {"entities": entities, "chunks": chunk_entries}
+
+    def remove(self, source: str):
+        self.contracts.pop(source, None)
+        self._rebuild_keys()
+
+    def index_contracts(self, files: Dict[str, List[Document]]):
+        """Extrae las entidades de los contratos nuevos o modificados (una llamada por contrato)."""
+        if not files:
+            return
+        sources = list(files)
+        texts = ["\n".join(c.page_content for c in files[s]) for s in sources]
+        for source, entities in zip(sources, self.extractor.extract_many(texts)):
+            self.add_contract(source, entities, files[source])
+        self._rebuild_keys()
+
+    def submit(self, source: str, chunks: List[Document]):
+        """Lanza en segundo plano la extracción de un contrato durante una ingesta en streaming.
+
+        Como mucho hay 2 × max_concurrency contratos en vuelo: al llegar al
+        límite se espera al primero que termine, así que los chunks de cada
+        contrato se liberan en cuanto se registran sus entidades.
+        """
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.extractor.max_concurrency)
+        text = "\n".join(c.page_content for c in chunks)
+        self._pending[self._pool.submit(self.extractor.extract_many, [text])] = (source, chunks)
+        while len(self._pending) >= 2 * self.extractor.max_concurrency:
+            self._collect(wait(self._pending, return_when=FIRST_COMPLETED).done)
+
+    def _collect(self, done):
+        for future in done:
+            source, chunks = self._pending.pop(future)
+            self.add_contract(source, future.result()[0], chunks)
+
+    def flush(self):
+        """Espera a las extracciones pendientes de submit y actualiza las claves de búsqueda."""
+        if self._pending:
+            self._collect(wait(self._pending).done)
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        self._rebuild_keys()
+
+    def match(self, query: str) -> List[Tuple[str, str, int]]:
+        """Entidades nombradas en la consulta, quedándose con las coincidencias más largas.
+
+        "Calle Colón 45" coincide con "calle colon 45" (3 palabras) en un
+        contrato y con "calle colon" (2) en otro: solo cuenta la primera.
+        """
+        tokens = normalize_entity(query)
+        best, matches = 0, set()
+        for size in range(min(len(tokens), MAX_KEY_TOKENS), 1, -1):
+            if size < best:
+                break
+            for start in range(len(tokens) - size + 1):
+                refs = self._keys.get(" ".join(tokens[start:start + size]))
+                if refs:
+                    best = size
+                    matches.update(refs)
+        return sorted(matches)
+
+    def chunk_ids(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """IDs de los chunks de los contratos de las entidades de la consulta.
+
+        Primero los chunks que mencionan la entidad y después el resto del
+        mismo contrato; EntityRouterRetriever los reordena por similitud con la
+        consulta. Lista vacía si la consulta no nombra ninguna entidad.
+        """
+        self.queries += 1
+        matches = self.match(query)
+        if not matches:
+            return []
+        self.routed += 1
+
+        mentioned, others = [], []
+        for source, field, i in matches:
+            for chunk in self.contracts[source]["chunks"]:
+                (mentioned if [field, i] in chunk["mentions"] else others).append(chunk["id"])
+        return list(dict.fromkeys(mentioned + others))[:limit]
+
+    def stats(self) -> dict:
+        return {
+            "contracts": len(self.contracts),
+            "entities": sum(len(c["entities"][f]) for c in self.contracts.values() for f in INDEXED_FIELDS),
+            "keys": len(self._keys),
+            "queries": self.queries,
+            "routed": self.routed,
+            "routed_rate": round(self.routed / self.queries, 3) if self.queries else 0.0
+        }
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import List, Optional
+
+from langchain.retrievers.multi_query import MultiQueryRetriever, LineListOutputParser
+
+logger = logging.getLogger("langchain.retrievers.multi_query")
+
+
+def normalize_query(text: str) -> str:
+    """Normaliza la consulta (mayúsculas, espacios y signos de los extremos)."""
+    text = unicodedata.normalize("NFKC", text).lower().strip()
+    text = re.sub(r"\s+", " ", text)
+    return text.strip("¿?¡!.,;: ")
+
+
+class ExpansionCache:
+    """Caché persistente en SQLite de las variantes generadas por MultiQueryRetriever."""
+
+    def __init__(self, db_path: str = "expansion_cache.db"):
+        self.hits = 0
+        self.misses = 0
+        self.generation_seconds = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS expansions (
+                key TEXT PRIMARY KEY,
+                queries TEXT NOT NULL,
+                created REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def key(self, prompt: str, model: str, question: str) -> str:
+        """Clave (hash del prompt, modelo, consulta normalizada)."""
+        prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()[:16]
+        return f"{prompt_hash}:{model}:{normalize_query(question)}"
+
+    def get(self, key: str) -> Optional[List[str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT queries FROM expansions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, queries: List[str], generation_seconds: float = 0.0):
+        with self._lock:
+            self.generation_seconds += generation_seconds
+            self._conn.execute(
+                "INSERT OR REPLACE INTO expansions (key, queries, created) VALUES (?, ?, ?)",
+                (key, json.dumps(queries, ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Contadores de aciertos/fallos y latencia estimada ahorrada."""
+        total = self.hits + self.misses
+        avg = self.generation_seconds / self.misses if self.misses else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "avg_expansion_seconds": round(avg, 3),
+            "saved_seconds": round(avg * self.hits, 2)
+        }
+
+
+class CachedMultiQueryRetriever(MultiQueryRetriever):
+    """MultiQueryRetriever que consulta ExpansionCache antes de llamar al LLM."""
+
+    cache: ExpansionCache
+    prompt_key: str
+    llm_model: str
+
+    @classmethod
+    def from_llm_with_cache(cls, retriever, llm, prompt, cache: ExpansionCache,
+                            include_original: bool = False, **kwargs) -> "CachedMultiQueryRetriever":
+        return cls(
+            retriever=retriever,
+            llm_chain=prompt | llm | LineListOutputParser(),
+            include_original=include_original,
+            cache=cache,
+            prompt_key=prompt.pretty_repr(),
+            llm_model=getattr(llm, "model_name", type(llm).__name__),
+            **kwargs
+        )
+
+    def generate_queries(self, question: str, run_manager) -> List[str]:
+        key = self.cache.key(self.prompt_key, self.llm_model, question)
+        queries = self.cache.get(key)
+        if queries is not None:
+            logger.info(f"Cached queries: {queries}")
+            return queries
+
+        start = time.perf_counter()
+        queries = super().generate_queries(question, run_manager)
+        if queries:
+            self.cache.set(key, queries, time.perf_counter() - start)
+        return queries
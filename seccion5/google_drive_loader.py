@@ -4,21 +4,39 @@
 # para este proyecto. Credentials. create credentials.oauth client.. Create Client OAuth.
 # Desktop app -> Client ID, secret. Download json y lo bajo a mi carpeta. Tests. añado un usuario
 
-from langchain_community.document_loaders import GoogleDriveLoader
+from langchain_community.vectorstores import Chroma
+from langchain_openai import OpenAIEmbeddings
+
+from drive_sync import DriveSync, GoogleDriveClient
+from embeddings_cache import CachedEmbeddings
+from token_splitter import TokenBudgetSplitter
 
 #el fichero .json con las credenciales descargadas desde google drive
 credentials_path = "C:\\Users\\santiago\\curso_langchain\\Tema 3\\credentials.json"
 #ruta donde quiero que se guarde el token y nombre del fichero donde se guardará
 token_path = "C:\\Users\\santiago\\curso_langchain\\Tema 3\\token.json"
+#manifiesto con el modifiedTime, md5 e IDs de chunk de cada fichero ya sincronizado
+manifest_path = "C:\\Users\\santiago\\curso_langchain\\Tema 3\\drive_manifest.json"
 
-loader = GoogleDriveLoader(
+# En lugar de GoogleDriveLoader(folder_id=..., recursive=True).load(), que descarga la carpeta
+# entera cada vez, solo se descargan (en paralelo) los ficheros nuevos o modificados
+sync = DriveSync(
+    GoogleDriveClient(credentials_path, token_path),
     folder_id="17DDwGPRjhjZhR6NRpegkFEmA4Wo6M_l3", ## en la url de una carpeta de mi drive está este id
-    credentials_path=credentials_path,
-    token_path=token_path,
+    manifest_path=manifest_path,
+    max_workers=8,
     recursive=True
 )
 
-documents = loader.load()
+vectorstore = Chroma(
+    embedding_function=CachedEmbeddings(OpenAIEmbeddings(model="text-embedding-3-large")),
+    persist_directory="C:\\Users\\santiago\\curso_langchain\\Tema 3\\chroma_drive",
+    collection_name="google_drive"
+)
+
+# Eventos add/update/delete aplicados como upserts y borrados en el vector store
+stats = sync.sync_vectorstore(vectorstore, TokenBudgetSplitter(chunk_tokens=1200, overlap_tokens=120))
 
-print(f"Metadatos: {documents[0].metadata}")
-print(f"Contenido: {documents[0].page_content}")
\ No newline at end of file
+print(f"Ficheros en Drive: {stats['listed']}, sin cambios: {stats['unchanged']}")
+print(f"Nuevos: {stats['added']}, modificados: {stats['updated']}, eliminados: {stats['deleted']}, errores: {stats['errors']}")
+print(f"Chunks añadidos: {stats['added_chunks']}, chunks borrados: {stats['deleted_chunks']}")
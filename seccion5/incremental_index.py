@@ -0,0 +1,207 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# Huella de la colección, junto al manifiesto (en el directorio del vector store)
+FINGERPRINT_FILE = "collection_fingerprint.txt"
+
+
+def file_hash(path: Path) -> str:
+    """md5 del contenido del fichero."""
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def chunk_id(source: str, content: str) -> str:
+    """ID determinista de un chunk: fichero de origen + hash de su contenido."""
+    return hashlib.md5(f"{source}\n{content}".encode()).hexdigest()
+
+
+def collection_fingerprint(ids: Iterable[str]) -> str:
+    """Huella de una colección a partir de los IDs de sus chunks.
+
+    Los IDs se derivan del fichero y del contenido de cada chunk, así que
+    cualquier alta, baja o modificación cambia la huella.
+    """
+    return hashlib.md5("|".join(sorted(ids)).encode()).hexdigest()[:12]
+
+
+def read_fingerprint(store_path: str) -> Optional[str]:
+    """Huella guardada por el último IncrementalIndexer que escribió en el store (None si no hay)."""
+    path = Path(store_path) / FINGERPRINT_FILE
+    return path.read_text(encoding="utf-8").strip() if path.exists() else None
+
+
+class IncrementalIndexer:
+    """Sincroniza un directorio con un vector store sin re-embeber lo que no ha cambiado.
+
+    Guarda un manifiesto JSON con el mtime, el hash y los IDs de chunk de cada
+    fichero. Los ficheros con el mismo mtime no se vuelven a leer, solo se
+    embeben los chunks nuevos o modificados y se borran los chunks de ficheros
+    eliminados. Un fichero dividido con otra configuración del splitter
+    se vuelve a dividir aunque no haya cambiado. Si se pasa un EmbeddingScheduler, los chunks nuevos de todos
+    los ficheros se embeben juntos en lotes concurrentes. Si se pasa un
+    EntityIndex, se extraen las entidades de los ficheros modificados y se
+    quitan las de los eliminados. Al guardar el manifiesto se escribe también
+    la huella de la colección (FINGERPRINT_FILE), que la caché semántica lee
+    sin recorrer los IDs del store en cada consulta.
+    """
+
+    def __init__(self, vectorstore, text_splitter, manifest_path: str, scheduler=None,
+                 entity_index=None):
+        self.vectorstore = vectorstore
+        self.text_splitter = text_splitter
+        self.manifest_path = Path(manifest_path)
+        self.scheduler = scheduler
+        self.entity_index = entity_index
+        self.ingestion_stats: Dict[str, float] = {}
+        self.splitter_config = (text_splitter.config() if hasattr(text_splitter, "config")
+                                else {"class": type(text_splitter).__name__})
+        self.manifest: Dict[str, dict] = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, dict]:
+        if self.manifest_path.exists():
+            return json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        return {}
+
+    def _save_manifest(self):
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        self.manifest_path.write_text(json.dumps(self.manifest, indent=2), encoding="utf-8")
+        fingerprint = collection_fingerprint(i for entry in self.manifest.values() for i in entry["chunk_ids"])
+        (self.manifest_path.parent / FINGERPRINT_FILE).write_text(fingerprint, encoding="utf-8")
+
+    def _split_with_ids(self, source: str, documents: List[Document]):
+        chunks = self.text_splitter.split_documents(documents)
+        ids = []
+        for chunk in chunks:
+            chunk.metadata["chunk_id"] = chunk_id(source, chunk.page_content)
+            ids.append(chunk.metadata["chunk_id"])
+        return chunks, ids
+
+    def _changed_files(self, directory: str, pattern: str,
+                       stats: Dict[str, int]) -> Dict[str, Tuple[float, str]]:
+        """Borra los chunks de ficheros eliminados y devuelve los ficheros a re-indexar."""
+        current = {str(p): p for p in sorted(Path(directory).glob(pattern))}
+
+        # Ficheros eliminados: borrar todos sus chunks
+        for source in set(self.manifest) - set(current):
+            old_ids = self.manifest.pop(source)["chunk_ids"]
+            if old_ids:
+                self.vectorstore.delete(ids=old_ids)
+            if self.entity_index is not None:
+                self.entity_index.remove(source)
+            stats["removed"] += 1
+            stats["deleted_chunks"] += len(old_ids)
+
+        changed = {}
+        for source, path in current.items():
+            entry = self.manifest.get(source)
+            mtime = path.stat().st_mtime
+
+            # Un fichero sin entidades extraídas se vuelve a leer aunque no haya
+            # cambiado (sus chunks ya están en el vector store y no se re-embeben)
+            if entry and self.entity_index is not None and source not in self.entity_index:
+                entry = None
+
+            # Chunks de otra configuración del splitter: hay que volver a dividir
+            if entry and entry.get("splitter") != self.splitter_config:
+                changed[source] = (mtime, file_hash(path))
+                continue
+
+            # Mismo mtime: ni siquiera se lee el fichero
+            if entry and entry["mtime"] == mtime:
+                stats["unchanged"] += 1
+                continue
+
+            digest = file_hash(path)
+            if entry and entry["hash"] == digest:
+                entry["mtime"] = mtime
+                stats["unchanged"] += 1
+                continue
+
+            changed[source] = (mtime, digest)
+        return changed
+
+    def _register(self, source: str, mtime: float, digest: str, chunks: List[Document],
+                  stats: Dict[str, int]) -> Dict[str, Document]:
+        """Actualiza el manifiesto de un fichero y devuelve sus chunks nuevos."""
+        ids = [chunk.metadata["chunk_id"] for chunk in chunks]
+        entry = self.manifest.get(source)
+        old_ids = set(entry["chunk_ids"]) if entry else set()
+
+        # Solo se embeben los chunks nuevos (un ID igual implica mismo contenido)
+        new_chunks = {i: c for i, c in zip(ids, chunks) if i not in old_ids}
+
+        stale_ids = list(old_ids - set(ids))
+        if stale_ids:
+            self.vectorstore.delete(ids=stale_ids)
+
+        self.manifest[source] = {"mtime": mtime, "hash": digest, "splitter": self.splitter_config,
+                                 "chunk_ids": list(dict.fromkeys(ids))}
+        stats["updated"] += 1
+        stats["added_chunks"] += len(new_chunks)
+        stats["deleted_chunks"] += len(stale_ids)
+        return new_chunks
+
+    def sync(self, directory: str, pattern: str,
+             load_file: Callable[[str], List[Document]]) -> Dict[str, int]:
+        """Sincroniza los ficheros de `directory` que cumplen `pattern`."""
+        stats = {"unchanged": 0, "updated": 0, "removed": 0, "added_chunks": 0, "deleted_chunks": 0}
+        pending: Dict[str, Document] = {}
+        files: Dict[str, List[Document]] = {}
+
+        for source, (mtime, digest) in self._changed_files(directory, pattern, stats).items():
+            chunks, _ = self._split_with_ids(source, load_file(source))
+            files[source] = chunks
+            pending.update(self._register(source, mtime, digest, chunks, stats))
+
+        if pending:
+            if self.scheduler:
+                self.ingestion_stats = self.scheduler.ingest(self.vectorstore, list(pending.values()),
+                                                             list(pending))
+            else:
+                self.vectorstore.add_documents(list(pending.values()), ids=list(pending))
+
+        self._update_entities(files)
+        self._save_manifest()
+        return stats
+
+    def sync_streaming(self, directory: str, pattern: str, pipeline) -> Dict[str, int]:
+        """Como sync, pero los ficheros modificados pasan por un PDFIngestionPipeline.
+
+        Los PDFs se leen en paralelo y los chunks nuevos se embeben y escriben
+        mientras se siguen leyendo los demás.
+        """
+        stats = {"unchanged": 0, "updated": 0, "removed": 0, "added_chunks": 0, "deleted_chunks": 0}
+        changed = self._changed_files(directory, pattern, stats)
+
+        def select(source: str, chunks: List[Document]) -> List[Document]:
+            mtime, digest = changed[source]
+            # La extracción de entidades va en segundo plano y con una ventana acotada,
+            # así que los chunks de cada fichero no se acumulan hasta el final
+            if self.entity_index is not None:
+                self.entity_index.submit(source, chunks)
+            return list(self._register(source, mtime, digest, chunks, stats).values())
+
+        try:
+            if changed:
+                self.ingestion_stats = pipeline.run(list(changed), select)
+        finally:
+            if self.entity_index is not None:
+                self.entity_index.flush()
+                self.entity_index.save()
+        self._save_manifest()
+        return stats
+
+    def _update_entities(self, files: Dict[str, List[Document]]):
+        """Una extracción de entidades por fichero modificado, en paralelo, tras escribir los chunks."""
+        if self.entity_index is None:
+            return
+        self.entity_index.index_contracts(files)
+        self.entity_index.save()
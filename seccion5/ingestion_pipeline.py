@@ -0,0 +1,158 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
+
+from document_cache import DocumentCache
+from embedding_scheduler import EmbeddingScheduler, count_tokens
+from incremental_index import chunk_id
+from token_splitter import chunk_token_counts, token_distribution
+
+
+def load_and_split_pdf(path: str, text_splitter,
+                       document_cache_dir: Optional[str] = None) -> Tuple[str, int, List[Document]]:
+    """Lee y divide un PDF. Se ejecuta en un proceso aparte (pypdf es CPU-bound).
+
+    Con `document_cache_dir`, las páginas y los chunks de un PDF ya procesado
+    con el mismo splitter se leen de la DocumentCache en lugar de extraerlos.
+    """
+    if document_cache_dir:
+        cache = DocumentCache(document_cache_dir)
+        pages = cache.load_pdf(path)
+        chunks = cache.split(path, pages, text_splitter)
+    else:
+        pages = PyPDFLoader(path).load()
+        chunks = text_splitter.split_documents(pages)
+    for chunk in chunks:
+        chunk.metadata["chunk_id"] = chunk_id(path, chunk.page_content)
+    return path, len(pages), chunks
+
+
+class PDFIngestionPipeline:
+    """Pipeline en streaming carga → división → embeddings → escritura.
+
+    Los PDFs se procesan en un pool de procesos y los lotes de embeddings en
+    el pool de hilos del EmbeddingScheduler. Entre etapas solo hay ventanas
+    acotadas de trabajo pendiente (`max_pending_files` PDFs y
+    `max_pending_batches` lotes), por lo que la memoria no crece con el
+    tamaño del corpus y los primeros vectores se escriben antes de terminar
+    de leer el último PDF.
+
+        pipeline = PDFIngestionPipeline(vectorstore, scheduler, text_splitter)
+        stats = pipeline.run(paths)
+    """
+
+    def __init__(self, vectorstore, scheduler: EmbeddingScheduler, text_splitter,
+                 max_workers: Optional[int] = None, max_pending_files: int = 16,
+                 max_pending_batches: Optional[int] = None, document_cache_dir: Optional[str] = None):
+        self.vectorstore = vectorstore
+        self.scheduler = scheduler
+        # Se envía a cada proceso, así que debe poder serializarse con pickle
+        self.text_splitter = text_splitter
+        self.max_workers = max_workers
+        self.max_pending_files = max_pending_files
+        self.max_pending_batches = max_pending_batches or 2 * scheduler.max_concurrency
+        self.document_cache_dir = document_cache_dir
+        self.stats: Dict[str, float] = {}
+        self.chunk_tokens: List[int] = []
+
+    def _parse(self, pool: ProcessPoolExecutor, paths: Iterable[str],
+               select: Optional[Callable[[str, List[Document]], List[Document]]]) -> Iterator[Document]:
+        """Etapa 1: PDFs en paralelo, como mucho `max_pending_files` en vuelo."""
+        pending = set()
+        paths = iter(paths)
+
+        while True:
+            for path in paths:
+                pending.add(pool.submit(load_and_split_pdf, path, self.text_splitter, self.document_cache_dir))
+                if len(pending) >= self.max_pending_files:
+                    break
+            if not pending:
+                return
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                source, pages, chunks = future.result()
+                self.stats["files"] += 1
+                self.stats["pages"] += pages
+                self.stats["chunks"] += len(chunks)
+                self.chunk_tokens.extend(chunk_token_counts(chunks))
+                yield from (select(source, chunks) if select else chunks)
+
+    def _batch(self, documents: Iterator[Document]) -> Iterator[Tuple[List[Document], int]]:
+        """Etapa 2: agrupa los chunks en lotes por número de tokens."""
+        batch, tokens = [], 0
+        for doc in documents:
+            doc_tokens = doc.metadata.get("tokens") or count_tokens(doc.page_content)
+            if batch and (tokens + doc_tokens > self.scheduler.max_batch_tokens
+                          or len(batch) >= self.scheduler.max_batch_size):
+                yield batch, tokens
+                batch, tokens = [], 0
+            batch.append(doc)
+            tokens += doc_tokens
+        if batch:
+            yield batch, tokens
+
+    def _embed(self, pool: ThreadPoolExecutor,
+               batches: Iterator[Tuple[List[Document], int]]) -> Iterator[Tuple[List[Document], int, List[List[float]], int]]:
+        """Etapa 3: embeddings concurrentes, como mucho `max_pending_batches` lotes en vuelo."""
+        pending = {}
+
+        while True:
+            for docs, tokens in batches:
+                pending[pool.submit(self.scheduler.embed_batch, docs, tokens)] = (docs, tokens)
+                if len(pending) >= self.max_pending_batches:
+                    break
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                docs, tokens = pending.pop(future)
+                vectors, retries = future.result()
+                yield docs, tokens, vectors, retries
+
+    def run(self, paths: Iterable[str],
+            select: Optional[Callable[[str, List[Document]], List[Document]]] = None,
+            on_progress: Optional[Callable[[Dict[str, float]], None]] = None) -> Dict[str, float]:
+        """Ingiere los PDFs y devuelve los contadores de cada etapa y la distribución de tokens.
+
+        `select(source, chunks)` se llama en el hilo principal con los chunks
+        de cada PDF y devuelve los que hay que embeber (p. ej. solo los nuevos).
+        """
+        self.stats = {"files": 0, "pages": 0, "chunks": 0, "batches": 0, "tokens": 0,
+                      "written": 0, "retries": 0, "first_write_seconds": None}
+        self.chunk_tokens = []
+        start = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as processes, \
+                ThreadPoolExecutor(max_workers=self.scheduler.max_concurrency) as threads:
+            documents = self._parse(processes, paths, select)
+            for docs, tokens, vectors, retries in self._embed(threads, self._batch(documents)):
+                # Etapa 4: escritura desde el hilo principal, lote a lote
+                self.scheduler.write_batch(self.vectorstore, docs,
+                                           [d.metadata["chunk_id"] for d in docs], vectors)
+                if self.stats["first_write_seconds"] is None:
+                    self.stats["first_write_seconds"] = round(time.perf_counter() - start, 2)
+                self.stats["batches"] += 1
+                self.stats["tokens"] += tokens
+                self.stats["written"] += len(docs)
+                self.stats["retries"] += retries
+                if on_progress:
+                    on_progress(self.report(start))
+
+        return {**self.report(start), "token_distribution": token_distribution(self.chunk_tokens)}
+
+    def report(self, start: float) -> Dict[str, float]:
+        """Contadores acumulados y throughput de cada etapa."""
+        seconds = max(time.perf_counter() - start, 1e-9)
+        return {
+            **self.stats,
+            "seconds": round(seconds, 2),
+            "files_per_second": round(self.stats["files"] / seconds, 2),
+            "pages_per_second": round(self.stats["pages"] / seconds, 1),
+            "chunks_per_second": round(self.stats["written"] / seconds, 1),
+            "tokens_per_second": round(self.stats["tokens"] / seconds, 1)
+        }
@@ -3,8 +3,11 @@ from langchain_openai import OpenAIEmbeddings
 from langchain_openai import ChatOpenAI
 #from langchain.retrievers.multi_query import MultiQueryRetriever
 from langchain_classic.retrievers.multi_query import MultiQueryRetriever
+
+from embeddings_cache import CachedEmbeddings
+
 vectorstore = Chroma(
-    embedding_function=OpenAIEmbeddings(model="text-embedding-3-large"),
+    embedding_function=CachedEmbeddings(OpenAIEmbeddings(model="text-embedding-3-large")),
     persist_directory="C:\\Users\\santiago\\curso_langchain\\Tema 3\\chroma_db"
 )
 
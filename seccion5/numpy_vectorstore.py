@@ -0,0 +1,345 @@
+import json
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+
+def mmr_select(query_similarities: np.ndarray, candidates: np.ndarray, k: int,
+               lambda_mult: float = 0.5) -> List[int]:
+    """Maximal Marginal Relevance sobre vectores ya normalizados.
+
+    Mantiene para cada candidato su similitud máxima con los ya elegidos y
+    la actualiza con un único producto matriz-vector por iteración.
+    """
+    k = min(k, len(candidates))
+    if k == 0:
+        return []
+    selected = [int(np.argmax(query_similarities))]
+    max_redundancy = candidates @ candidates[selected[0]]
+    while len(selected) < k:
+        scores = lambda_mult * query_similarities - (1 - lambda_mult) * max_redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        max_redundancy = np.maximum(max_redundancy, candidates @ candidates[best])
+    return selected
+
+
+class NumpyVectorStore(VectorStore):
+    """Vector store exacto sobre una matriz de NumPy en memoria mapeada.
+
+    Los embeddings se guardan normalizados (L2) en un fichero binario float32
+    o float16 y los textos, metadatos, IDs y marcas de borrado en un diario
+    JSONL al que solo se añaden líneas, así que cada lote cuesta lo mismo
+    sea cual sea el tamaño de la colección. Los vectores de un lote se
+    escriben antes que su metadata: si el proceso muere entre las dos
+    escrituras, al cargar se recortan las filas sin metadata. Una búsqueda es
+    un único producto matriz-vector más argpartition, con recall exacto. Los
+    borrados son lápidas que compact() elimina físicamente.
+
+    Pensado para colecciones pequeñas y medianas (hasta ~1M de vectores),
+    donde arranca más rápido y ocupa menos que Chroma con HNSW.
+    """
+
+    def __init__(self, embedding: Embeddings, persist_directory: str, dtype: str = "float32"):
+        self._embedding = embedding
+        self.path = Path(persist_directory)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._matrix_path = self.path / "vectors.bin"
+        self._journal_path = self.path / "store.jsonl"
+        self._legacy_meta_path = self.path / "store.json"
+
+        self.dtype = np.dtype(dtype)
+        self.dim: Optional[int] = None
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[dict] = []
+        self.alive = np.zeros(0, dtype=bool)
+        self._id_to_row: Dict[str, int] = {}
+        self._matrix: Optional[np.memmap] = None
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def _load(self):
+        deleted: List[int] = []
+        if self._journal_path.exists():
+            with open(self._journal_path, "rb") as f:
+                lines = f.read().split(b"\n")
+            valid = 0
+            for i, line in enumerate(lines):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # última línea a medias de una escritura interrumpida
+                valid = i + 1
+                if "dim" in record:
+                    self.dim, self.dtype = record["dim"], np.dtype(record["dtype"])
+                elif "deleted" in record:
+                    deleted.extend(record["deleted"])
+                else:
+                    self.ids.append(record["id"])
+                    self.texts.append(record["text"])
+                    self.metadatas.append(record["metadata"])
+            truncated = valid < len([line for line in lines if line])
+        elif self._legacy_meta_path.exists():
+            # Formato anterior (un único JSON reescrito en cada lote)
+            meta = json.loads(self._legacy_meta_path.read_text(encoding="utf-8"))
+            self.dim, self.dtype = meta["dim"], np.dtype(meta["dtype"])
+            self.ids, self.texts, self.metadatas = meta["ids"], meta["texts"], meta["metadatas"]
+            deleted = meta["deleted"]
+            truncated = True
+        else:
+            return
+
+        # Filas de vectores sin metadata (el proceso murió entre las dos escrituras): se descartan
+        vector_rows = (self._matrix_path.stat().st_size // (self.dtype.itemsize * self.dim)
+                       if self.dim and self._matrix_path.exists() else 0)
+        rows = min(len(self.ids), vector_rows)
+        if vector_rows != rows and self._matrix_path.exists():
+            with open(self._matrix_path, "r+b") as f:
+                f.truncate(rows * self.dtype.itemsize * self.dim)
+        if len(self.ids) > rows:
+            del self.ids[rows:], self.texts[rows:], self.metadatas[rows:]
+            truncated = True
+
+        self.alive = np.ones(rows, dtype=bool)
+        self.alive[[r for r in deleted if r < rows]] = False
+        # Si un ID aparece varias veces vale la última fila (upsert sin su lápida)
+        self._id_to_row = {}
+        for row, doc_id in enumerate(self.ids):
+            if not self.alive[row]:
+                continue
+            if doc_id in self._id_to_row:
+                self.alive[self._id_to_row[doc_id]] = False
+            self._id_to_row[doc_id] = row
+
+        if truncated:
+            self._rewrite_journal()
+        self._remap()
+
+    def _append_journal(self, records: List[dict]):
+        lines = [json.dumps(r, ensure_ascii=False) for r in records]
+        with open(self._journal_path, "a", encoding="utf-8") as f:
+            if f.tell() == 0:
+                f.write(json.dumps({"dim": self.dim, "dtype": self.dtype.name}) + "\n")
+            f.write("".join(line + "\n" for line in lines))
+
+    def _rewrite_journal(self):
+        """Reescribe el diario completo (tras compact() o al recuperar una escritura interrumpida)."""
+        tmp_path = self._journal_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"dim": self.dim, "dtype": self.dtype.name}) + "\n")
+            for doc_id, text, metadata in zip(self.ids, self.texts, self.metadatas):
+                f.write(json.dumps({"id": doc_id, "text": text, "metadata": metadata}, ensure_ascii=False) + "\n")
+            deleted = np.flatnonzero(~self.alive).tolist()
+            if deleted:
+                f.write(json.dumps({"deleted": deleted}) + "\n")
+        tmp_path.replace(self._journal_path)
+        if self._legacy_meta_path.exists():
+            self._legacy_meta_path.unlink()
+
+    def _remap(self):
+        if self.ids:
+            self._matrix = np.memmap(self._matrix_path, dtype=self.dtype, mode="r",
+                                     shape=(len(self.ids), self.dim))
+        else:
+            self._matrix = None
+
+    def add_embeddings(self, texts: List[str], embeddings: List[List[float]],
+                       metadatas: Optional[List[dict]] = None,
+                       ids: Optional[List[str]] = None) -> List[str]:
+        """Añade vectores ya calculados. Un ID existente se sustituye (upsert).
+
+        Si un ID se repite dentro del lote solo se guarda su última aparición.
+        """
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+
+        last = {doc_id: i for i, doc_id in enumerate(ids)}
+        keep = sorted(last.values())
+        matrix = np.array(embeddings, dtype=np.float32)[keep]
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        if self.dim is None:
+            self.dim = matrix.shape[1]
+
+        # Primero los vectores y después la metadata: un corte entre ambas deja filas
+        # sobrantes en la matriz, que se recortan al cargar
+        with open(self._matrix_path, "ab") as f:
+            f.write(matrix.astype(self.dtype).tobytes())
+
+        # Las versiones anteriores de los mismos IDs pasan a ser lápidas
+        replaced = [self._id_to_row[ids[i]] for i in keep if ids[i] in self._id_to_row]
+        records = [{"id": ids[i], "text": texts[i], "metadata": dict(metadatas[i] or {})} for i in keep]
+        self._append_journal(records + ([{"deleted": replaced}] if replaced else []))
+        self._tombstone(ids[i] for i in keep)
+
+        start = len(self.ids)
+        self.ids.extend(r["id"] for r in records)
+        self.texts.extend(r["text"] for r in records)
+        self.metadatas.extend(r["metadata"] for r in records)
+        self.alive = np.concatenate([self.alive, np.ones(len(records), dtype=bool)])
+        self._id_to_row.update((r["id"], start + i) for i, r in enumerate(records))
+
+        self._remap()
+        return ids
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_embeddings(texts, self._embedding.embed_documents(texts), metadatas, ids)
+
+    def _tombstone(self, ids: Iterable[str]) -> int:
+        rows = [self._id_to_row.pop(doc_id) for doc_id in ids if doc_id in self._id_to_row]
+        self.alive[rows] = False
+        return len(rows)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Marca los IDs como borrados. El espacio se recupera con compact()."""
+        if not ids:
+            return False
+        rows = [self._id_to_row[doc_id] for doc_id in ids if doc_id in self._id_to_row]
+        if rows:
+            self._append_journal([{"deleted": rows}])
+        removed = self._tombstone(ids)
+        return removed > 0
+
+    def compact(self) -> int:
+        """Reescribe la matriz sin las filas borradas. Devuelve las filas eliminadas."""
+        removed = int((~self.alive).sum())
+        if not removed:
+            return 0
+
+        rows = np.flatnonzero(self.alive)
+        kept = np.array(self._matrix[rows]) if len(rows) else np.zeros((0, self.dim), self.dtype)
+        self._matrix = None
+
+        tmp_path = self._matrix_path.with_suffix(".tmp")
+        kept.tofile(tmp_path)
+        tmp_path.replace(self._matrix_path)
+
+        self.ids = [self.ids[r] for r in rows]
+        self.texts = [self.texts[r] for r in rows]
+        self.metadatas = [self.metadatas[r] for r in rows]
+        self.alive = np.ones(len(rows), dtype=bool)
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+        self._remap()
+        self._rewrite_journal()
+        return removed
+
+    def _document(self, row: int) -> Document:
+        return Document(page_content=self.texts[row], metadata=dict(self.metadatas[row]),
+                        id=self.ids[row])
+
+    def _scores(self, embedding: List[float], filter: Optional[dict] = None) -> np.ndarray:
+        """Similitud coseno de la consulta con todas las filas (-inf en borradas o filtradas)."""
+        query = np.array(embedding, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        scores = np.asarray(self._matrix @ query, dtype=np.float32)
+        scores[~self.alive] = -np.inf
+        if filter:
+            matches = np.fromiter(
+                (all(m.get(key) == value for key, value in filter.items()) for m in self.metadatas),
+                dtype=bool, count=len(self.metadatas)
+            )
+            scores[~matches] = -np.inf
+        return scores
+
+    def _top_k(self, scores: np.ndarray, k: int) -> np.ndarray:
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[dict] = None) -> List[Tuple[Document, float]]:
+        if self._matrix is None:
+            return []
+        scores = self._scores(embedding, filter)
+        return [(self._document(row), float(scores[row])) for row in self._top_k(scores, k)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                          **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def candidates_by_vectors(self, embeddings: List[List[float]],
+                              fetch_k: int = 20) -> Tuple[List[Document], np.ndarray]:
+        """Unión de los `fetch_k` mejores candidatos de varias consultas y sus vectores normalizados.
+
+        Todas las consultas se puntúan en un único producto de matrices.
+        """
+        if self._matrix is None or not len(embeddings):
+            return [], np.zeros((0, self.dim or 0), dtype=np.float32)
+        queries = np.array(embeddings, dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = np.asarray(queries @ self._matrix.T, dtype=np.float32)
+        scores[:, ~self.alive] = -np.inf
+        k = min(fetch_k, int(self.alive.sum()))
+        if k <= 0:
+            return [], np.zeros((0, self.dim), dtype=np.float32)
+        rows = np.unique(np.argpartition(-scores, k - 1, axis=1)[:, :k])
+        return [self._document(int(row)) for row in rows], np.asarray(self._matrix[rows], dtype=np.float32)
+
+    def candidates_by_ids(self, ids: List[str]) -> Tuple[List[Document], np.ndarray]:
+        """Documentos de `ids` (en ese orden, sin los que no existen) y sus vectores normalizados."""
+        rows = [self._id_to_row[i] for i in ids if i in self._id_to_row]
+        if self._matrix is None or not rows:
+            return [], np.zeros((0, self.dim or 0), dtype=np.float32)
+        return [self._document(row) for row in rows], np.asarray(self._matrix[rows], dtype=np.float32)
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Similitud coseno en [-1, 1] a relevancia en [0, 1] (float16 puede pasarse de 1 por redondeo)
+        return lambda score: min(1.0, max(0.0, (score + 1.0) / 2.0))
+
+    def max_marginal_relevance_search_by_vector(self, embedding: List[float], k: int = 4,
+                                                fetch_k: int = 20, lambda_mult: float = 0.5,
+                                                filter: Optional[dict] = None,
+                                                **kwargs: Any) -> List[Document]:
+        if self._matrix is None:
+            return []
+        scores = self._scores(embedding, filter)
+        candidates = self._top_k(scores, fetch_k)
+        vectors = np.asarray(self._matrix[candidates], dtype=np.float32)
+        selected = mmr_select(scores[candidates], vectors, k, lambda_mult)
+        return [self._document(int(candidates[i])) for i in selected]
+
+    def max_marginal_relevance_search(self, query: str, k: int = 4, fetch_k: int = 20,
+                                      lambda_mult: float = 0.5, filter: Optional[dict] = None,
+                                      **kwargs: Any) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self._embedding.embed_query(query), k, fetch_k, lambda_mult, filter
+        )
+
+    def get_by_ids(self, ids: List[str]) -> List[Document]:
+        return [self._document(self._id_to_row[i]) for i in ids if i in self._id_to_row]
+
+    def __len__(self) -> int:
+        return len(self._id_to_row)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings,
+                   metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None,
+                   persist_directory: str = "numpy_store", dtype: str = "float32",
+                   **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(embedding, persist_directory, dtype)
+        store.add_texts(texts, metadatas, ids)
+        return store
@@ -41,6 +41,17 @@ CONSULTA: {question}
 
 ¿Es este fragmento relevante para responder la consulta? Responde solo con "SÍ" o "NO" y una breve justificación."""
 
+# Prompt para juzgar la relevancia de varios fragmentos en una sola llamada
+RELEVANCE_BATCH_PROMPT = """Analiza cuáles de los siguientes fragmentos de documento son relevantes para responder la consulta del usuario.
+
+FRAGMENTOS:
+{fragments}
+
+CONSULTA: {question}
+
+Responde en una sola línea con los números de los fragmentos relevantes separados por comas, o NINGUNO si no hay ninguno:
+RELEVANTES: [números]"""
+
 # Prompt para extracción de entidades clave
 ENTITY_EXTRACTION_PROMPT = """Extrae las entidades clave del siguiente texto de contrato de arrendamiento:
 
@@ -55,7 +66,7 @@ Identifica y extrae:
 - Duración del contrato
 - Tipo de propiedad
 
-Formato de respuesta:
+Formato de respuesta (separa los elementos de cada lista con punto y coma):
 PERSONAS: [lista de nombres]
 DIRECCIONES: [lista de direcciones]
 IMPORTES: [lista de cantidades]
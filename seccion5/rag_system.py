@@ -0,0 +1,251 @@
+import time
+
+from langchain_community.vectorstores import Chroma
+from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain.prompts import PromptTemplate
+from langchain_core.runnables import RunnableParallel, RunnablePassthrough
+from langchain_core.output_parsers import StrOutputParser
+from langchain.retrievers import EnsembleRetriever
+import streamlit as st
+
+from config import *
+from prompts import *
+from expansion_cache import ExpansionCache
+from retrieval import (EntityRouterRetriever, FusedMultiQueryRetriever, RelevanceFilteredRetriever,
+                       UnionMMRMultiQueryRetriever)
+from embeddings_cache import CachedEmbeddings
+from numpy_vectorstore import NumpyVectorStore
+from semantic_cache import SemanticAnswerCache
+from entity_index import EntityIndex
+from incremental_index import collection_fingerprint, read_fingerprint
+from relevance_filter import RelevanceFilter
+
+@st.cache_resource
+def get_expansion_cache():
+    return ExpansionCache(EXPANSION_CACHE_PATH)
+
+@st.cache_resource
+def get_embeddings():
+    return CachedEmbeddings(OpenAIEmbeddings(model=EMBEDDING_MODEL), EMBEDDINGS_CACHE_PATH)
+
+@st.cache_resource
+def get_semantic_cache():
+    return SemanticAnswerCache(SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES)
+
+@st.cache_resource
+def get_entity_index():
+    store_path = NUMPY_STORE_PATH if VECTOR_STORE_BACKEND == "numpy" else CHROMA_DB_PATH
+    return EntityIndex.load(f"{store_path}\\{ENTITY_INDEX_FILE}")
+
+@st.cache_resource
+def get_relevance_filter():
+    return RelevanceFilter(
+        get_embeddings(),
+        ChatOpenAI(model=QUERY_MODEL, temperature=0),
+        accept_threshold=RELEVANCE_ACCEPT_THRESHOLD,
+        reject_threshold=RELEVANCE_REJECT_THRESHOLD,
+        lexical_weight=RELEVANCE_LEXICAL_WEIGHT
+    )
+
+@st.cache_resource
+def get_vectorstore():
+    if VECTOR_STORE_BACKEND == "numpy":
+        return NumpyVectorStore(get_embeddings(), NUMPY_STORE_PATH)
+    return Chroma(
+        embedding_function=get_embeddings(),\
+        persist_directory=CHROMA_DB_PATH
+    )
+
+def get_collection_fingerprint(vectorstore):
+    """Huella de la colección que escribe el IncrementalIndexer en cada sincronización.
+
+    Es una lectura de un fichero pequeño; solo si el store se creó sin esa
+    huella se calcula recorriendo todos sus IDs.
+    """
+    store_path = NUMPY_STORE_PATH if VECTOR_STORE_BACKEND == "numpy" else CHROMA_DB_PATH
+    fingerprint = read_fingerprint(store_path)
+    if fingerprint is not None:
+        return fingerprint
+    if isinstance(vectorstore, NumpyVectorStore):
+        ids = [doc_id for doc_id, alive in zip(vectorstore.ids, vectorstore.alive) if alive]
+    else:
+        ids = vectorstore.get(include=[])["ids"]
+    return collection_fingerprint(ids)
+
+@st.cache_resource
+def initialize_rag_system():
+
+    # Vector Store
+    vectorestore = get_vectorstore()
+
+    # Modelos
+    llm_queries = ChatOpenAI(model=QUERY_MODEL, temperature=0)
+    llm_generation = ChatOpenAI(model=GENERATION_MODEL, temperature=0)
+
+    # Retriever MMR (Maximal Margin Relevance)
+    base_retriever = vectorestore.as_retriever(
+        search_type=SEARCH_TYPE,
+        search_kwargs={
+            "k": SEARCH_K,
+            "lambda_mult": MMR_DIVERSITY_LAMBDA,
+            "fetch_k": MMR_FETCH_K
+        }
+    )
+
+    # Retriever adicional con similarity para comparar
+    similarity_retriever = vectorestore.as_retriever(
+        search_type="similarity",
+        search_kwargs={"k": SEARCH_K}
+    )
+
+    # Prompt personalizado para MultiQueryRetriever
+    multi_query_prompt = PromptTemplate.from_template(MULTI_QUERY_PROMPT)
+
+    # MultiQueryRetriever con prompt personalizado y expansiones cacheadas.
+    if SEARCH_TYPE == "mmr" and MMR_UNION:
+        # Candidatos de todas las variantes en una sola consulta y una única MMR vectorizada
+        mmr_multi_retriever = UnionMMRMultiQueryRetriever.from_llm_with_cache(
+            retriever=base_retriever,
+            llm=llm_queries,
+            prompt=multi_query_prompt,
+            cache=get_expansion_cache(),
+            vectorstore=vectorestore,
+            k=MMR_UNION_K,
+            fetch_k=MMR_FETCH_K,
+            lambda_mult=MMR_DIVERSITY_LAMBDA
+        )
+    else:
+        # Las variantes se buscan en paralelo y se fusionan con RRF
+        mmr_multi_retriever = FusedMultiQueryRetriever.from_llm_with_cache(
+            retriever=base_retriever,
+            llm=llm_queries,
+            prompt=multi_query_prompt,
+            cache=get_expansion_cache(),
+            vectorstore=vectorestore,
+            search_type=SEARCH_TYPE,
+            search_kwargs=base_retriever.search_kwargs,
+            max_concurrency=MAX_SEARCH_CONCURRENCY
+        )
+
+    # Ensemble Retriever que combinar MMR y similarity
+    if ENABLE_HYBRID_SEARCH:
+        ensemble_retriever = EnsembleRetriever(
+            retrievers=[mmr_multi_retriever, similarity_retriever],
+            weights=[0.7, 0.3], # mayor peso a MMR
+            similarity_threshold=SIMILARITY_THRESHOLD
+        )
+        final_retriever = ensemble_retriever
+    else:
+        final_retriever = mmr_multi_retriever
+
+    # Filtro de relevancia: solo los fragmentos dudosos llegan al LLM, en una única llamada
+    if ENABLE_RELEVANCE_FILTER:
+        final_retriever = RelevanceFilteredRetriever(
+            relevance_filter=get_relevance_filter(),
+            base=final_retriever
+        )
+
+    # Las consultas que nombran a una persona o dirección conocida van directas a sus chunks
+    if ENABLE_ENTITY_ROUTING and get_entity_index() is not None:
+        final_retriever = EntityRouterRetriever(
+            entity_index=get_entity_index(),
+            vectorstore=vectorestore,
+            fallback=final_retriever,
+            k=ENTITY_ROUTER_K
+        )
+
+    prompt = PromptTemplate.from_template(RAG_TEMPLATE)
+
+    # Funcion para formatear y preprocesar los documentos recuperados
+    def format_docs(docs):
+        formatted = []
+
+        for i, doc in enumerate(docs, 1):
+            header = f"[Fragmento {i}]"
+            
+            if doc.metadata:
+                if 'source' in doc.metadata:
+                    source = doc.metadata['source'].split("\\")[-1] if '\\' in doc.metadata['source'] else doc.metadata['source']
+                    header += f" - Fuente: {source}"
+                if 'page' in doc.metadata:
+                    header += f" - Pagina: {doc.metadata['page']}"
+        
+            content = doc.page_content.strip()
+            formatted.append(f"{header}\n{content}")
+        
+        return "\n\n".join(formatted)
+
+    answer_chain = (
+        RunnablePassthrough.assign(context=lambda x: format_docs(x["docs"]))
+        | prompt
+        | llm_generation
+        | StrOutputParser()
+    )
+
+    # Una sola recuperación: los mismos documentos alimentan la respuesta y se devuelven con ella
+    rag_chain = (
+        RunnableParallel(docs=final_retriever, question=RunnablePassthrough())
+        | RunnablePassthrough.assign(answer=answer_chain)
+    )
+
+    return rag_chain
+
+
+def query_rag(question, use_cache=True):
+    try:
+        rag_chain = initialize_rag_system()
+
+        # Caché semántica: una pregunta equivalente ya respondida sobre la misma colección
+        # devuelve su respuesta y sus fragmentos sin recuperar ni generar
+        use_cache = use_cache and SEMANTIC_CACHE_ENABLED
+        if use_cache:
+            semantic_cache = get_semantic_cache()
+            fingerprint = get_collection_fingerprint(get_vectorstore())
+            question_vector = get_embeddings().embed_query(question)
+            cached = semantic_cache.lookup(question_vector, fingerprint)
+            if cached is not None:
+                return cached["answer"], cached["docs"]
+
+        # Obtener respuesta y los fragmentos en los que se basa
+        start = time.perf_counter()
+        result = rag_chain.invoke(question)
+        response = result["answer"]
+        docs = result["docs"]
+
+        # Formatear los documentos para mostrar (misma numeración que en el contexto del prompt)
+        docs_info = []
+        for i, doc in enumerate(docs, 1):
+            doc_info = {
+                "fragmento": i,
+                "contenido": doc.page_content[:1000] + "..." if len(doc.page_content) > 1000 else doc.page_content,
+                "fuente": doc.metadata.get('source', 'No especificada').split("\\")[-1],
+                "pagina": doc.metadata.get('page', 'No especificada')
+            }
+            docs_info.append(doc_info)
+        
+        if use_cache:
+            semantic_cache.add(question, question_vector, response, docs_info, fingerprint,
+                               time.perf_counter() - start)
+        
+        return response, docs_info
+    
+    except Exception as e:
+        error_msg = f"Error al procesar la cosulta: {str(e)}"
+        return error_msg, []
+    
+def get_retriever_info():
+    """Obtiene información sobre la configuración del retriever"""
+    return {
+        "tipo": f"{SEARCH_TYPE.upper()} + MultiQuery" + (" + Hybrid" if ENABLE_HYBRID_SEARCH else "")
+                + (" + Relevancia" if ENABLE_RELEVANCE_FILTER else "")
+                + (" + Entidades" if ENABLE_ENTITY_ROUTING and get_entity_index() is not None else ""),
+        "documentos": SEARCH_K,
+        "diversidad": MMR_DIVERSITY_LAMBDA,
+        "candidatos": MMR_FETCH_K,
+        "umbral": SIMILARITY_THRESHOLD if ENABLE_HYBRID_SEARCH else "N/A",
+        "cache_expansiones": get_expansion_cache().stats(),
+        "cache_embeddings": get_embeddings().stats(),
+        "cache_semantica": get_semantic_cache().stats(),
+        "indice_entidades": get_entity_index().stats() if get_entity_index() is not None else None,
+        "filtro_relevancia": get_relevance_filter().stats() if ENABLE_RELEVANCE_FILTER else None
+    }
\ No newline at end of file
@@ -0,0 +1,136 @@
+import re
+import threading
+from typing import List, Optional, Set
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from entity_index import normalize_entity
+from prompts import RELEVANCE_BATCH_PROMPT
+from similarity import normalize_rows
+
+# Palabras de la consulta que no aportan al solapamiento léxico
+STOPWORDS = frozenset("""
+que cual cuales quien quienes como cuando donde cuanto cuanta cuantos cuantas para por con sin sobre
+entre desde hasta este esta estos estas ese esa esos esas del los las una unos unas hay tiene tienen
+contrato contratos
+""".split())
+
+
+def content_tokens(text: str) -> Set[str]:
+    """Palabras con contenido (sin tildes, de más de dos letras y fuera de STOPWORDS)."""
+    return {t for t in normalize_entity(text) if len(t) > 2 and t not in STOPWORDS}
+
+
+def lexical_overlap(query: str, texts: List[str]) -> np.ndarray:
+    """Fracción de las palabras con contenido de la consulta que aparece en cada texto."""
+    query_tokens = content_tokens(query)
+    if not query_tokens:
+        return np.zeros(len(texts), dtype=np.float32)
+    return np.array([len(query_tokens & set(normalize_entity(t))) / len(query_tokens) for t in texts],
+                    dtype=np.float32)
+
+
+def parse_relevant_numbers(response: str, n: int) -> Optional[Set[int]]:
+    """Números de fragmento (1..n) marcados como relevantes; None si la respuesta no se entiende."""
+    match = re.search(r"RELEVANTES\W*:\s*(.*)", response, re.IGNORECASE)
+    if not match:
+        return None
+    if re.match(r"\W*ninguno", match.group(1), re.IGNORECASE):
+        return set()
+    return {int(x) for x in re.findall(r"\d+", match.group(1)) if 1 <= int(x) <= n}
+
+
+class RelevanceFilter:
+    """Filtro de relevancia de los fragmentos recuperados en dos etapas.
+
+    Primero puntúa todos los fragmentos a la vez con señales baratas: la
+    similitud coseno con la consulta (un producto matriz-vector sobre los
+    embeddings, que ya están en la caché de la ingesta) y el solapamiento
+    léxico. Los que superan `accept_threshold` se aceptan y los que no llegan
+    a `reject_threshold` se descartan sin preguntar al LLM. Solo la franja
+    intermedia se juzga con el LLM, en una única llamada con todos sus
+    fragmentos (RELEVANCE_BATCH_PROMPT) en lugar de una llamada por fragmento.
+    """
+
+    def __init__(self, embeddings: Embeddings, llm, accept_threshold: float = 0.55,
+                 reject_threshold: float = 0.30, lexical_weight: float = 0.3, min_keep: int = 1,
+                 prompt: str = RELEVANCE_BATCH_PROMPT):
+        self.embeddings = embeddings
+        self.chain = PromptTemplate.from_template(prompt) | llm | StrOutputParser()
+        self.accept_threshold = accept_threshold
+        self.reject_threshold = reject_threshold
+        self.lexical_weight = lexical_weight
+        self.min_keep = min_keep
+        self.queries = 0
+        self.chunks = 0
+        self.auto_accepted = 0
+        self.auto_rejected = 0
+        self.llm_graded = 0
+        self.llm_accepted = 0
+        self.llm_calls = 0
+        self._lock = threading.Lock()
+
+    def scores(self, query: str, docs: List[Document]) -> np.ndarray:
+        """Puntuación combinada de cada fragmento: coseno y solapamiento léxico ponderados."""
+        texts = [doc.page_content for doc in docs]
+        query_vector = normalize_rows(self.embeddings.embed_query(query))[0]
+        cosine = normalize_rows(self.embeddings.embed_documents(texts)) @ query_vector
+        return (1 - self.lexical_weight) * cosine + self.lexical_weight * lexical_overlap(query, texts)
+
+    def grade(self, query: str, docs: List[Document], config: Optional[dict] = None) -> Optional[Set[int]]:
+        """Juicio del LLM sobre varios fragmentos en una sola llamada (índices relevantes)."""
+        fragments = "\n\n".join(f"[Fragmento {i}]\n{doc.page_content.strip()}" for i, doc in enumerate(docs, 1))
+        response = self.chain.invoke({"fragments": fragments, "question": query}, config=config)
+        numbers = parse_relevant_numbers(response, len(docs))
+        return None if numbers is None else {n - 1 for n in numbers}
+
+    def filter(self, query: str, docs: List[Document], config: Optional[dict] = None) -> List[Document]:
+        """Fragmentos relevantes, en el orden en que llegaron."""
+        if not docs:
+            return docs
+        scores = self.scores(query, docs)
+        accepted = scores >= self.accept_threshold
+        ambiguous = np.flatnonzero(~accepted & (scores >= self.reject_threshold))
+
+        keep = accepted.copy()
+        llm_accepted = 0
+        if len(ambiguous):
+            relevant = self.grade(query, [docs[i] for i in ambiguous], config)
+            # Si la respuesta no se entiende se conservan los dudosos
+            relevant = set(range(len(ambiguous))) if relevant is None else relevant
+            for position in relevant:
+                keep[ambiguous[position]] = True
+            llm_accepted = len(relevant)
+
+        # Nunca se deja a la generación sin contexto: se conservan los mejor puntuados
+        if keep.sum() < min(self.min_keep, len(docs)):
+            keep[np.argsort(-scores)[:self.min_keep]] = True
+
+        with self._lock:
+            self.queries += 1
+            self.chunks += len(docs)
+            self.auto_accepted += int(accepted.sum())
+            self.auto_rejected += len(docs) - int(accepted.sum()) - len(ambiguous)
+            self.llm_graded += len(ambiguous)
+            self.llm_accepted += llm_accepted
+            self.llm_calls += 1 if len(ambiguous) else 0
+
+        return [doc for doc, k in zip(docs, keep) if k]
+
+    def stats(self) -> dict:
+        """Contadores por etapa y juicios/llamadas al LLM evitados frente a uno por fragmento."""
+        return {
+            "queries": self.queries,
+            "chunks": self.chunks,
+            "auto_accepted": self.auto_accepted,
+            "auto_rejected": self.auto_rejected,
+            "llm_graded": self.llm_graded,
+            "llm_accepted": self.llm_accepted,
+            "llm_calls": self.llm_calls,
+            "llm_judgments_avoided": self.chunks - self.llm_graded,
+            "llm_calls_avoided": self.chunks - self.llm_calls
+        }
@@ -0,0 +1,184 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from expansion_cache import CachedMultiQueryRetriever
+from numpy_vectorstore import mmr_select
+
+
+def content_hash(doc: Document) -> str:
+    """Hash del contenido del fragmento, usado para eliminar duplicados."""
+    return hashlib.md5(doc.page_content.strip().encode()).hexdigest()
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int = 60) -> List[Document]:
+    """Combina varios rankings con Reciprocal Rank Fusion y elimina duplicados."""
+    scores: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, 1):
+            key = content_hash(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+class FusedMultiQueryRetriever(CachedMultiQueryRetriever):
+    """MultiQueryRetriever con búsquedas concurrentes por variante y fusión RRF.
+
+    Todas las variantes se embeben en una única llamada a embed_documents y
+    cada búsqueda (similarity o MMR) se lanza en un pool acotado de hilos.
+    """
+
+    vectorstore: Any = None
+    search_type: str = "similarity"
+    search_kwargs: dict = {}
+    max_concurrency: int = 4
+    rrf_k: int = 60
+
+    def _search(self, embedding: List[float]) -> List[Document]:
+        if self.search_type == "mmr":
+            return self.vectorstore.max_marginal_relevance_search_by_vector(
+                embedding, **self.search_kwargs
+            )
+        return self.vectorstore.similarity_search_by_vector(embedding, **self.search_kwargs)
+
+    def _get_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        queries = self.generate_queries(query, run_manager)
+        queries = [query] + [q for q in queries if q.strip() and q != query]
+
+        embeddings = self.vectorstore.embeddings.embed_documents(queries)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(embeddings))) as pool:
+            rankings = list(pool.map(self._search, embeddings))
+
+        return reciprocal_rank_fusion(rankings, k=self.rrf_k)
+
+
+def fetch_candidates(vectorstore, embeddings: List[List[float]],
+                     fetch_k: int = 20) -> Tuple[List[Document], np.ndarray]:
+    """Unión de los `fetch_k` candidatos de cada consulta con sus vectores normalizados.
+
+    En Chroma es una sola consulta por lotes que ya devuelve los embeddings,
+    así que no hay que volver a leerlos para la MMR.
+    """
+    if hasattr(vectorstore, "candidates_by_vectors"):
+        return vectorstore.candidates_by_vectors(embeddings, fetch_k)
+
+    results = vectorstore._collection.query(
+        query_embeddings=embeddings,
+        n_results=fetch_k,
+        include=["documents", "metadatas", "embeddings"]
+    )
+    docs, vectors, seen = [], [], set()
+    for ids, texts, metadatas, candidate_vectors in zip(results["ids"], results["documents"],
+                                                         results["metadatas"], results["embeddings"]):
+        for doc_id, text, metadata, vector in zip(ids, texts, metadatas, candidate_vectors):
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            docs.append(Document(page_content=text, metadata=metadata or {}, id=doc_id))
+            vectors.append(vector)
+
+    vectors = np.array(vectors, dtype=np.float32).reshape(len(docs), -1)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return docs, vectors
+
+
+class UnionMMRMultiQueryRetriever(CachedMultiQueryRetriever):
+    """MultiQueryRetriever con una única etapa MMR sobre la unión de candidatos.
+
+    En lugar de una búsqueda MMR por variante, recoge una vez los `fetch_k`
+    candidatos de cada variante (con sus embeddings), calcula la matriz de
+    similitudes consulta × candidato en una sola operación y hace la
+    selección voraz de MMR sobre la unión. La relevancia de cada candidato
+    es su mejor similitud con cualquiera de las consultas.
+    """
+
+    vectorstore: Any = None
+    k: int = 4
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+
+    def _get_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        queries = self.generate_queries(query, run_manager)
+        queries = [query] + [q for q in queries if q.strip() and q != query]
+
+        embeddings = self.vectorstore.embeddings.embed_documents(queries)
+        docs, candidates = fetch_candidates(self.vectorstore, embeddings, self.fetch_k)
+        if not docs:
+            return []
+
+        query_matrix = np.array(embeddings, dtype=np.float32)
+        query_matrix /= np.maximum(np.linalg.norm(query_matrix, axis=1, keepdims=True), 1e-12)
+        relevance = (query_matrix @ candidates.T).max(axis=0)
+
+        return [docs[i] for i in mmr_select(relevance, candidates, self.k, self.lambda_mult)]
+
+
+def fetch_candidates_by_ids(vectorstore, ids: List[str]) -> Tuple[List[Document], np.ndarray]:
+    """Chunks de `ids`, en el orden pedido, con sus vectores normalizados (sin búsqueda vectorial)."""
+    if hasattr(vectorstore, "candidates_by_ids"):
+        return vectorstore.candidates_by_ids(ids)
+
+    data = vectorstore.get(ids=ids, include=["documents", "metadatas", "embeddings"])
+    found = {
+        doc_id: (Document(page_content=text, metadata=metadata or {}, id=doc_id), vector)
+        for doc_id, text, metadata, vector in zip(data["ids"], data["documents"], data["metadatas"],
+                                                  data["embeddings"])
+    }
+    rows = [found[doc_id] for doc_id in ids if doc_id in found]
+    docs = [doc for doc, _ in rows]
+    vectors = np.array([vector for _, vector in rows], dtype=np.float32).reshape(len(docs), -1)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return docs, vectors
+
+
+class EntityRouterRetriever(BaseRetriever):
+    """Envía las consultas que nombran a una persona o dirección del índice de entidades
+    directamente a sus chunks; el resto pasa al retriever de siempre.
+
+    Los chunks de los contratos encontrados se ordenan por similitud con la
+    consulta antes de quedarse con `k` (la cláusula que responde no tiene por
+    qué repetir el nombre); a igual similitud van antes los que mencionan la
+    entidad. Las consultas enrutadas no generan variantes con el LLM.
+    """
+
+    entity_index: Any = None  # EntityIndex
+    vectorstore: Any = None
+    fallback: BaseRetriever
+    k: int = 4
+
+    def _get_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        ids = self.entity_index.chunk_ids(query)
+        if ids:
+            docs, vectors = fetch_candidates_by_ids(self.vectorstore, ids)
+            if docs:
+                query_vector = np.array(self.vectorstore.embeddings.embed_query(query), dtype=np.float32)
+                query_vector /= max(float(np.linalg.norm(query_vector)), 1e-12)
+                # Orden estable: a igual similitud se conserva el de chunk_ids (menciones primero)
+                order = np.argsort(-(vectors @ query_vector), kind="stable")[:self.k]
+                return [docs[i] for i in order]
+        return self.fallback.invoke(query, config={"callbacks": run_manager.get_child()})
+
+
+class RelevanceFilteredRetriever(BaseRetriever):
+    """Aplica un RelevanceFilter a los documentos del retriever base.
+
+    Las señales vectorizadas resuelven los casos claros; el LLM solo ve los
+    dudosos, todos en la misma llamada.
+    """
+
+    relevance_filter: Any = None  # RelevanceFilter
+    base: BaseRetriever
+
+    def _get_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        config = {"callbacks": run_manager.get_child()}
+        docs = self.base.invoke(query, config=config)
+        return self.relevance_filter.filter(query, docs, config=config)
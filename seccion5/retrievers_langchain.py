@@ -1,8 +1,10 @@
 from langchain_community.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings
 
+from embeddings_cache import CachedEmbeddings
+
 vectorstore = Chroma(
-    embedding_function=OpenAIEmbeddings(model="text-embedding-3-large"),
+    embedding_function=CachedEmbeddings(OpenAIEmbeddings(model="text-embedding-3-large")),
     persist_directory="C:\\Users\\santiago\\curso_langchain\\Tema 3\\chroma_db"
 )
 
@@ -0,0 +1,101 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """Caché semántica en memoria de respuestas del asistente legal.
+
+    Guarda el embedding normalizado de cada pregunta respondida en una matriz
+    de NumPy; una pregunta nueva se compara con todas en un único producto
+    matriz-vector y, si la más parecida supera `threshold` (similitud coseno),
+    se devuelven su respuesta y sus fragmentos sin pasar por el LLM. Todas las
+    entradas se descartan cuando cambia la huella de la colección, y cuando
+    se llena se expulsa la entrada usada hace más tiempo.
+    """
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 1000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.fingerprint: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.generations = 0
+        self.generation_seconds = 0.0
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Dict[str, Any]] = []
+        self._last_used = np.zeros(self.max_entries, dtype=np.float64)
+
+    def _check_fingerprint(self, fingerprint: str):
+        """Descarta todas las entradas si la colección ha cambiado desde que se guardaron."""
+        if fingerprint != self.fingerprint:
+            if self._entries:
+                self.invalidations += 1
+            self._clear()
+            self.fingerprint = fingerprint
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, vector: List[float], fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Devuelve la entrada más parecida por encima del umbral (con su similitud) o None."""
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            n = len(self._entries)
+            similarities = self._vectors[:n] @ self._normalize(vector)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._last_used[best] = time.monotonic()
+            return {**self._entries[best], "similarity": round(float(similarities[best]), 4)}
+
+    def add(self, question: str, vector: List[float], answer: str, docs: List[Dict[str, Any]],
+            fingerprint: str, generation_seconds: float = 0.0):
+        """Guarda la respuesta generada para la colección con esa huella."""
+        vector = self._normalize(vector)
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+            self.generations += 1
+            self.generation_seconds += generation_seconds
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+
+            if len(self._entries) < self.max_entries:
+                slot = len(self._entries)
+                self._entries.append({})
+            else:
+                slot = int(np.argmin(self._last_used))
+
+            self._vectors[slot] = vector
+            self._entries[slot] = {"question": question, "answer": answer, "docs": docs}
+            self._last_used[slot] = time.monotonic()
+
+    def stats(self) -> dict:
+        """Contadores de aciertos/fallos y latencia estimada ahorrada."""
+        total = self.hits + self.misses
+        avg = self.generation_seconds / self.generations if self.generations else 0.0
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "invalidations": self.invalidations,
+            "saved_seconds": round(avg * self.hits, 2)
+        }
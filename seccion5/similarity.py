@@ -0,0 +1,118 @@
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Copia float32 con cada fila a norma 1 (las filas nulas quedan a cero)."""
+    matrix = np.array(matrix, dtype=np.float32, ndmin=2)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    return matrix
+
+
+def embed_normalized(embeddings: Embeddings, texts: Sequence[str]) -> np.ndarray:
+    """Embebe todos los textos con una sola llamada a embed_documents y normaliza una vez."""
+    return normalize_rows(embeddings.embed_documents(list(texts)))
+
+
+def _blocks(n: int, block_size: int) -> Iterator[Tuple[int, int]]:
+    for start in range(0, n, block_size):
+        yield start, min(start + block_size, n)
+
+
+def similarity_matrix(a: np.ndarray, b: Optional[np.ndarray] = None,
+                      block_size: int = 2048) -> np.ndarray:
+    """Matriz completa de similitudes coseno entre las filas de `a` y `b` (o `a` consigo misma).
+
+    Se rellena por bloques de filas sobre una matriz ya reservada, sin
+    temporales del tamaño del resultado. Para N grande usar top_k_similar.
+    """
+    a = normalize_rows(a)
+    b = a if b is None else normalize_rows(b)
+    result = np.empty((len(a), len(b)), dtype=np.float32)
+    for start, end in _blocks(len(a), block_size):
+        np.matmul(a[start:end], b.T, out=result[start:end])
+    return result
+
+
+def top_k_similar(a: np.ndarray, b: Optional[np.ndarray] = None, k: int = 10,
+                  block_size: int = 1024) -> Tuple[np.ndarray, np.ndarray]:
+    """Los `k` vecinos más parecidos de cada fila de `a` entre las filas de `b`.
+
+    Multiplica bloques de `block_size` × `block_size` y mantiene un top-k
+    parcial por fila, así que la memoria no depende de N. Si `b` es None se
+    compara `a` consigo misma y se excluye cada fila de sus propios vecinos.
+    Devuelve (índices, similitudes), ambos de forma (len(a), k), ordenados
+    de mayor a menor similitud.
+    """
+    self_join = b is None
+    a = normalize_rows(a)
+    b = a if self_join else normalize_rows(b)
+    k = min(k, len(b) - (1 if self_join else 0))
+    indices = np.zeros((len(a), max(k, 0)), dtype=np.int64)
+    scores = np.full((len(a), max(k, 0)), -np.inf, dtype=np.float32)
+    if k <= 0:
+        return indices, scores
+
+    for row_start, row_end in _blocks(len(a), block_size):
+        best_scores = np.full((row_end - row_start, k), -np.inf, dtype=np.float32)
+        best_indices = np.zeros((row_end - row_start, k), dtype=np.int64)
+
+        for col_start, col_end in _blocks(len(b), block_size):
+            block = a[row_start:row_end] @ b[col_start:col_end].T
+            if self_join and row_start < col_end and col_start < row_end:
+                rows = np.arange(max(row_start, col_start), min(row_end, col_end))
+                block[rows - row_start, rows - col_start] = -np.inf
+
+            # Fusión del top-k parcial con el bloque actual
+            merged_scores = np.concatenate([best_scores, block], axis=1)
+            merged_indices = np.concatenate(
+                [best_indices, np.broadcast_to(np.arange(col_start, col_end), block.shape)], axis=1
+            )
+            top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(merged_scores, top, axis=1)
+            best_indices = np.take_along_axis(merged_indices, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        scores[row_start:row_end] = np.take_along_axis(best_scores, order, axis=1)
+        indices[row_start:row_end] = np.take_along_axis(best_indices, order, axis=1)
+
+    return indices, scores
+
+
+def near_duplicate_clusters(vectors: np.ndarray, threshold: float = 0.95,
+                            block_size: int = 1024) -> List[List[int]]:
+    """Grupos de filas con similitud coseno >= `threshold` (componentes conexas).
+
+    Solo se calculan los bloques del triángulo superior y de cada bloque
+    solo se extraen los pares por encima del umbral, que se unen con
+    union-find. Devuelve los grupos de al menos dos elementos, de mayor a
+    menor tamaño.
+    """
+    vectors = normalize_rows(vectors)
+    parent = np.arange(len(vectors))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for row_start, row_end in _blocks(len(vectors), block_size):
+        for col_start, col_end in _blocks(len(vectors), block_size):
+            if col_end <= row_start:
+                continue
+            block = vectors[row_start:row_end] @ vectors[col_start:col_end].T
+            rows, cols = np.nonzero(block >= threshold)
+            rows, cols = rows + row_start, cols + col_start
+            for i, j in zip(rows[rows < cols].tolist(), cols[rows < cols].tolist()):
+                root_i, root_j = find(i), find(j)
+                if root_i != root_j:
+                    parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    roots = np.array([find(i) for i in range(len(vectors))], dtype=np.int64)
+    clusters = {}
+    for i, root in enumerate(roots.tolist()):
+        clusters.setdefault(root, []).append(i)
+    return sorted((c for c in clusters.values() if len(c) > 1), key=len, reverse=True)
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from embedding_scheduler import count_tokens, get_encoding
+
+MAP_PROMPT = "Haz un resumen de los puntos mas importantes del siguiente texto: {text}"
+REDUCE_PROMPT = "Combina y sintetiza estos resumenes en un resumen coherente y completo: {text}"
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Los primeros `max_tokens` tokens del texto (con la misma cuenta que count_tokens)."""
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+class SummaryCache:
+    """Caché persistente en SQLite de los resúmenes ya generados (permite reanudar)."""
+
+    def __init__(self, db_path: str = "summary_cache.db"):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS summaries (
+                key TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                created REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def key(self, prompt: str, model: str, text: str) -> str:
+        return hashlib.sha256(f"{prompt}\n{model}\n{text}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, summary: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, created) VALUES (?, ?, ?)",
+                (key, summary, time.time())
+            )
+            self._conn.commit()
+
+
+class MapReduceSummarizer:
+    """Resumen map-reduce concurrente para documentos largos.
+
+    La fase map resume todos los chunks a la vez (como mucho `max_concurrency`
+    llamadas simultáneas). La fase reduce agrupa los resúmenes en grupos de
+    como mucho `reduce_token_budget` tokens y los combina por niveles hasta
+    que queda uno, así que ningún prompt supera la ventana de contexto. Cada
+    resumen se guarda en la caché en cuanto llega, de modo que una ejecución
+    interrumpida se reanuda sin repetir llamadas.
+    """
+
+    def __init__(self, llm, cache: Optional[SummaryCache] = None, max_concurrency: int = 8,
+                 reduce_token_budget: int = 8000, map_prompt: str = MAP_PROMPT,
+                 reduce_prompt: str = REDUCE_PROMPT):
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.reduce_token_budget = reduce_token_budget
+        self.map_prompt = map_prompt
+        self.reduce_prompt = reduce_prompt
+        self.map_chain = PromptTemplate.from_template(map_prompt) | llm | StrOutputParser()
+        self.reduce_chain = PromptTemplate.from_template(reduce_prompt) | llm | StrOutputParser()
+        self.model = getattr(llm, "model_name", None) or type(llm).__name__
+        self.llm_calls = 0
+
+    async def _run(self, chain, prompt: str, texts: Sequence[str]) -> AsyncIterator[Tuple[int, str, bool]]:
+        """Ejecuta la cadena sobre los textos y devuelve (índice, resumen, cacheado) según terminan."""
+        keys = [self.cache.key(prompt, self.model, t) for t in texts] if self.cache else []
+        missing = []
+        for i, text in enumerate(texts):
+            summary = self.cache.get(keys[i]) if self.cache else None
+            if summary is None:
+                missing.append(i)
+            else:
+                yield i, summary, True
+
+        if not missing:
+            return
+        self.llm_calls += len(missing)
+        inputs = [{"text": texts[i]} for i in missing]
+        async for position, summary in chain.abatch_as_completed(
+            inputs, config={"max_concurrency": self.max_concurrency}
+        ):
+            i = missing[position]
+            if self.cache:
+                self.cache.set(keys[i], summary)
+            yield i, summary, False
+
+    def _group(self, summaries: List[str]) -> List[List[str]]:
+        """Agrupa los resúmenes sin superar nunca el presupuesto de tokens.
+
+        Un resumen de más de medio presupuesto se recorta a esa mitad: así cabe
+        siempre junto a otro y cada nivel reduce el número de resúmenes. Un
+        grupo puede quedar con un solo resumen.
+        """
+        max_summary_tokens = self.reduce_token_budget // 2
+        groups, group, tokens = [], [], 0
+        for summary in summaries:
+            summary_tokens = count_tokens(summary)
+            if summary_tokens > max_summary_tokens:
+                # Al volver a tokenizar el texto recortado puede salir algún token más;
+                # se cuenta como la mitad para que dos recortados sigan cabiendo juntos
+                summary = truncate_tokens(summary, max_summary_tokens)
+                summary_tokens = max_summary_tokens
+            if group and tokens + summary_tokens > self.reduce_token_budget:
+                groups.append(group)
+                group, tokens = [], 0
+            group.append(summary)
+            tokens += summary_tokens
+        if group:
+            groups.append(group)
+        return groups
+
+    async def astream(self, documents: Sequence[Document]) -> AsyncIterator[Dict]:
+        """Emite los resúmenes parciales según se generan y al final el resumen completo.
+
+        Eventos: {"stage": "map" | "reduce", "level", "index", "total", "summary", "cached"}
+        y por último {"stage": "final", "summary", "levels", "llm_calls"}.
+        """
+        texts = [doc.page_content for doc in documents]
+        summaries: List[str] = [""] * len(texts)
+        async for i, summary, cached in self._run(self.map_chain, self.map_prompt, texts):
+            summaries[i] = summary
+            yield {"stage": "map", "level": 0, "index": i, "total": len(texts),
+                   "summary": summary, "cached": cached}
+
+        level = 0
+        while len(summaries) > 1:
+            level += 1
+            groups = self._group(summaries)
+            reduced: List[str] = [""] * len(groups)
+
+            # Un grupo de un solo resumen pasa tal cual al siguiente nivel
+            pending = [i for i, g in enumerate(groups) if len(g) > 1]
+            for i, group in enumerate(groups):
+                if len(group) == 1:
+                    reduced[i] = group[0]
+
+            inputs = ["\n\n".join(groups[i]) for i in pending]
+            async for position, summary, cached in self._run(self.reduce_chain, self.reduce_prompt, inputs):
+                reduced[pending[position]] = summary
+                yield {"stage": "reduce", "level": level, "index": pending[position],
+                       "total": len(groups), "summary": summary, "cached": cached}
+            summaries = reduced
+
+        yield {"stage": "final", "summary": summaries[0] if summaries else "",
+               "levels": level, "llm_calls": self.llm_calls}
+
+    async def asummarize(self, documents: Sequence[Document]) -> str:
+        summary = ""
+        async for event in self.astream(documents):
+            if event["stage"] == "final":
+                summary = event["summary"]
+        return summary
+
+    def summarize(self, documents: Sequence[Document]) -> str:
+        return asyncio.run(self.asummarize(documents))
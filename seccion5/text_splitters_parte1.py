@@ -1,9 +1,11 @@
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_openai import ChatOpenAI
 
-# 1. Cargar el documento PDF
-loader = PyPDFLoader("C:\\Users\\santiago\\curso_langchain\\Tema 3\\quijote.pdf")
-pages = loader.load()
+from document_cache import DocumentCache
+
+# 1. Cargar el documento PDF (las páginas extraídas se guardan en caché: si el PDF
+# no cambia, no se vuelve a leer)
+cache = DocumentCache("document_cache")
+pages = cache.load_pdf("C:\\Users\\santiago\\curso_langchain\\Tema 3\\quijote.pdf")
 
 # 2. Combinar todas las páginas en un texto único
 full_text = ""
@@ -1,32 +1,43 @@
-from langchain_community.document_loaders import PyPDFLoader
+import asyncio
+
 from langchain_openai import ChatOpenAI
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-# 1. Cargar el documento PDF
-loader = PyPDFLoader("C:\\Users\\santiago\\curso_langchain\\Tema 3\\quijote.pdf")
-pages = loader.load()
+from document_cache import DocumentCache
+from summarizer import MapReduceSummarizer, SummaryCache
+from token_splitter import TokenBudgetSplitter, chunk_token_counts, token_distribution
+
+# 1. Cargar el documento PDF (páginas y chunks en caché por hash del fichero y configuración del splitter)
+cache = DocumentCache("document_cache")
+pdf_path = "C:\\Users\\santiago\\curso_langchain\\Tema 3\\quijote.pdf"
 
-# Dividir el texto en chunks mas pequeños
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=10000,
-    chunk_overlap=200
+# Dividir el texto en chunks mas pequeños, con un presupuesto fijo de tokens por chunk
+text_splitter = TokenBudgetSplitter(
+    chunk_tokens=2500,
+    overlap_tokens=50
 )
 
-chunks = text_splitter.split_documents(pages)
+chunks = cache.load_and_split(pdf_path, text_splitter)
+print(f"Tokens por chunk: {token_distribution(chunk_token_counts(chunks))}")
 
-# 3. Pasar el texto al LLM
+# 3. Resumir todos los chunks en paralelo y combinarlos por niveles (map-reduce).
+# Los resúmenes se guardan en caché: si se interrumpe, se reanuda donde se quedó
 llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.2)
-summaries = []
+summarizer = MapReduceSummarizer(
+    llm,
+    cache=SummaryCache("summary_cache.db"),
+    max_concurrency=8,
+    reduce_token_budget=8000
+)
+
 
-i = 0
-for chunk in chunks:
-    if i > 10:
-        break
-    response = llm.invoke(f"Haz un resumen de los puntos mas importantes del siguiente texto: {chunk.page_content}")
-    summaries.append(response.content)
-    i += 1
+async def main():
+    async for event in summarizer.astream(chunks):
+        if event["stage"] == "final":
+            print(f"\nResumen final ({event['levels']} niveles, {event['llm_calls']} llamadas al LLM):\n")
+            print(event["summary"])
+        else:
+            origen = "caché" if event["cached"] else "LLM"
+            print(f"[{event['stage']} nivel {event['level']}] {event['index'] + 1}/{event['total']} ({origen})")
 
-print(summaries)
 
-final_summary = llm.invoke(f"Combina y sintetiza estos resumenes en un resumen coherente y completo: {" ".join(summaries)}")
-print(final_summary.content)
\ No newline at end of file
+asyncio.run(main())
@@ -0,0 +1,140 @@
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_text_splitters import TextSplitter
+
+from embedding_scheduler import count_tokens, get_encoding
+
+
+def token_offsets(text: str) -> np.ndarray:
+    """Posición (en caracteres) donde empieza cada token del texto, tokenizando una sola vez."""
+    encoding = get_encoding()
+    if encoding is None:
+        # Sin tiktoken: palabras y signos sueltos como aproximación a los tokens
+        return np.array([m.start() for m in re.finditer(r"\s*\w+|\s*[^\w\s]|\s+", text)], dtype=np.int64)
+    _, offsets = encoding.decode_with_offsets(encoding.encode(text, disallowed_special=()))
+    return np.asarray(offsets, dtype=np.int64)
+
+
+def boundary_levels(text: str, offsets: np.ndarray) -> np.ndarray:
+    """Prioridad de corte antes de cada token: párrafo 4, línea 3, frase 2, palabra 1, ninguna 0.
+
+    Se calcula vectorizada sobre los códigos de los caracteres; cuenta tanto
+    el separador que precede al token como el que lo encabeza (" palabra").
+    """
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    n = len(codes)
+    cur, prev1, prev2, next1 = (np.zeros(n + 1, dtype=np.uint32) for _ in range(4))
+    cur[:n] = codes
+    prev1[1:] = codes
+    prev2[2:] = codes[:-1]
+    next1[:max(n - 1, 0)] = codes[1:]
+
+    space, newline = ord(" "), ord("\n")
+    sentence_end = np.isin(prev1, [ord("."), ord("?"), ord("!")])
+    levels = np.zeros(n + 1, dtype=np.int8)
+    for level, mask in [
+        (1, (prev1 == space) | (cur == space)),
+        (2, (np.isin(prev2, [ord("."), ord("?"), ord("!")]) & (prev1 == space)) | (sentence_end & (cur == space))),
+        (3, (prev1 == newline) | (cur == newline)),
+        (4, ((prev2 == newline) & (prev1 == newline)) | ((cur == newline) & (next1 == newline)))
+    ]:
+        levels[mask] = level
+    return levels[offsets]
+
+
+def token_distribution(counts: Sequence[int]) -> Dict[str, float]:
+    """Resumen de la distribución de tokens por chunk de un corpus."""
+    if not len(counts):
+        return {"chunks": 0, "total": 0}
+    counts = np.asarray(counts)
+    return {
+        "chunks": int(len(counts)),
+        "total": int(counts.sum()),
+        "min": int(counts.min()),
+        "mean": round(float(counts.mean()), 1),
+        "p50": int(np.percentile(counts, 50)),
+        "p95": int(np.percentile(counts, 95)),
+        "max": int(counts.max())
+    }
+
+
+def chunk_token_counts(documents: Iterable[Document]) -> List[int]:
+    """Tokens de cada chunk (los de TokenBudgetSplitter ya los llevan en los metadatos)."""
+    return [doc.metadata.get("tokens") or count_tokens(doc.page_content) for doc in documents]
+
+
+class TokenBudgetSplitter(TextSplitter):
+    """Divide el texto en chunks de como mucho `chunk_tokens` tokens.
+
+    Cada documento se tokeniza una sola vez y se guardan los offsets de los
+    tokens, así que los cortes se eligen sobre esos offsets sin volver a
+    tokenizar cada candidato. Dentro de la segunda mitad de la ventana se
+    corta en el mejor límite disponible (párrafo, línea, frase o palabra).
+    Cada chunk lleva en sus metadatos su número de tokens y su posición.
+    """
+
+    def __init__(self, chunk_tokens: int = 512, overlap_tokens: int = 64, **kwargs):
+        super().__init__(chunk_size=chunk_tokens, chunk_overlap=overlap_tokens,
+                         length_function=count_tokens, **kwargs)
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def config(self) -> Dict[str, object]:
+        """Parámetros que determinan los chunks; si cambian hay que volver a dividir.
+
+        Incluye el tokenizador: sin tiktoken los cortes salen de la
+        aproximación por palabras y no coinciden con los de cl100k_base.
+        """
+        encoding = get_encoding()
+        return {
+            "class": type(self).__name__,
+            "chunk_tokens": self.chunk_tokens,
+            "overlap_tokens": self.overlap_tokens,
+            "encoding": encoding.name if encoding is not None else "regex"
+        }
+
+    def split_with_offsets(self, text: str) -> List[Tuple[str, int, int]]:
+        """Devuelve (texto, carácter inicial, tokens) de cada chunk."""
+        offsets = token_offsets(text)
+        n = len(offsets)
+        if n == 0:
+            return []
+        levels = boundary_levels(text, offsets)
+        char_offsets = np.append(offsets, len(text))
+
+        chunks = []
+        start = 0
+        while start < n:
+            end = min(start + self.chunk_tokens, n)
+            if end < n:
+                # Mejor corte en la segunda mitad de la ventana
+                low = start + max(self.chunk_tokens // 2, 1)
+                window = levels[low:end + 1]
+                best = int(window.max()) if len(window) else 0
+                if best > 0:
+                    end = low + int(np.flatnonzero(window == best)[-1])
+
+            chunk = text[char_offsets[start]:char_offsets[end]].strip()
+            if chunk:
+                chunks.append((chunk, int(char_offsets[start]), end - start))
+            if end >= n:
+                break
+            start = max(end - self.overlap_tokens, start + 1)
+        return chunks
+
+    def split_text(self, text: str) -> List[str]:
+        return [chunk for chunk, _, _ in self.split_with_offsets(text)]
+
+    def create_documents(self, texts: List[str], metadatas: Optional[List[dict]] = None) -> List[Document]:
+        metadatas = metadatas or [{}] * len(texts)
+        documents = []
+        for text, metadata in zip(texts, metadatas):
+            for chunk, start, tokens in self.split_with_offsets(text):
+                documents.append(Document(
+                    page_content=chunk,
+                    metadata={**metadata, "start_index": start, "tokens": tokens}
+                ))
+        return documents
@@ -1,33 +1,89 @@
 from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.document_loaders import PyPDFDirectoryLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
-loader = PyPDFDirectoryLoader("C:\\Users\\santiago\\curso_langchain\\Tema 3\\contratos")
-documentos = loader.load()
+from config import ENTITY_INDEX_FILE
+from embeddings_cache import CachedEmbeddings
+from embedding_scheduler import EmbeddingScheduler
+from entity_index import EntityExtractor, EntityIndex
+from incremental_index import IncrementalIndexer
+from ingestion_pipeline import PDFIngestionPipeline
+from numpy_vectorstore import NumpyVectorStore
+from token_splitter import TokenBudgetSplitter
 
-print(f"Se cargaron {len(documentos)} documentos desde el directorio.")
+CONTRATOS_PATH = "C:\\Users\\santiago\\curso_langchain\\Tema 3\\contratos"
+CHROMA_PATH = "C:\\Users\\santiago\\curso_langchain\\Tema 3\\chroma_db"
+NUMPY_STORE_PATH = "C:\\Users\\santiago\\curso_langchain\\Tema 3\\numpy_store"
 
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=5000,
-    chunk_overlap=1000
+# "chroma" o "numpy": para colecciones pequeñas la matriz en memoria mapeada arranca
+# antes, ocupa menos y la búsqueda es exacta
+BACKEND = "chroma"
+
+# Chunks de tamaño fijo en tokens (antes 5000/1000 caracteres, con mucho solapamiento)
+text_splitter = TokenBudgetSplitter(
+    chunk_tokens=1200,
+    overlap_tokens=120
 )
 
-docs_split = text_splitter.split_documents(documentos)
+# Los PDFs se leen en un pool de procesos: en Windows cada proceso vuelve a importar
+# este script, así que el trabajo se hace solo desde el proceso principal
+if __name__ == "__main__":
+    embeddings = CachedEmbeddings(OpenAIEmbeddings(model="text-embedding-3-large"))
 
-print(f"Se crearon {len(docs_split)} chunks de texto.")
+    if BACKEND == "numpy":
+        store_path = NUMPY_STORE_PATH
+        vectorstore = NumpyVectorStore(embeddings, NUMPY_STORE_PATH)
+    else:
+        store_path = CHROMA_PATH
+        vectorstore = Chroma(
+            embedding_function=embeddings,
+            persist_directory=CHROMA_PATH
+        )
 
-vectorstore = Chroma.from_documents(
-    docs_split,
-    embedding=OpenAIEmbeddings(model="text-embedding-3-large"),
-    persist_directory="C:\\Users\\santiago\\curso_langchain\\Tema 3\\chroma_db"
-)
+    # Lotes por número de tokens y peticiones concurrentes dentro de los límites RPM/TPM de la cuenta
+    scheduler = EmbeddingScheduler(
+        embeddings,
+        max_batch_tokens=50_000,
+        max_concurrency=4,
+        requests_per_minute=3000,
+        tokens_per_minute=1_000_000
+    )
+
+    # Carga → división → embeddings → escritura en streaming, con los PDFs en paralelo.
+    # Las páginas y chunks de cada PDF se guardan en caché por hash del fichero y configuración del splitter
+    pipeline = PDFIngestionPipeline(vectorstore, scheduler, text_splitter, max_pending_files=16,
+                                    document_cache_dir=f"{store_path}\\document_cache")
+
+    # Índice de entidades: una extracción por contrato nuevo o modificado, consultada por el asistente legal
+    entity_index = EntityIndex(
+        f"{store_path}\\{ENTITY_INDEX_FILE}",
+        EntityExtractor(ChatOpenAI(model="gpt-4o-mini", temperature=0), max_concurrency=4)
+    )
+
+    # Indexado incremental: solo se leen y embeben los PDFs nuevos o modificados
+    indexer = IncrementalIndexer(vectorstore, text_splitter, f"{store_path}\\index_manifest.json", scheduler,
+                                 entity_index)
+    stats = indexer.sync_streaming(CONTRATOS_PATH, "*.pdf", pipeline)
+
+    # Los chunks borrados son lápidas en la matriz de NumPy: se eliminan físicamente
+    if BACKEND == "numpy" and stats["deleted_chunks"]:
+        vectorstore.compact()
+
+    print(f"Ficheros sin cambios: {stats['unchanged']}, actualizados: {stats['updated']}, eliminados: {stats['removed']}")
+    print(f"Chunks añadidos: {stats['added_chunks']}, chunks borrados: {stats['deleted_chunks']}")
+    if indexer.ingestion_stats:
+        ingestion = indexer.ingestion_stats
+        print(f"PDFs: {ingestion['files']} ({ingestion['files_per_second']}/s), páginas: {ingestion['pages']} "
+              f"({ingestion['pages_per_second']}/s), primer lote escrito a los {ingestion['first_write_seconds']} s")
+        print(f"Embeddings: {ingestion['chunks_per_second']} chunks/s, {ingestion['tokens_per_second']} tokens/s "
+              f"({ingestion['batches']} lotes, {ingestion['retries']} reintentos)")
+        print(f"Tokens por chunk: {ingestion['token_distribution']}")
+    print(f"Índice de entidades: {entity_index.stats()}")
 
-consulta = "¿Dónde se encuentra el local del contrato en el que participa María Jiménez Campos"
+    consulta = "¿Dónde se encuentra el local del contrato en el que participa María Jiménez Campos"
 
-resultados = vectorstore.similarity_search(consulta, k=2)
+    resultados = vectorstore.similarity_search(consulta, k=2)
 
-print("Top 3 documentos mas similares a la consulta:\n")
-for i, doc in enumerate(resultados, start=1):
-    print(f"Contenido: {doc.page_content}")
-    print(f"Metadatos: {doc.metadata}")
\ No newline at end of file
+    print("Top 3 documentos mas similares a la consulta:\n")
+    for i, doc in enumerate(resultados, start=1):
+        print(f"Contenido: {doc.page_content}")
+        print(f"Metadatos: {doc.metadata}")
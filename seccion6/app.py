@@ -1,6 +1,7 @@
 import streamlit as st
 import uuid
-from graph import crear_helpdesk, HelpdeskState
+from graph import HelpdeskState
+from recursos import obtener_helpdesk, obtener_embeddings, reiniciar_rag
 from setup_rag import DocumentProcessor
 from datetime import datetime
 import os
@@ -12,29 +13,40 @@ st.set_page_config(
     layout="wide"
 )
 
-# Inicializar sesión
-if "helpdesk" not in st.session_state:
-    st.session_state.helpdesk = crear_helpdesk()
+# Inicializar sesión. El grafo compilado es compartido por todas las sesiones y
+# se consulta en cada ejecución para recoger el nuevo índice tras reconfigurar RAG
+st.session_state.helpdesk = obtener_helpdesk()
+if "tickets" not in st.session_state:
     st.session_state.tickets = {}
 
 def verificar_rag_setup():
     """Verifica si el sistema RAG está configurado."""
-    processor = DocumentProcessor()
+    processor = DocumentProcessor(embeddings=obtener_embeddings())
     return processor.chroma_path.exists()
 
 def configurar_rag():
     """Configura el sistema RAG."""
     with st.spinner("🔧 Configurando sistema RAG..."):
-        processor = DocumentProcessor()
-        vectorstore = processor.setup_rag_system(force_rebuild=True)
+        processor = DocumentProcessor(embeddings=obtener_embeddings())
+        
+        # Si el índice ya existe solo se re-indexan los documentos modificados
+        vectorstore = processor.setup_rag_system()
+        
+        # Recargar el vectorstore y el grafo compartidos con el nuevo índice
+        reiniciar_rag()
+        st.session_state.helpdesk = obtener_helpdesk()
         return vectorstore is not None
 
 def crear_ticket_id():
     """Genera un ID único para el ticket."""
     return f"TK-{uuid.uuid4().hex[:6].upper()}"
 
-def procesar_consulta(consulta: str, ticket_id: str):
-    """Procesa una consulta nueva."""
+def procesar_consulta(consulta: str, ticket_id: str, contenedor=None):
+    """Procesa una consulta nueva.
+    
+    Si se indica un contenedor de Streamlit, la respuesta RAG se muestra en él
+    token a token mientras se genera.
+    """
     estado_inicial = HelpdeskState(
         consulta=consulta,
         categoria="",
@@ -51,17 +63,34 @@ def procesar_consulta(consulta: str, ticket_id: str):
     
     # Procesar con streaming
     historial_procesamiento = []
+    respuesta_parcial = ""
+    zona_fuentes = contenedor.empty() if contenedor else None
+    zona_respuesta = contenedor.empty() if contenedor else None
     
     try:
-        for chunk in st.session_state.helpdesk.stream(
+        for modo, chunk in st.session_state.helpdesk.stream(
             estado_inicial, 
             config=config, 
-            stream_mode="updates"
+            stream_mode=["updates", "custom"]
         ):
+            if modo == "custom":
+                # Eventos emitidos por el nodo RAG: fuentes y tokens de la respuesta
+                if not contenedor:
+                    continue
+                if chunk["tipo"] == "fuentes" and chunk["fuentes"]:
+                    zona_fuentes.markdown(f"**📚 Fuentes:** {', '.join(chunk['fuentes'])}")
+                elif chunk["tipo"] == "token":
+                    respuesta_parcial += chunk["contenido"]
+                    zona_respuesta.markdown(respuesta_parcial + "▌")
+                continue
+            
             for nodo, salida in chunk.items():
                 if "historial" in salida and salida["historial"]:
                     historial_procesamiento.extend(salida["historial"])
         
+        if zona_respuesta:
+            zona_respuesta.markdown(respuesta_parcial)
+        
         # Obtener estado final
         estado_final = st.session_state.helpdesk.get_state(config)
         
@@ -161,7 +190,9 @@ def main():
                 ticket_id = crear_ticket_id()
                 
                 with st.spinner("🔄 Procesando consulta..."):
-                    resultado, historial, config = procesar_consulta(consulta, ticket_id)
+                    resultado, historial, config = procesar_consulta(
+                        consulta, ticket_id, contenedor=st.container()
+                    )
                 
                 if resultado:
                     # Guardar ticket
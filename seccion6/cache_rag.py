@@ -0,0 +1,187 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Optional, Dict, List
+from langchain.retrievers.multi_query import MultiQueryRetriever, LineListOutputParser
+
+logger = logging.getLogger("langchain.retrievers.multi_query")
+
+
+def normalizar_consulta(texto: str) -> str:
+    """Normaliza una consulta para usarla como clave de caché."""
+    texto = unicodedata.normalize("NFKC", texto).lower().strip()
+    texto = re.sub(r"\s+", " ", texto)
+    return texto.strip("¿?¡!.,;: ")
+
+
+class CacheSQLite:
+    """Caché clave-valor persistente en SQLite con expulsión LRU + TTL."""
+
+    def __init__(self, db_path: str, tabla: str = "cache", max_entradas: int = 1000,
+                 ttl_segundos: Optional[float] = None):
+        self.tabla = tabla
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {tabla} (
+                clave TEXT PRIMARY KEY,
+                valor TEXT NOT NULL,
+                creado REAL NOT NULL,
+                ultimo_acceso REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def obtener(self, clave: str) -> Optional[Any]:
+        """Devuelve el valor almacenado o None si no existe o ha caducado."""
+        ahora = time.time()
+        with self._lock:
+            fila = self._conn.execute(
+                f"SELECT valor, creado FROM {self.tabla} WHERE clave = ?", (clave,)
+            ).fetchone()
+
+            if fila is None:
+                self.misses += 1
+                return None
+
+            valor, creado = fila
+            if self.ttl_segundos is not None and ahora - creado > self.ttl_segundos:
+                self._conn.execute(f"DELETE FROM {self.tabla} WHERE clave = ?", (clave,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            # Marcar como usado recientemente (LRU)
+            self._conn.execute(
+                f"UPDATE {self.tabla} SET ultimo_acceso = ? WHERE clave = ?", (ahora, clave)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(valor)
+
+    def guardar(self, clave: str, valor: Any):
+        """Guarda un valor serializable en JSON y expulsa las entradas sobrantes."""
+        ahora = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.tabla} (clave, valor, creado, ultimo_acceso) "
+                "VALUES (?, ?, ?, ?)",
+                (clave, json.dumps(valor, ensure_ascii=False), ahora, ahora)
+            )
+            self._expulsar(ahora)
+            self._conn.commit()
+
+    def _expulsar(self, ahora: float):
+        """Elimina entradas caducadas y las menos usadas por encima del límite."""
+        if self.ttl_segundos is not None:
+            self._conn.execute(
+                f"DELETE FROM {self.tabla} WHERE creado < ?", (ahora - self.ttl_segundos,)
+            )
+        self._conn.execute(
+            f"""DELETE FROM {self.tabla} WHERE clave IN (
+                SELECT clave FROM {self.tabla} ORDER BY ultimo_acceso DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_entradas,)
+        )
+
+    def invalidar(self):
+        """Elimina todas las entradas de la caché."""
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.tabla}")
+            self._conn.commit()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Devuelve contadores de aciertos y fallos."""
+        with self._lock:
+            entradas = self._conn.execute(f"SELECT COUNT(*) FROM {self.tabla}").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "entradas": entradas,
+            "hits": self.hits,
+            "misses": self.misses,
+            "tasa_aciertos": round(self.hits / total, 3) if total else 0.0
+        }
+
+
+class CacheConsultas(CacheSQLite):
+    """Caché de resultados completos de VectorRAGSystem.buscar."""
+
+    def __init__(self, db_path: str, max_entradas: int = 1000, ttl_segundos: Optional[float] = None):
+        super().__init__(db_path, tabla="consultas_rag", max_entradas=max_entradas,
+                         ttl_segundos=ttl_segundos)
+
+    def clave(self, consulta: str, huella_indice: str) -> str:
+        """Clave compuesta por la huella del índice y la consulta normalizada."""
+        return f"{huella_indice}:{normalizar_consulta(consulta)}"
+
+
+class CacheExpansiones(CacheSQLite):
+    """Caché de las variantes generadas por MultiQueryRetriever."""
+
+    def __init__(self, db_path: str, max_entradas: int = 5000, ttl_segundos: Optional[float] = None):
+        super().__init__(db_path, tabla="expansiones_multi_query", max_entradas=max_entradas,
+                         ttl_segundos=ttl_segundos)
+        self.segundos_generacion = 0.0
+
+    def clave(self, prompt: str, modelo: str, consulta: str) -> str:
+        """Clave compuesta por el hash del prompt, el modelo y la consulta normalizada."""
+        hash_prompt = hashlib.sha256(prompt.encode()).hexdigest()[:16]
+        return f"{hash_prompt}:{modelo}:{normalizar_consulta(consulta)}"
+
+    def registrar_generacion(self, segundos: float):
+        """Acumula el tiempo de las expansiones que sí llamaron al LLM."""
+        self.segundos_generacion += segundos
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Añade una estimación de la latencia ahorrada por los aciertos."""
+        stats = super().estadisticas()
+        media = self.segundos_generacion / self.misses if self.misses else 0.0
+        stats["segundos_por_expansion"] = round(media, 3)
+        stats["segundos_ahorrados"] = round(media * self.hits, 2)
+        return stats
+
+
+class MultiQueryRetrieverCacheado(MultiQueryRetriever):
+    """MultiQueryRetriever que reutiliza las variantes guardadas en CacheExpansiones."""
+
+    cache: Any = None
+    clave_prompt: str = ""
+    modelo: str = ""
+
+    @classmethod
+    def desde_llm(cls, retriever, llm, prompt, cache: CacheExpansiones,
+                  include_original: bool = False, **kwargs) -> "MultiQueryRetrieverCacheado":
+        """Construye el retriever con el mismo pipeline prompt | llm | parser que from_llm."""
+        return cls(
+            retriever=retriever,
+            llm_chain=prompt | llm | LineListOutputParser(),
+            include_original=include_original,
+            cache=cache,
+            clave_prompt=prompt.pretty_repr(),
+            modelo=getattr(llm, "model_name", type(llm).__name__),
+            **kwargs
+        )
+
+    def generate_queries(self, question: str, run_manager) -> List[str]:
+        clave = self.cache.clave(self.clave_prompt, self.modelo, question)
+        variantes = self.cache.obtener(clave)
+        if variantes is not None:
+            logger.info(f"Expansión cacheada: {variantes}")
+            return variantes
+
+        inicio = time.perf_counter()
+        variantes = super().generate_queries(question, run_manager)
+        self.cache.registrar_generacion(time.perf_counter() - inicio)
+
+        if variantes:
+            self.cache.guardar(clave, variantes)
+        return variantes
@@ -0,0 +1,99 @@
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Pesos por defecto del modelo logístico (sin calibrar)
+PESOS_POR_DEFECTO = {
+    "similitud_max": 10.0,
+    "similitud_media": 5.0,
+    "solapamiento_lexico": 1.5
+}
+SESGO_POR_DEFECTO = -6.5
+
+
+def similitudes_desde_distancias(distancias: Sequence[float]) -> np.ndarray:
+    """Convierte distancias L2 al cuadrado de Chroma en similitud coseno.
+
+    Los embeddings de OpenAI están normalizados, por lo que d = 2 - 2·cos.
+    """
+    return np.clip(1.0 - np.asarray(distancias, dtype=np.float32) / 2.0, -1.0, 1.0)
+
+
+@lru_cache(maxsize=4096)
+def tokens_texto(texto: str) -> frozenset:
+    """Conjunto de palabras (más de 2 letras) de un texto, calculado una sola vez."""
+    return frozenset(p for p in re.findall(r"\w+", texto.lower()) if len(p) > 2)
+
+
+def solapamiento_lexico(consulta: str, textos: Sequence[str]) -> float:
+    """Fracción media de palabras de la consulta presentes en cada texto."""
+    palabras = tokens_texto(consulta)
+    if not palabras or not textos:
+        return 0.0
+    return float(np.mean([len(palabras & tokens_texto(t)) / len(palabras) for t in textos]))
+
+
+class CalibradorConfianza:
+    """Modelo logístico que transforma las similitudes recuperadas en una confianza."""
+
+    def __init__(self, pesos: Optional[Dict[str, float]] = None, sesgo: float = SESGO_POR_DEFECTO,
+                 usar_lexico: bool = False):
+        self.pesos = dict(pesos or PESOS_POR_DEFECTO)
+        self.sesgo = sesgo
+        self.usar_lexico = usar_lexico
+
+    @property
+    def nombres(self) -> List[str]:
+        nombres = ["similitud_max", "similitud_media"]
+        if self.usar_lexico:
+            nombres.append("solapamiento_lexico")
+        return nombres
+
+    def caracteristicas(self, consulta: str, distancias: Sequence[float],
+                        textos: Sequence[str] = ()) -> np.ndarray:
+        """Vector de características de una consulta sobre sus top-3 chunks."""
+        similitudes = np.sort(similitudes_desde_distancias(distancias))[::-1][:3]
+        valores = [float(similitudes[0]), float(similitudes.mean())]
+        if self.usar_lexico:
+            valores.append(solapamiento_lexico(consulta, textos[:3]))
+        return np.array(valores, dtype=np.float32)
+
+    def predecir(self, x: np.ndarray) -> np.ndarray:
+        """Aplica el modelo a una o varias filas de características."""
+        w = np.array([self.pesos[n] for n in self.nombres], dtype=np.float32)
+        return 1.0 / (1.0 + np.exp(-(np.atleast_2d(x) @ w + self.sesgo)))
+
+    def ajustar(self, X: np.ndarray, y: np.ndarray, iteraciones: int = 5000,
+                tasa: float = 0.5, l2: float = 1e-3):
+        """Ajusta pesos y sesgo sobre una muestra etiquetada (1 = respuesta correcta)."""
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        w = np.zeros(X.shape[1])
+        b = 0.0
+        for _ in range(iteraciones):
+            p = 1.0 / (1.0 + np.exp(-(X @ w + b)))
+            error = p - y
+            w -= tasa * (X.T @ error / len(y) + l2 * w)
+            b -= tasa * error.mean()
+        self.pesos.update(dict(zip(self.nombres, w.tolist())))
+        self.sesgo = float(b)
+
+    def guardar(self, ruta: str):
+        Path(ruta).write_text(json.dumps({
+            "pesos": self.pesos,
+            "sesgo": self.sesgo,
+            "usar_lexico": self.usar_lexico
+        }, indent=2), encoding="utf-8")
+
+    @classmethod
+    def cargar(cls, ruta: str, usar_lexico: bool = False) -> "CalibradorConfianza":
+        """Carga la calibración guardada o usa los valores por defecto."""
+        ruta = Path(ruta)
+        if not ruta.exists():
+            return cls(usar_lexico=usar_lexico)
+        datos = json.loads(ruta.read_text(encoding="utf-8"))
+        return cls(datos["pesos"], datos["sesgo"], datos.get("usar_lexico", usar_lexico))
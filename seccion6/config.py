@@ -0,0 +1,32 @@
+CHROMADB_PATH = "C:\\Users\\santiago\\curso_langchain\\Tema 4\\helpdesk_system\\chroma_db"
+DOCS_PATH = "C:\\Users\\santiago\\curso_langchain\\Tema 4\\helpdesk_system\\docs"
+EMBEDDINGS_MODEL = "text-embedding-3-large"
+
+# Caché de consultas RAG
+CACHE_DB_PATH = "cache_rag.db"
+CACHE_MAX_ENTRADAS = 1000
+CACHE_TTL_SEGUNDOS = 24 * 60 * 60
+
+# Confianza calculada a partir de las distancias de Chroma
+CONFIANZA_CALIBRACION_PATH = "calibracion_confianza.json"
+CONFIANZA_USAR_LEXICO = False
+
+# Índice léxico BM25 (se guarda dentro del directorio de Chroma)
+BM25_INDICE_ARCHIVO = "indice_bm25.json"
+BM25_UMBRAL_ATAJO = 0.8
+
+# Caché de embeddings en disco (direccionada por contenido)
+EMBEDDINGS_CACHE_PATH = "embeddings_cache"
+
+# División de los documentos en chunks (en tokens)
+CHUNK_TOKENS = 256
+CHUNK_OVERLAP_TOKENS = 32
+
+# Ingesta de embeddings: lotes por tokens y límites de la cuenta de OpenAI
+INGESTA_TOKENS_POR_LOTE = 50_000
+INGESTA_CONCURRENCIA = 4
+INGESTA_RPM = 3000
+INGESTA_TPM = 1_000_000
+
+# Pool de conexiones HTTP compartido por los clientes de OpenAI
+HTTP_MAX_CONEXIONES = 50
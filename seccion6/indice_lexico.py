@@ -0,0 +1,129 @@
+import json
+import math
+import re
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+# Palabras vacías frecuentes en las consultas de los tickets
+PALABRAS_VACIAS = frozenset("""
+a al como con de del el en es esta este hay la las le lo los me mi mis no o para
+pero por que se si sin su sus te tu tus un una uno y ya
+""".split())
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Minúsculas, sin tildes ni palabras vacías. Los números (códigos de error) se conservan."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return [t for t in re.findall(r"\w+", texto) if t not in PALABRAS_VACIAS]
+
+
+class IndiceBM25:
+    """Índice invertido BM25 en memoria que se persiste junto a la colección de Chroma."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []
+        self.textos: List[str] = []
+        self.metadatos: List[dict] = []
+        self.longitudes = np.zeros(0, dtype=np.float32)
+        self.postings: Dict[str, Dict[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def construir(cls, ids: Sequence[str], textos: Sequence[str],
+                  metadatos: Sequence[dict]) -> "IndiceBM25":
+        """Construye el índice a partir de los chunks de la colección."""
+        indice = cls()
+        indice.ids = list(ids)
+        indice.textos = list(textos)
+        indice.metadatos = [dict(m or {}) for m in metadatos]
+        longitudes = []
+        for posicion, texto in enumerate(indice.textos):
+            terminos = tokenizar(texto)
+            longitudes.append(len(terminos))
+            for termino, frecuencia in Counter(terminos).items():
+                indice.postings.setdefault(termino, {})[posicion] = frecuencia
+        indice.longitudes = np.array(longitudes, dtype=np.float32)
+        return indice
+
+    def idf(self, termino: str) -> float:
+        df = len(self.postings.get(termino, ()))
+        return math.log(1 + (len(self) - df + 0.5) / (df + 0.5))
+
+    def buscar(self, consulta: str, k: int = 4) -> Tuple[List[Document], float]:
+        """Devuelve los k mejores chunks y la confianza léxica del primero.
+
+        La confianza es la fracción (ponderada por idf) de los términos de la
+        consulta que aparecen en el primer resultado: 1.0 significa que todos
+        los términos, incluidos los códigos o nombres exactos, están en él.
+        """
+        terminos = list(dict.fromkeys(tokenizar(consulta)))
+        if not terminos or not len(self):
+            return [], 0.0
+
+        puntuaciones = np.zeros(len(self), dtype=np.float32)
+        normalizacion = self.k1 * (1 - self.b + self.b * self.longitudes / max(self.longitudes.mean(), 1.0))
+        for termino in terminos:
+            posting = self.postings.get(termino)
+            if not posting:
+                continue
+            posiciones = np.fromiter(posting.keys(), dtype=np.int64, count=len(posting))
+            tf = np.fromiter(posting.values(), dtype=np.float32, count=len(posting))
+            puntuaciones[posiciones] += self.idf(termino) * tf * (self.k1 + 1) / (tf + normalizacion[posiciones])
+
+        k = min(k, int(np.count_nonzero(puntuaciones)))
+        if k == 0:
+            return [], 0.0
+        mejores = np.argpartition(-puntuaciones, k - 1)[:k]
+        mejores = mejores[np.argsort(-puntuaciones[mejores])]
+
+        documentos = []
+        for posicion in mejores:
+            metadata = dict(self.metadatos[posicion], puntuacion_bm25=round(float(puntuaciones[posicion]), 4))
+            documentos.append(Document(page_content=self.textos[posicion], metadata=metadata))
+
+        pesos = {t: self.idf(t) for t in terminos}
+        primero = int(mejores[0])
+        cubiertos = sum(p for t, p in pesos.items() if primero in self.postings.get(t, ()))
+        return documentos, cubiertos / sum(pesos.values())
+
+    def guardar(self, ruta: Path):
+        ruta = Path(ruta)
+        ruta.write_text(json.dumps({
+            "k1": self.k1,
+            "b": self.b,
+            "ids": self.ids,
+            "textos": self.textos,
+            "metadatos": self.metadatos,
+            "postings": self.postings
+        }, ensure_ascii=False), encoding="utf-8")
+
+    @classmethod
+    def cargar(cls, ruta: Path) -> Optional["IndiceBM25"]:
+        """Carga el índice guardado, o None si todavía no se ha construido."""
+        ruta = Path(ruta)
+        if not ruta.exists():
+            return None
+        datos = json.loads(ruta.read_text(encoding="utf-8"))
+        indice = cls(datos["k1"], datos["b"])
+        indice.ids = datos["ids"]
+        indice.textos = datos["textos"]
+        indice.metadatos = datos["metadatos"]
+        # JSON guarda las claves como texto: se vuelven a convertir a posiciones
+        indice.postings = {t: {int(p): f for p, f in posting.items()}
+                           for t, posting in datos["postings"].items()}
+        longitudes = np.zeros(len(indice.ids), dtype=np.float32)
+        for posting in indice.postings.values():
+            for posicion, frecuencia in posting.items():
+                longitudes[posicion] += frecuencia
+        indice.longitudes = longitudes
+        return indice
@@ -1,24 +1,43 @@
 from langchain_community.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings
-from langchain.retrievers.multi_query import MultiQueryRetriever
 from pathlib import Path
+import hashlib
 import logging
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Tuple
+import numpy as np
 
 from config import *
+from cache_rag import CacheConsultas, CacheExpansiones
+from recuperacion import MultiQueryRetrieverRRF, RetrieverHibrido, PROMPT_MULTI_CONSULTA
+from indice_lexico import IndiceBM25
+from confianza import CalibradorConfianza
+from embeddings_cache import CachedEmbeddings
 
 
 class VectorRAGSystem:
     """Sistema RAG avanzado con ChromaDB y MultiQueryRetriever."""
     
-    def __init__(self, chroma_path: str = "chroma_db"):
+    def __init__(self, chroma_path: str = "chroma_db", usar_cache: bool = True,
+                 embeddings=None, llm=None):
         self.chroma_path = Path(chroma_path)
-        self.embeddings = OpenAIEmbeddings(model=EMBEDDINGS_MODEL)
-        self.llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+        self.embeddings = embeddings or CachedEmbeddings(
+            OpenAIEmbeddings(model=EMBEDDINGS_MODEL), EMBEDDINGS_CACHE_PATH
+        )
+        self.llm = llm or ChatOpenAI(model="gpt-4o-mini", temperature=0)
         self.vectorstore = None
         self.retriever = None
+        self.huella_indice = None
+        self.cache = CacheConsultas(
+            CACHE_DB_PATH,
+            max_entradas=CACHE_MAX_ENTRADAS,
+            ttl_segundos=CACHE_TTL_SEGUNDOS
+        ) if usar_cache else None
+        self.cache_expansiones = CacheExpansiones(CACHE_DB_PATH)
+        self.calibrador = CalibradorConfianza.cargar(
+            CONFIANZA_CALIBRACION_PATH, usar_lexico=CONFIANZA_USAR_LEXICO
+        )
         
         # Configurar logging para MultiQueryRetriever
         logging.basicConfig()
@@ -39,16 +58,32 @@ class VectorRAGSystem:
                 collection_name="helpdesk_knowledge"
             )
             
-            # Crear MultiQueryRetriever
-            self.retriever = MultiQueryRetriever.from_llm(
+            # Crear MultiQueryRetriever con las expansiones cacheadas, búsquedas
+            # concurrentes por variante y fusión RRF de los resultados
+            self.retriever = MultiQueryRetrieverRRF.desde_llm(
                 retriever=self.vectorstore.as_retriever(
                     search_type="similarity",
-                    search_kwargs={"k": 4}  # Más documentos para mejor contexto
+                    search_kwargs={"k": 4}
                 ),
                 llm=self.llm,
-                prompt=self._get_multi_query_prompt()
+                prompt=self._get_multi_query_prompt(),
+                cache=self.cache_expansiones,
+                vectorstore=self.vectorstore,
+                k=4  # Más documentos para mejor contexto
             )
             
+            # Búsqueda híbrida si DocumentProcessor ha construido el índice BM25
+            indice = IndiceBM25.cargar(self.chroma_path / BM25_INDICE_ARCHIVO)
+            if indice is not None:
+                self.retriever = RetrieverHibrido(
+                    retriever_vectorial=self.retriever,
+                    indice=indice,
+                    k=4,
+                    umbral_atajo=BM25_UMBRAL_ATAJO
+                )
+            
+            self.huella_indice = self._calcular_huella_indice()
+            
             print("✅ VectorRAGSystem inicializado correctamente")
             
         except Exception as e:
@@ -56,48 +91,97 @@ class VectorRAGSystem:
             self.vectorstore = None
             self.retriever = None
     
+    def _calcular_huella_indice(self) -> str:
+        """Calcula una huella de la colección a partir de los IDs de sus chunks."""
+        ids = sorted(self.vectorstore.get(include=[])["ids"])
+        return hashlib.md5("|".join(ids).encode()).hexdigest()[:12]
+    
+    def refrescar_huella(self):
+        """Recalcula la huella tras modificar la colección desde fuera."""
+        if self.vectorstore is not None:
+            self.huella_indice = self._calcular_huella_indice()
+    
+    def estadisticas_cache(self) -> Dict[str, Any]:
+        """Devuelve los contadores de las cachés de consultas, expansiones y embeddings."""
+        return {
+            "consultas": self.cache.estadisticas() if self.cache else None,
+            "expansiones": self.cache_expansiones.estadisticas(),
+            "embeddings": self.embeddings.stats() if isinstance(self.embeddings, CachedEmbeddings) else None,
+            "busqueda_hibrida": self.retriever.estadisticas() if isinstance(self.retriever, RetrieverHibrido) else None
+        }
+    
     def _get_multi_query_prompt(self):
         """Prompt personalizado para MultiQueryRetriever."""
-        return ChatPromptTemplate.from_template(
-            """Eres un asistente de helpdesk experto. Tu tarea es generar múltiples 
-versiones de la consulta del usuario para recuperar documentos relevantes de una 
-base de conocimiento de soporte técnico.
-
-Genera 3 versiones diferentes de la consulta original, considerando:
-- Sinónimos técnicos
-- Diferentes formas de expresar el mismo problema
-- Variaciones en terminología de helpdesk
-
-Consulta original: {question}
-
-Versiones alternativas:"""
-        )
+        return ChatPromptTemplate.from_template(PROMPT_MULTI_CONSULTA)
     
     def buscar(self, consulta: str) -> Dict[str, Any]:
-        """Busca respuestas usando MultiQueryRetriever."""
+        """Busca respuestas usando la caché y, si no hay acierto, el MultiQueryRetriever."""
+        resultado = None
+        for evento in self.buscar_stream(consulta):
+            if evento["tipo"] == "resultado":
+                resultado = evento["resultado"]
+        return resultado
+    
+    def buscar_stream(self, consulta: str) -> Iterator[Dict[str, Any]]:
+        """Variante en streaming de buscar.
+        
+        Emite primero las fuentes ({"tipo": "fuentes"}), después los tokens de la
+        respuesta ({"tipo": "token"}) y por último el resultado completo
+        ({"tipo": "resultado"}) con el mismo formato que devuelve buscar.
+        """
         if not self.retriever:
-            return {
+            yield {"tipo": "resultado", "resultado": {
                 "respuesta": "Sistema RAG no disponible. Verifique la configuración.",
                 "confianza": 0.0,
                 "fuentes": []
-            }
+            }}
+            return
+        
+        clave = None
+        if self.cache is not None:
+            clave = self.cache.clave(consulta, self.huella_indice)
+            resultado = self.cache.obtener(clave)
+            if resultado is not None:
+                yield {"tipo": "fuentes", "fuentes": resultado["fuentes"]}
+                yield {"tipo": "token", "contenido": resultado["respuesta"]}
+                yield {"tipo": "resultado", "resultado": resultado}
+                return
+        
+        resultado = None
+        for evento in self._buscar_stream_sin_cache(consulta):
+            if evento["tipo"] == "resultado":
+                resultado = evento["resultado"]
+            yield evento
         
+        if clave and self._es_cacheable(resultado):
+            self.cache.guardar(clave, resultado)
+    
+    def _es_cacheable(self, resultado: Dict[str, Any]) -> bool:
+        """Solo se cachean respuestas generadas correctamente."""
+        respuesta = resultado["respuesta"]
+        return bool(resultado["fuentes"]) and not (
+            respuesta.startswith("Error") or "Error generando respuesta" in respuesta
+        )
+    
+    def _buscar_stream_sin_cache(self, consulta: str) -> Iterator[Dict[str, Any]]:
+        """Ejecuta la búsqueda completa: expansión, recuperación y generación."""
         try:
             # Buscar documentos relevantes con MultiQueryRetriever
             documentos = self.retriever.invoke(consulta)
             
             if not documentos:
-                return {
+                yield {"tipo": "resultado", "resultado": {
                     "respuesta": "No encontré información relevante en la base de conocimiento.",
                     "confianza": 0.1,
                     "fuentes": []
-                }
+                }}
+                return
             
             # Extraer información de los documentos
             contexto_partes = []
             fuentes = []
             
-            for i, doc in enumerate(documentos[:3]):  # Usar top 3 documentos
+            for i, doc in enumerate(documentos[:3]):  # Usar top 3 documentos del ranking RRF
                 contenido = doc.page_content.strip()
                 if contenido:
                     contexto_partes.append(f"Documento {i+1}: {contenido}")
@@ -108,36 +192,43 @@ Versiones alternativas:"""
                         fuentes.append(filename)
             
             if not contexto_partes:
-                return {
+                yield {"tipo": "resultado", "resultado": {
                     "respuesta": "Documentos encontrados pero sin contenido útil.",
                     "confianza": 0.2,
                     "fuentes": fuentes
-                }
+                }}
+                return
+            
+            # Las fuentes se conocen antes de generar la respuesta
+            yield {"tipo": "fuentes", "fuentes": fuentes}
             
             # Generar respuesta usando el contexto encontrado
             contexto = "\n\n".join(contexto_partes)
-            respuesta = self._generar_respuesta(consulta, contexto)
+            partes_respuesta = []
+            for token in self._generar_respuesta_stream(consulta, contexto):
+                partes_respuesta.append(token)
+                yield {"tipo": "token", "contenido": token}
             
             # Calcular confianza basada en la relevancia
             confianza = self._calcular_confianza(consulta, documentos)
             
-            return {
-                "respuesta": respuesta,
+            yield {"tipo": "resultado", "resultado": {
+                "respuesta": "".join(partes_respuesta).strip(),
                 "confianza": confianza,
                 "fuentes": fuentes
-            }
+            }}
             
         except Exception as e:
             print(f"❌ Error en búsqueda RAG: {str(e)}")
-            return {
+            yield {"tipo": "resultado", "resultado": {
                 "respuesta": f"Error interno en la búsqueda: {str(e)}",
                 "confianza": 0.0,
                 "fuentes": []
-            }
+            }}
     
-    def _generar_respuesta(self, consulta: str, contexto: str) -> str:
-        """Genera una respuesta basada en el contexto encontrado."""
-        prompt = ChatPromptTemplate.from_template(
+    def _get_prompt_respuesta(self):
+        """Prompt para generar la respuesta a partir del contexto."""
+        return ChatPromptTemplate.from_template(
             """Eres un asistente de helpdesk experto. Responde a la consulta del usuario 
 basándote únicamente en el contexto proporcionado de la base de conocimiento.
 
@@ -154,47 +245,56 @@ Consulta del usuario: {consulta}
 
 Respuesta:"""
         )
+    
+    def _generar_respuesta(self, consulta: str, contexto: str) -> str:
+        """Genera una respuesta basada en el contexto encontrado."""
+        return "".join(self._generar_respuesta_stream(consulta, contexto)).strip()
+    
+    def _generar_respuesta_stream(self, consulta: str, contexto: str) -> Iterator[str]:
+        """Genera la respuesta token a token."""
+        prompt = self._get_prompt_respuesta()
         
         try:
-            response = self.llm.invoke(prompt.format(consulta=consulta, contexto=contexto))
-            return response.content.strip()
+            for chunk in self.llm.stream(prompt.format(consulta=consulta, contexto=contexto)):
+                if chunk.content:
+                    yield chunk.content
         except Exception as e:
-            return f"Error generando respuesta: {str(e)}"
+            yield f"Error generando respuesta: {str(e)}"
     
     def _calcular_confianza(self, consulta: str, documentos: List) -> float:
-        """Calcula la confianza basada en la relevancia de los documentos."""
+        """Calcula la confianza a partir de las distancias vectoriales de los documentos."""
         if not documentos:
             return 0.0
         
-        # Factores para calcular confianza
-        num_docs = len(documentos)
-        palabras_consulta = set(consulta.lower().split())
+        distancias = [doc.metadata["distancia"] for doc in documentos if "distancia" in doc.metadata]
+        if not distancias:
+            return 0.3  # Confianza mínima si se encontraron documentos sin puntuación
         
-        puntuacion_relevancia = 0
-        total_contenido = 0
-        
-        for doc in documentos[:3]:  # Evaluar top 3
-            contenido = doc.page_content.lower()
-            total_contenido += len(contenido.split())
-            
-            # Contar coincidencias de palabras clave
-            coincidencias = sum(1 for palabra in palabras_consulta 
-                              if palabra in contenido and len(palabra) > 2)
-            
-            puntuacion_relevancia += coincidencias
+        x = self.calibrador.caracteristicas(
+            consulta, distancias, [doc.page_content for doc in documentos[:3]]
+        )
+        return round(float(self.calibrador.predecir(x)[0]), 2)
+    
+    def calibrar_confianza(self, muestras: List[Tuple[str, bool]]) -> Dict[str, Any]:
+        """Calibra la confianza con una muestra etiquetada de (consulta, es_resoluble)."""
+        filas, etiquetas = [], []
+        for consulta, correcta in muestras:
+            documentos = self.retriever.invoke(consulta)
+            distancias = [doc.metadata["distancia"] for doc in documentos if "distancia" in doc.metadata]
+            # Igual que en _calcular_confianza: los documentos solo de BM25 no tienen distancia
+            if not distancias:
+                continue
+            filas.append(self.calibrador.caracteristicas(
+                consulta, distancias, [doc.page_content for doc in documentos[:3]]
+            ))
+            etiquetas.append(1.0 if correcta else 0.0)
         
-        # Normalizar puntuación
-        if palabras_consulta and total_contenido > 0:
-            confianza_base = min(puntuacion_relevancia / len(palabras_consulta), 1.0)
-            
-            # Bonus por tener múltiples documentos relevantes
-            bonus_documentos = min(num_docs / 4.0, 0.2)
-            
-            # Bonus por longitud adecuada del contenido
-            bonus_contenido = min(total_contenido / 1000.0, 0.1)
-            
-            confianza_final = min(confianza_base + bonus_documentos + bonus_contenido, 1.0)
-            
-            return round(confianza_final, 2)
+        if not filas:
+            raise ValueError("Ninguna consulta de la muestra recuperó documentos con distancia vectorial")
+        self.calibrador.ajustar(np.vstack(filas), np.array(etiquetas))
+        self.calibrador.guardar(CONFIANZA_CALIBRACION_PATH)
         
-        return 0.3  # Confianza mínima si se encontraron documentos
\ No newline at end of file
+        # Las confianzas cacheadas se calcularon con la calibración anterior
+        if self.cache:
+            self.cache.invalidar()
+        return {"pesos": self.calibrador.pesos, "sesgo": self.calibrador.sesgo}
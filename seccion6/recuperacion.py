@@ -0,0 +1,145 @@
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import PrivateAttr
+
+from cache_rag import MultiQueryRetrieverCacheado
+
+# Prompt de expansión de consultas del helpdesk (también lo usa el benchmark de retrievers)
+PROMPT_MULTI_CONSULTA = """Eres un asistente de helpdesk experto. Tu tarea es generar múltiples 
+versiones de la consulta del usuario para recuperar documentos relevantes de una 
+base de conocimiento de soporte técnico.
+
+Genera 3 versiones diferentes de la consulta original, considerando:
+- Sinónimos técnicos
+- Diferentes formas de expresar el mismo problema
+- Variaciones en terminología de helpdesk
+
+Consulta original: {question}
+
+Versiones alternativas:"""
+
+
+def hash_contenido(doc: Document) -> str:
+    """Identifica un chunk por el hash de su contenido."""
+    return hashlib.md5(doc.page_content.strip().encode()).hexdigest()
+
+
+def fusion_rrf(rankings: List[List[Document]], k: int = 60) -> List[Document]:
+    """Fusiona varios rankings con Reciprocal Rank Fusion eliminando duplicados."""
+    puntuaciones: Dict[str, float] = {}
+    documentos: Dict[str, Document] = {}
+
+    for ranking in rankings:
+        for posicion, doc in enumerate(ranking, 1):
+            clave = hash_contenido(doc)
+            puntuaciones[clave] = puntuaciones.get(clave, 0.0) + 1.0 / (k + posicion)
+            documentos.setdefault(clave, doc)
+
+    ordenados = sorted(puntuaciones, key=puntuaciones.get, reverse=True)
+    for clave in ordenados:
+        documentos[clave].metadata["puntuacion_rrf"] = round(puntuaciones[clave], 5)
+    return [documentos[clave] for clave in ordenados]
+
+
+class MultiQueryRetrieverRRF(MultiQueryRetrieverCacheado):
+    """MultiQueryRetriever que busca todas las variantes en paralelo y las fusiona con RRF."""
+
+    vectorstore: Any = None
+    k: int = 4
+    max_concurrencia: int = 4
+    rrf_k: int = 60
+
+    def _buscar_variante(self, vector: List[float]) -> List[Document]:
+        """Búsqueda por similitud de una variante ya embebida."""
+        resultados = self.vectorstore.similarity_search_by_vector_with_relevance_scores(
+            vector, k=self.k
+        )
+        documentos = []
+        for doc, distancia in resultados:
+            doc.metadata["distancia"] = distancia
+            documentos.append(doc)
+        return documentos
+
+    def _get_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        variantes = self.generate_queries(query, run_manager)
+        consultas = [query] + [v for v in variantes if v.strip() and v != query]
+
+        # Una sola llamada de embeddings para la consulta original y todas las variantes
+        vectores = self.vectorstore.embeddings.embed_documents(consultas)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrencia, len(vectores))) as pool:
+            rankings = list(pool.map(self._buscar_variante, vectores))
+
+        # Conservar la mejor distancia de cada chunk entre todas las variantes
+        mejor_distancia: Dict[str, float] = {}
+        for ranking in rankings:
+            for doc in ranking:
+                clave = hash_contenido(doc)
+                mejor_distancia[clave] = min(doc.metadata["distancia"],
+                                             mejor_distancia.get(clave, float("inf")))
+
+        fusionados = fusion_rrf(rankings, k=self.rrf_k)
+        for doc in fusionados:
+            doc.metadata["distancia"] = mejor_distancia[hash_contenido(doc)]
+        return fusionados
+
+
+class RetrieverHibrido(BaseRetriever):
+    """Combina el índice BM25 con el MultiQueryRetrieverRRF mediante RRF.
+
+    Si el primer resultado léxico cubre la consulta con una confianza igual o
+    superior a `umbral_atajo` (p. ej. "Error 500"), se omite la expansión con
+    el LLM y solo se fusiona con la búsqueda vectorial de la consulta original.
+    """
+
+    retriever_vectorial: MultiQueryRetrieverRRF
+    indice: Any = None  # IndiceBM25
+    k: int = 4
+    umbral_atajo: float = 0.8
+    rrf_k: int = 60
+    consultas: int = 0
+    atajos: int = 0
+    # El retriever se comparte entre las sesiones de Streamlit: los contadores van con lock
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def _get_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        lexicos, confianza_lexica = self.indice.buscar(query, k=self.k)
+        atajo = bool(lexicos) and confianza_lexica >= self.umbral_atajo
+        with self._lock:
+            self.consultas += 1
+            self.atajos += int(atajo)
+
+        if atajo:
+            vector = self.retriever_vectorial.vectorstore.embeddings.embed_query(query)
+            vectoriales = self.retriever_vectorial._buscar_variante(vector)
+        else:
+            vectoriales = self.retriever_vectorial.invoke(
+                query, config={"callbacks": run_manager.get_child()}
+            )
+
+        # Cada chunk conserva las puntuaciones de los rankings en los que aparece.
+        # Los encontrados solo por BM25 no tienen distancia vectorial
+        distancias = {hash_contenido(doc): doc.metadata["distancia"] for doc in vectoriales}
+        bm25 = {hash_contenido(doc): doc.metadata["puntuacion_bm25"] for doc in lexicos}
+        fusionados = fusion_rrf([vectoriales, lexicos], k=self.rrf_k)
+        for doc in fusionados:
+            clave = hash_contenido(doc)
+            if clave in distancias:
+                doc.metadata["distancia"] = distancias[clave]
+            if clave in bm25:
+                doc.metadata["puntuacion_bm25"] = bm25[clave]
+        return fusionados
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            consultas, atajos = self.consultas, self.atajos
+        return {
+            "consultas": consultas,
+            "atajos_lexicos": atajos,
+            "tasa_atajos": round(atajos / consultas, 3) if consultas else 0.0
+        }
@@ -0,0 +1,98 @@
+"""
+Registro de recursos compartidos por todas las sesiones del proceso.
+
+Streamlit ejecuta app.py una vez por sesión, pero los módulos importados se
+mantienen en memoria. Aquí se crean una única vez (de forma perezosa y
+protegida con un lock) los clientes de OpenAI, el vectorstore y el grafo
+compilado, para que todas las sesiones los compartan.
+"""
+import sqlite3
+import threading
+from typing import Any, Callable, Dict
+
+import httpx
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from config import *
+from embeddings_cache import CachedEmbeddings
+from graph import HelpdeskGraph
+from rag_system import VectorRAGSystem
+
+_lock = threading.RLock()
+_recursos: Dict[str, Any] = {}
+
+
+def _obtener(nombre: str, fabrica: Callable[[], Any]) -> Any:
+    """Devuelve el recurso o lo crea si todavía no existe (double-checked locking)."""
+    recurso = _recursos.get(nombre)
+    if recurso is None:
+        with _lock:
+            recurso = _recursos.get(nombre)
+            if recurso is None:
+                recurso = fabrica()
+                _recursos[nombre] = recurso
+    return recurso
+
+
+def obtener_http_client() -> httpx.Client:
+    """Cliente HTTP con pool de conexiones compartido por los clientes de OpenAI."""
+    return _obtener("http_client", lambda: httpx.Client(
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONEXIONES,
+                            max_keepalive_connections=HTTP_MAX_CONEXIONES),
+        timeout=60.0
+    ))
+
+
+def obtener_embeddings() -> CachedEmbeddings:
+    return _obtener("embeddings", lambda: CachedEmbeddings(
+        OpenAIEmbeddings(model=EMBEDDINGS_MODEL, http_client=obtener_http_client()),
+        EMBEDDINGS_CACHE_PATH
+    ))
+
+
+def obtener_llm(temperature: float = 0) -> ChatOpenAI:
+    return _obtener(f"llm_{temperature}", lambda: ChatOpenAI(
+        model="gpt-4o-mini", temperature=temperature, http_client=obtener_http_client()
+    ))
+
+
+def obtener_rag() -> VectorRAGSystem:
+    """VectorRAGSystem único del proceso (un solo vectorstore e índice HNSW en memoria)."""
+    return _obtener("rag", lambda: VectorRAGSystem(
+        chroma_path=CHROMADB_PATH, embeddings=obtener_embeddings(), llm=obtener_llm(0)
+    ))
+
+
+def obtener_conexion_checkpoints() -> sqlite3.Connection:
+    return _obtener("conexion_checkpoints",
+                    lambda: sqlite3.connect("helpdesk.db", check_same_thread=False))
+
+
+def obtener_helpdesk():
+    """Grafo compilado compartido. Cada ticket usa su propio thread_id en el checkpointer."""
+    def crear():
+        helpdesk = HelpdeskGraph(rag=obtener_rag(), llm=obtener_llm(0.1))
+        compilado = helpdesk.compilar(conn=obtener_conexion_checkpoints())
+        calentar()
+        return compilado
+
+    return _obtener("helpdesk", crear)
+
+
+def calentar(consulta: str = "resetear contraseña"):
+    """Lanza una búsqueda de prueba para cargar el índice y abrir las conexiones."""
+    rag = obtener_rag()
+    if rag.vectorstore is None:
+        return
+    try:
+        rag.vectorstore.similarity_search(consulta, k=1)
+        print("🔥 Recursos RAG precalentados")
+    except Exception as e:
+        print(f"⚠️ Error precalentando recursos RAG: {str(e)}")
+
+
+def reiniciar_rag():
+    """Descarta el vectorstore y el grafo para que se recarguen tras reconstruir el índice."""
+    with _lock:
+        _recursos.pop("rag", None)
+        _recursos.pop("helpdesk", None)
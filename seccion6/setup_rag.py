@@ -0,0 +1,348 @@
+import hashlib
+import json
+from typing import List, Dict
+from pathlib import Path
+from langchain_community.document_loaders import DirectoryLoader, TextLoader
+from langchain_community.vectorstores import Chroma
+from langchain_openai import OpenAIEmbeddings
+from langchain_core.documents import Document
+
+from config import * 
+from cache_rag import CacheConsultas
+from embeddings_cache import CachedEmbeddings
+from embedding_scheduler import EmbeddingScheduler
+from indice_lexico import IndiceBM25
+from token_splitter import TokenBudgetSplitter, chunk_token_counts, token_distribution
+
+class DocumentProcessor:
+    """Procesador de documentos para el sistema RAG."""
+    
+    def __init__(self, docs_path: str = "docs", chroma_path: str = "./chroma_db", embeddings=None):
+        self.docs_path = Path(docs_path)
+        self.chroma_path = Path(chroma_path)
+        self.embeddings = embeddings or CachedEmbeddings(
+            OpenAIEmbeddings(model=EMBEDDINGS_MODEL), EMBEDDINGS_CACHE_PATH
+        )
+        # Presupuesto fijo de tokens por chunk (antes 1000/200 caracteres)
+        self.text_splitter = TokenBudgetSplitter(
+            chunk_tokens=CHUNK_TOKENS,
+            overlap_tokens=CHUNK_OVERLAP_TOKENS
+        )
+        self.scheduler = EmbeddingScheduler(
+            self.embeddings,
+            max_batch_tokens=INGESTA_TOKENS_POR_LOTE,
+            max_concurrency=INGESTA_CONCURRENCIA,
+            requests_per_minute=INGESTA_RPM,
+            tokens_per_minute=INGESTA_TPM
+        )
+        
+    def load_documents(self) -> List[Document]:
+        """Carga documentos markdown del directorio docs."""
+        print(f"📚 Cargando documentos desde {self.docs_path}")
+        
+        # Cargar archivos markdown
+        loader = DirectoryLoader(
+            str(self.docs_path),
+            glob="*.md",
+            loader_cls=TextLoader,
+            loader_kwargs={"encoding": "utf-8"}
+        )
+        
+        documents = self._enrich_metadata(loader.load())
+        
+        print(f"✅ Cargados {len(documents)} documentos")
+        return documents
+    
+    def load_file(self, path: Path) -> List[Document]:
+        """Carga un único documento markdown."""
+        loader = TextLoader(str(path), encoding="utf-8")
+        return self._enrich_metadata(loader.load())
+    
+    def _enrich_metadata(self, documents: List[Document]) -> List[Document]:
+        """Añade nombre, tipo e ID de documento a los metadatos."""
+        for doc in documents:
+            filename = Path(doc.metadata["source"]).stem
+            doc.metadata.update({
+                "filename": filename,
+                "doc_type": self._get_doc_type(filename),
+                "doc_id": self._generate_doc_id(doc.page_content)
+            })
+        return documents
+    
+    def _get_doc_type(self, filename: str) -> str:
+        """Determina el tipo de documento basado en el nombre."""
+        if "faq" in filename.lower():
+            return "faq"
+        elif "manual" in filename.lower():
+            return "manual"
+        elif "troubleshooting" in filename.lower():
+            return "troubleshooting"
+        else:
+            return "general"
+    
+    def _generate_doc_id(self, content: str) -> str:
+        """Genera un ID único para el documento."""
+        return hashlib.md5(content.encode()).hexdigest()[:8]
+    
+    def _generate_chunk_uid(self, source: str, content: str) -> str:
+        """ID determinista del chunk: fichero de origen + hash de su contenido."""
+        return hashlib.md5(f"{source}\n{content}".encode()).hexdigest()
+    
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """Divide documentos en chunks más pequeños."""
+        print("✂️  Dividiendo documentos en chunks...")
+        
+        chunks = self.text_splitter.split_documents(documents)
+        
+        # Agregar metadatos de chunk
+        for i, chunk in enumerate(chunks):
+            chunk.metadata.update({
+                "chunk_id": i,
+                "chunk_uid": self._generate_chunk_uid(chunk.metadata["source"], chunk.page_content),
+                "chunk_size": len(chunk.page_content)
+            })
+        
+        distribucion = token_distribution(chunk_token_counts(chunks))
+        print(f"✅ Creados {len(chunks)} chunks")
+        print(f"📏 Tokens por chunk: media {distribucion.get('mean', 0)} | p95 {distribucion.get('p95', 0)} | "
+              f"máx {distribucion.get('max', 0)} | total {distribucion['total']}")
+        return chunks
+    
+    def create_vectorstore(self, documents: List[Document]) -> Chroma:
+        """Crea el vectorstore con ChromaDB."""
+        print("🔄 Creando vectorstore con ChromaDB...")
+        
+        # Limpiar directorio anterior si existe
+        if self.chroma_path.exists():
+            import shutil
+            shutil.rmtree(self.chroma_path)
+        
+        # Crear vectorstore con IDs deterministas (sin chunks duplicados)
+        documents = list({doc.metadata["chunk_uid"]: doc for doc in documents}.values())
+        vectorstore = Chroma(
+            persist_directory=str(self.chroma_path),
+            embedding_function=self.embeddings,
+            collection_name="helpdesk_knowledge"
+        )
+        self.ingest(vectorstore, documents)
+        
+        # Manifiesto para las actualizaciones incrementales
+        manifest = {}
+        for doc in documents:
+            source = doc.metadata["source"]
+            if source not in manifest:
+                manifest[source] = self._manifest_entry(Path(source), [])
+            manifest[source]["chunk_ids"].append(doc.metadata["chunk_uid"])
+        self._save_manifest(manifest)
+        self.build_lexical_index(vectorstore)
+        
+        print(f"✅ Vectorstore creado en {self.chroma_path}")
+        print(f"📊 Total de vectores: {len(documents)}")
+        
+        return vectorstore
+    
+    def ingest(self, vectorstore: Chroma, documents: List[Document]) -> Dict[str, float]:
+        """Embebe los chunks en lotes concurrentes y los escribe en Chroma según terminan."""
+        stats = self.scheduler.ingest(
+            vectorstore, documents, [doc.metadata["chunk_uid"] for doc in documents]
+        )
+        print(f"⚡ Embeddings: {stats['chunks_per_second']} chunks/s | {stats['tokens_per_second']} tokens/s "
+              f"({stats['batches']} lotes, {stats['retries']} reintentos)")
+        return stats
+    
+    @property
+    def lexical_index_path(self) -> Path:
+        return self.chroma_path / BM25_INDICE_ARCHIVO
+    
+    def build_lexical_index(self, vectorstore: Chroma) -> IndiceBM25:
+        """Construye y guarda el índice BM25 con los mismos chunks que la colección."""
+        datos = vectorstore.get(include=["documents", "metadatas"])
+        indice = IndiceBM25.construir(datos["ids"], datos["documents"], datos["metadatas"])
+        indice.guardar(self.lexical_index_path)
+        print(f"🔤 Índice BM25 creado con {len(indice)} chunks")
+        return indice
+    
+    @property
+    def manifest_path(self) -> Path:
+        return self.chroma_path / "index_manifest.json"
+    
+    def _load_manifest(self) -> Dict[str, dict]:
+        if self.manifest_path.exists():
+            return json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        return {}
+    
+    def _save_manifest(self, manifest: Dict[str, dict]):
+        self.manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    
+    def _manifest_entry(self, path: Path, chunk_ids: List[str]) -> dict:
+        return {
+            "mtime": path.stat().st_mtime,
+            "hash": hashlib.md5(path.read_bytes()).hexdigest(),
+            "splitter": self.text_splitter.config(),
+            "chunk_ids": chunk_ids
+        }
+    
+    def update_vectorstore(self, vectorstore: Chroma) -> Dict[str, int]:
+        """Actualiza el vectorstore existente de forma incremental.
+        
+        Los ficheros con el mismo mtime no se leen; de los modificados solo se
+        embeben los chunks nuevos y se borran los que ya no existen. Los chunks
+        de ficheros eliminados también se borran. Si el fichero se dividió con
+        otra configuración del splitter se vuelve a dividir aunque no haya cambiado.
+        """
+        print("🔄 Actualizando vectorstore de forma incremental...")
+        
+        manifest = self._load_manifest()
+        current = {str(path): path for path in sorted(self.docs_path.glob("*.md"))}
+        pending: Dict[str, Document] = {}
+        stats = {"sin_cambios": 0, "actualizados": 0, "eliminados": 0,
+                 "chunks_nuevos": 0, "chunks_borrados": 0}
+        
+        # Ficheros eliminados
+        for source in set(manifest) - set(current):
+            old_ids = manifest.pop(source)["chunk_ids"]
+            if old_ids:
+                vectorstore.delete(ids=old_ids)
+            stats["eliminados"] += 1
+            stats["chunks_borrados"] += len(old_ids)
+        
+        splitter = self.text_splitter.config()
+        for source, path in current.items():
+            entry = manifest.get(source)
+            resplit = entry is not None and entry.get("splitter") != splitter
+            
+            # Mismo mtime: el fichero no se vuelve a leer
+            if entry and not resplit and entry["mtime"] == path.stat().st_mtime:
+                stats["sin_cambios"] += 1
+                continue
+            
+            new_entry = self._manifest_entry(path, [])
+            if entry and not resplit and entry["hash"] == new_entry["hash"]:
+                entry["mtime"] = new_entry["mtime"]
+                stats["sin_cambios"] += 1
+                continue
+            
+            chunks = self.split_documents(self.load_file(path))
+            chunks = {chunk.metadata["chunk_uid"]: chunk for chunk in chunks}
+            old_ids = set(entry["chunk_ids"]) if entry else set()
+            
+            new_ids = [uid for uid in chunks if uid not in old_ids]
+            pending.update((uid, chunks[uid]) for uid in new_ids)
+            
+            stale_ids = list(old_ids - set(chunks))
+            if stale_ids:
+                vectorstore.delete(ids=stale_ids)
+            
+            new_entry["chunk_ids"] = list(chunks)
+            manifest[source] = new_entry
+            stats["actualizados"] += 1
+            stats["chunks_nuevos"] += len(new_ids)
+            stats["chunks_borrados"] += len(stale_ids)
+        
+        # Los chunks nuevos de todos los ficheros se embeben juntos
+        if pending:
+            self.ingest(vectorstore, list(pending.values()))
+        
+        self._save_manifest(manifest)
+        
+        if pending or stats["eliminados"] or stats["chunks_borrados"] or not self.lexical_index_path.exists():
+            self.build_lexical_index(vectorstore)
+        
+        print(f"📊 Sin cambios: {stats['sin_cambios']} | Actualizados: {stats['actualizados']} | "
+              f"Eliminados: {stats['eliminados']}")
+        print(f"📊 Chunks nuevos: {stats['chunks_nuevos']} | Chunks borrados: {stats['chunks_borrados']}")
+        
+        return stats
+    
+    def load_existing_vectorstore(self) -> Chroma:
+        """Carga vectorstore existente."""
+        if not self.chroma_path.exists():
+            raise FileNotFoundError(f"Vectorstore no encontrado en {self.chroma_path}")
+        
+        vectorstore = Chroma(
+            persist_directory=str(self.chroma_path),
+            embedding_function=self.embeddings,
+            collection_name="helpdesk_knowledge"
+        )
+        
+        return vectorstore
+    
+    def setup_rag_system(self, force_rebuild: bool = False):
+        """Configura el sistema RAG completo."""
+        print("🚀 Configurando sistema RAG...")
+        
+        # Si ya existe (con manifiesto) y no se fuerza rebuild, actualizar solo lo que ha cambiado
+        if self.chroma_path.exists() and self.manifest_path.exists() and not force_rebuild:
+            print("📦 Vectorstore existente encontrado")
+            vectorstore = self.load_existing_vectorstore()
+            stats = self.update_vectorstore(vectorstore)
+            if stats["actualizados"] or stats["eliminados"]:
+                self.invalidate_query_cache()
+            return vectorstore
+        
+        # Cargar y procesar documentos
+        documents = self.load_documents()
+        if not documents:
+            print("⚠️  No se encontraron documentos para procesar")
+            return None
+        
+        # Dividir documentos
+        chunks = self.split_documents(documents)
+        
+        # Crear vectorstore
+        vectorstore = self.create_vectorstore(chunks)
+        
+        # Las respuestas cacheadas pertenecen al índice anterior
+        self.invalidate_query_cache()
+        
+        print("✅ Sistema RAG configurado exitosamente")
+        return vectorstore
+    
+    def invalidate_query_cache(self):
+        """Elimina las respuestas cacheadas de VectorRAGSystem.buscar."""
+        CacheConsultas(CACHE_DB_PATH).invalidar()
+        print("🧹 Caché de consultas invalidada")
+    
+    def test_search(self, vectorstore: Chroma, query: str = "resetear contraseña"):
+        """Prueba la funcionalidad de búsqueda."""
+        print(f"\n🔍 Probando búsqueda: '{query}'")
+        
+        results = vectorstore.similarity_search(query, k=3)
+        
+        for i, doc in enumerate(results, 1):
+            print(f"\n📄 Resultado {i}:")
+            print(f"Tipo: {doc.metadata.get('doc_type', 'unknown')}")
+            print(f"Archivo: {doc.metadata.get('filename', 'unknown')}")
+            print(f"Contenido: {doc.page_content[:200]}...")
+        
+        return results
+
+
+def main():
+    """Función principal para configurar RAG."""
+    print("🎧 Configuración RAG - Helpdesk 2.0")
+    print("=" * 40)
+    
+    # Configurar procesador
+    processor = DocumentProcessor(docs_path=DOCS_PATH, chroma_path=CHROMADB_PATH)
+    
+    # Configurar sistema RAG
+    vectorstore = processor.setup_rag_system(force_rebuild=True)
+    
+    if vectorstore:
+        # Probar búsquedas
+        test_queries = [
+            "resetear contraseña",
+            "error 500",
+            "cancelar suscripción",
+            "aplicación lenta"
+        ]
+        
+        for query in test_queries:
+            processor.test_search(vectorstore, query)
+    
+    print("\n✅ Configuración completada")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file